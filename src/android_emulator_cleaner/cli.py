@@ -4,6 +4,9 @@ Command Line Interface module.
 This module contains the main CLI logic and user interaction flows.
 """
 
+import argparse
+import os
+import queue
 import sys
 from typing import cast
 
@@ -11,27 +14,51 @@ import questionary
 from questionary import Style
 
 from .core import (
+    DEFAULT_MAX_WORKERS,
     ADBNotFoundError,
+    CleanupEngine,
     DeviceCleaner,
+    DeviceTracker,
     check_adb_available,
-    clean_avd_cache,
-    clean_avd_snapshots,
+    clean_avds,
+    compact_avd_overlays,
+    dedupe_avd_home,
     format_size,
+    get_avd_home,
     get_avd_list,
     get_cleanup_options,
     get_connected_devices,
     get_total_avd_stats,
+    list_snapshots,
+    resume_avd_trash,
+    sparsify_avd_images,
+)
+from .models import (
+    AVD,
+    CleanupFilter,
+    CleanupOption,
+    CompactionResult,
+    DeletionResult,
+    Device,
+    DeviceEvent,
+    DeviceEventType,
+    ProgressEvent,
+    SnapshotKeep,
+    SnapshotPolicy,
+    StorageSnapshot,
+    parse_size,
 )
-from .models import AVD, CleanupOption, Device, StorageInfo
 from .ui import (
     console,
     create_avd_result_panel,
     create_avd_summary_panel,
     create_completion_panel,
     create_confirmation_panel,
+    create_estimate_table,
     create_header_panel,
     create_progress_bar,
     create_running_warning_panel,
+    create_snapshot_table,
     create_summary_panel,
     print_device_results,
     print_header_row,
@@ -120,8 +147,18 @@ def select_apps_to_uninstall(device: Device) -> list[str]:
 
     console.print(f"\n[dim]Found {len(apps)} user-installed apps[/dim]\n")
 
+    # Apps come largest first; the size is shown where diskstats knows it
+    width = max(len(app["package"]) for app in apps)
     choices = [
-        questionary.Choice(title=f"📦 {app['package']}", value=app["package"], checked=False)
+        questionary.Choice(
+            title=(
+                f"📦 {app['package']:<{width}}  {app['storage'].total_text:>8}"
+                if app["storage"]
+                else f"📦 {app['package']}"
+            ),
+            value=app["package"],
+            checked=False,
+        )
         for app in apps
     ]
 
@@ -198,10 +235,23 @@ def select_avds(avds: list[AVD]) -> list[AVD]:
         return cast(list[AVD], selected)
 
 
-def clean_running_devices() -> bool:
+def clean_running_devices(
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    fused: bool = False,
+    keep_data: bool = False,
+    dry_run: bool = False,
+    filters: CleanupFilter | None = None,
+) -> bool:
     """
     Clean running devices/emulators via ADB.
 
+    Args:
+        max_workers: Maximum number of devices cleaned at the same time
+        fused: Run each device's cleanup options as one device-side script
+        keep_data: Keep data and cache directories of uninstalled apps
+        dry_run: Only show how much each option would free, then stop
+        filters: Only delete files older or larger than these limits
+
     Returns:
         True if any cleaning was performed
     """
@@ -219,23 +269,26 @@ def clean_running_devices() -> bool:
         console.print("\n[yellow]No devices selected.[/yellow]")
         return False
 
-    # Get storage info for display
+    # Get storage info for display; reused as the device's "before" figures
     first_device = selected_devices[0]
     first_cleaner = DeviceCleaner(first_device)
-    storage_info = first_cleaner.client.get_storage_info()
+    storage_snapshot = first_cleaner.client.get_storage_snapshot()
 
     # Print header
-    print_header_row(storage_info)
+    print_header_row(storage_snapshot.primary)
     console.print()
 
     # Ask about app uninstallation
     apps_to_uninstall: dict[str, list[str]] = {}
 
-    want_uninstall = questionary.confirm(
-        "Do you want to uninstall any apps?",
-        default=False,
-        style=Style([("question", "fg:cyan bold")]),
-    ).ask()
+    want_uninstall = (
+        not dry_run
+        and questionary.confirm(
+            "Do you want to uninstall any apps?",
+            default=False,
+            style=Style([("question", "fg:cyan bold")]),
+        ).ask()
+    )
 
     if want_uninstall:
         for device in selected_devices:
@@ -252,6 +305,26 @@ def clean_running_devices() -> bool:
         console.print("\n[yellow]Nothing to clean.[/yellow]")
         return False
 
+    # Size every option's target on every device before deleting anything
+    engine = CleanupEngine(max_workers, fused=fused, keep_data=keep_data, filters=filters)
+    estimates = []
+    if selected_options:
+        with console.status("[bold cyan]Estimating reclaimable space...[/bold cyan]"):
+            estimates = engine.estimate(selected_devices, selected_options)
+        console.print()
+        console.print(create_estimate_table(estimates))
+        console.print(
+            f"  [bold white]Estimated total:[/bold white] "
+            f"[green]{format_size(sum(e.total for e in estimates))}[/green] "
+            "[dim](empty targets are skipped, ? = not readable)[/dim]"
+        )
+        if filters is not None and filters.is_active:
+            console.print("  [dim]Age/size filters apply; the real run may free less.[/dim]")
+
+    if dry_run:
+        console.print("\n[yellow]Dry run: nothing was deleted.[/yellow]")
+        return False
+
     # Confirmation
     total_apps = sum(len(apps) for apps in apps_to_uninstall.values())
     console.print()
@@ -267,54 +340,28 @@ def clean_running_devices() -> bool:
         console.print("\n[yellow]Cleanup cancelled.[/yellow]")
         return False
 
-    # Store results
-    storage_before: dict[str, StorageInfo] = {}
-    storage_after: dict[str, StorageInfo] = {}
-    all_cleanup_results: dict[str, list] = {}
-    all_uninstall_results: dict[str, list] = {}
-
-    # Get storage before
-    for device in selected_devices:
-        cleaner = DeviceCleaner(device)
-        storage_before[device.device_id] = cleaner.client.get_storage_info()
-
-    # Uninstall apps
-    if apps_to_uninstall:
-        console.print()
-        with create_progress_bar() as progress:
-            total_uninstalls = sum(len(apps) for apps in apps_to_uninstall.values())
-            task = progress.add_task("[cyan]Uninstalling apps...", total=total_uninstalls)
-
-            for device in selected_devices:
-                if device.device_id in apps_to_uninstall:
-                    cleaner = DeviceCleaner(device)
-                    uninstall_results = cleaner.uninstall_apps(
-                        apps_to_uninstall[device.device_id],
-                        lambda msg: progress.update(task, description=f"[cyan]{msg}"),
-                    )
-                    all_uninstall_results[device.device_id] = uninstall_results
-                    progress.advance(task, len(apps_to_uninstall[device.device_id]))
-
-    # Perform cleanup
-    if selected_options:
-        console.print()
-        total_ops = len(selected_devices) * len(selected_options)
-
-        with create_progress_bar() as progress:
-            task = progress.add_task("[cyan]Cleaning devices...", total=total_ops)
-
-            for device in selected_devices:
-                cleaner = DeviceCleaner(device)
-                cleanup_results = cleaner.run_all_cleanups(
-                    selected_options, lambda msg: progress.update(task, description=f"[cyan]{msg}")
-                )
-                all_cleanup_results[device.device_id] = cleanup_results
-                progress.advance(task, len(selected_options))
+    # Run every device's pipeline concurrently; progress is consumed here only
+    console.print()
+    total_apps_ops = sum(len(apps) for apps in apps_to_uninstall.values())
+    total_ops = len(selected_devices) * len(selected_options) + total_apps_ops
 
-    # Get storage after
-    for device in selected_devices:
-        cleaner = DeviceCleaner(device)
-        storage_after[device.device_id] = cleaner.client.get_storage_info()
+    with create_progress_bar() as progress:
+        task = progress.add_task("[cyan]Cleaning devices...", total=total_ops)
+
+        def on_progress(event: ProgressEvent) -> None:
+            if event.message:
+                progress.update(task, description=f"[cyan]{event.message}")
+            if event.advance:
+                progress.advance(task, event.advance)
+
+        summaries = engine.run(
+            selected_devices,
+            selected_options,
+            apps_to_uninstall,
+            on_progress,
+            storage_before={first_device.device_id: storage_snapshot},
+            estimates={estimate.device.device_id: estimate for estimate in estimates},
+        )
 
     # Print results
     console.print()
@@ -325,17 +372,16 @@ def clean_running_devices() -> bool:
     total_uninstall_success = 0
     total_uninstalls = 0
 
-    for device in selected_devices:
-        cleanup_results = all_cleanup_results.get(device.device_id, [])
-        uninstall_results = all_uninstall_results.get(device.device_id, [])
-
+    for summary in summaries:
         s, t, us, ut = print_device_results(
-            device,
-            cleanup_results,
-            uninstall_results,
-            storage_before.get(device.device_id, StorageInfo()),
-            storage_after.get(device.device_id, StorageInfo()),
+            summary.device,
+            summary.cleanup_results,
+            summary.uninstall_results,
+            summary.storage_before or StorageSnapshot(),
+            summary.storage_after or StorageSnapshot(),
         )
+        if summary.error:
+            console.print(f"  [red]✗[/red] Cleanup stopped early: [dim]{summary.error}[/dim]")
         total_success += s
         total_operations += t
         total_uninstall_success += us
@@ -349,21 +395,29 @@ def clean_running_devices() -> bool:
             total_operations,
             total_uninstall_success,
             total_uninstalls,
+            sum(summary.bytes_freed for summary in summaries),
         )
     )
 
     return True
 
 
-def clean_avd_files() -> bool:
+def clean_avd_files(
+    use_index: bool = True, defer: bool = False, policy: SnapshotPolicy | None = None
+) -> bool:
     """
     Clean AVD files (snapshots, cache) for offline emulators.
 
+    Args:
+        use_index: Reuse sizes of unchanged directories from the size index
+        defer: Move files to the trash and delete them in a background process
+        policy: Snapshots to keep and byte budgets (all snapshots are removed if omitted)
+
     Returns:
         True if any cleaning was performed
     """
     with console.status("[bold cyan]Scanning AVD files...[/bold cyan]"):
-        avds = get_avd_list()
+        avds = get_avd_list(use_index=use_index)
 
     if not avds:
         console.print("[yellow]No AVDs found.[/yellow]\n")
@@ -387,6 +441,16 @@ def clean_avd_files() -> bool:
         choices=[
             questionary.Choice("📸 Snapshots (frees most space)", value="snapshots", checked=True),
             questionary.Choice("🗑️ Cache files", value="cache", checked=True),
+            questionary.Choice(
+                "🧊 Sparsify disk images (release zero blocks, keeps data)",
+                value="sparsify",
+                checked=False,
+            ),
+            questionary.Choice(
+                "🗜️ Compact qcow2 overlays (rewrite without unused clusters)",
+                value="qcow2",
+                checked=False,
+            ),
         ],
         style=CUSTOM_STYLE,
     ).ask()
@@ -414,38 +478,311 @@ def clean_avd_files() -> bool:
 
     # Perform cleanup
     console.print()
-    total_freed = 0
+    cleanable = [avd for avd in selected_avds if not avd.is_running]
+    clean_snapshots = "snapshots" in avd_clean_options
+    clean_cache = "cache" in avd_clean_options
+    expected = sum(
+        (avd.allocated.snapshots if clean_snapshots else 0)
+        + (avd.allocated.cache if clean_cache else 0)
+        for avd in cleanable
+    )
 
     with create_progress_bar() as progress:
-        task = progress.add_task(
-            "[cyan]Cleaning AVDs...", total=len(selected_avds) * len(avd_clean_options)
+        task = progress.add_task("[cyan]Cleaning AVDs...", total=expected)
+
+        def on_progress(path: str, result: DeletionResult) -> None:
+            progress.update(
+                task,
+                advance=result.bytes_freed,
+                description=f"[cyan]Cleaning AVDs... {os.path.basename(path)}",
+            )
+
+        result = clean_avds(
+            cleanable,
+            snapshots=clean_snapshots,
+            cache=clean_cache,
+            on_progress=on_progress,
+            defer=defer,
+            policy=policy,
         )
+        progress.update(task, completed=expected)
+        total_freed = result.bytes_freed
+
+        if "sparsify" in avd_clean_options:
+            sparsify_task = progress.add_task("[cyan]Sparsifying disk images...", total=None)
+
+            def on_compacted(compaction: CompactionResult) -> None:
+                name = os.path.basename(compaction.path)
+                progress.update(
+                    sparsify_task, advance=1, description=f"[cyan]Sparsifying disk images... {name}"
+                )
+
+            compactions = sparsify_avd_images(cleanable, on_progress=on_compacted)
+            progress.update(sparsify_task, total=len(compactions), completed=len(compactions))
+            total_freed += sum(compaction.bytes_freed for compaction in compactions)
 
-        for avd in selected_avds:
-            if "snapshots" in avd_clean_options:
-                progress.update(task, description=f"[cyan]{avd.name}: snapshots...")
-                _, _, freed = clean_avd_snapshots(avd)
-                total_freed += freed
-                progress.advance(task)
+        overlays: dict[str, list[CompactionResult]] = {}
+        if "qcow2" in avd_clean_options:
+            qcow2_task = progress.add_task("[cyan]Compacting qcow2 overlays...", total=None)
+
+            def on_overlay(compaction: CompactionResult) -> None:
+                name = os.path.basename(compaction.path)
+                progress.update(
+                    qcow2_task, advance=1, description=f"[cyan]Compacting qcow2 overlays... {name}"
+                )
 
-            if "cache" in avd_clean_options:
-                progress.update(task, description=f"[cyan]{avd.name}: cache...")
-                _, _, freed = clean_avd_cache(avd)
-                total_freed += freed
-                progress.advance(task)
+            overlays = compact_avd_overlays(cleanable, on_progress=on_overlay)
+            done = sum(len(results) for results in overlays.values())
+            progress.update(qcow2_task, total=done, completed=done)
+            total_freed += sum(r.bytes_freed for results in overlays.values() for r in results)
 
     # Results
     console.print()
     console.print(create_avd_result_panel(format_size(total_freed)))
+    for avd_name, results in overlays.items():
+        reclaimed = sum(overlay.bytes_freed for overlay in results)
+        console.print(
+            f"  [cyan]{avd_name}[/cyan] overlays: [green]{format_size(reclaimed)}[/green]"
+        )
+        for overlay in results:
+            if not overlay.success:
+                console.print(f"    [dim]{os.path.basename(overlay.path)}: {overlay.error}[/dim]")
+    if defer:
+        console.print("[dim]Deleting moved files in the background.[/dim]")
     return True
 
 
-def main() -> None:
+def list_avd_snapshots() -> None:
+    """Print every snapshot of each AVD with its size, last use and metadata."""
+    with console.status("[bold cyan]Reading AVD snapshots...[/bold cyan]"):
+        avd_home = get_avd_home()
+        avd_dirs = sorted(avd_home.glob("*.avd")) if avd_home else []
+        listings = [(avd_dir.stem, list_snapshots(str(avd_dir))) for avd_dir in avd_dirs]
+
+    listings = [(name, snapshots) for name, snapshots in listings if snapshots]
+    if not listings:
+        console.print("[yellow]No AVD snapshots found.[/yellow]\n")
+        return
+
+    for name, snapshots in listings:
+        console.print(f"[bold cyan]💾 {name}[/bold cyan]")
+        console.print(create_snapshot_table(snapshots))
+        console.print()
+
+
+def dedupe_avds(dry_run: bool = False) -> None:
+    """
+    Share identical files across stopped AVDs and print what was shared.
+
+    Args:
+        dry_run: Only report what could be shared
+    """
+    with console.status("[bold cyan]Looking for identical AVD files...[/bold cyan]"):
+        result = dedupe_avd_home(dry_run=dry_run)
+
+    if not result.files and result.success:
+        console.print("[yellow]No identical AVD files found.[/yellow]\n")
+        return
+
+    verb = "Could share" if dry_run else "Shared"
+    console.print(
+        f"[bold green]{verb} {result.shared_text}[/bold green] "
+        f"[dim]({result.files} file(s) in {result.groups} group(s))[/dim]"
+    )
+    for error in result.errors:
+        console.print(f"  [red]✗[/red] [dim]{error}[/dim]")
+    console.print()
+
+
+def _size_arg(text: str) -> int:
+    """Parse a size argument such as ``2G`` or ``500M`` into bytes."""
+    size = parse_size(text)
+    if size is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+    return size
+
+
+def snapshot_policy(args: argparse.Namespace) -> SnapshotPolicy:
+    """
+    Build the snapshot eviction policy from command line arguments.
+
+    Args:
+        args: Parsed arguments
+
+    Returns:
+        SnapshotPolicy object
+    """
+    return SnapshotPolicy(
+        keep=SnapshotKeep(args.keep_snapshot),
+        budget=args.snapshot_budget,
+        per_avd_budget=args.snapshot_budget_per_avd,
+    )
+
+
+def watch_devices() -> None:
+    """Print device connect, disconnect and status changes until interrupted."""
+    tracker = DeviceTracker()
+    events: queue.Queue[DeviceEvent] = queue.Queue()
+    tracker.subscribe(events.put)
+
+    if not tracker.start():
+        tracker.stop()
+        console.print("[bold red]Error:[/bold red] Could not reach the adb server.")
+        return
+
+    # Drop the events for devices that were already connected
+    while not events.empty():
+        events.get_nowait()
+
+    snapshot = tracker.snapshot()
+    if snapshot:
+        for entry in snapshot:
+            console.print(f"  [cyan]{entry['serial']}[/cyan] [dim]{entry['status']}[/dim]")
+    else:
+        console.print("[yellow]No devices connected.[/yellow]")
+    console.print("\n[dim]Watching for device changes (Ctrl+C to stop)...[/dim]\n")
+
+    styles = {
+        DeviceEventType.ADDED: "[green]+[/green]",
+        DeviceEventType.REMOVED: "[red]-[/red]",
+        DeviceEventType.CHANGED: "[yellow]~[/yellow]",
+    }
+    try:
+        while True:
+            try:
+                event = events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            status = event.status
+            if event.previous_status and event.event_type != DeviceEventType.ADDED:
+                status = f"{event.previous_status} → {event.status}"
+            console.print(
+                f"  {styles[event.event_type]} [cyan]{event.serial}[/cyan] [dim]{status}[/dim]"
+            )
+    except KeyboardInterrupt:
+        console.print()
+    finally:
+        tracker.stop()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Args:
+        argv: Argument list (defaults to sys.argv)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="android-emulator-cleaner",
+        description="Clean up Android emulator storage without losing your data.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        metavar="N",
+        help=f"maximum number of devices cleaned in parallel (default: {DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        help="run all cleanup options on a device as a single shell script",
+    )
+    parser.add_argument(
+        "--keep-data",
+        action="store_true",
+        help="keep data and cache directories of uninstalled apps (pm uninstall -k)",
+    )
+    parser.add_argument(
+        "--older-than",
+        type=int,
+        metavar="DAYS",
+        help="only delete device files last modified more than DAYS days ago",
+    )
+    parser.add_argument(
+        "--larger-than",
+        type=_size_arg,
+        metavar="SIZE",
+        help="only delete device files larger than SIZE (e.g. 10M)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="size every AVD from scratch instead of reusing the size index",
+    )
+    parser.add_argument(
+        "--defer",
+        action="store_true",
+        help="move AVD files to a trash directory and delete them in the background",
+    )
+    parser.add_argument(
+        "--keep-snapshot",
+        choices=[keep.value for keep in SnapshotKeep],
+        default=SnapshotKeep.NONE.value,
+        help="snapshot of each AVD that is never removed (default: none)",
+    )
+    parser.add_argument(
+        "--snapshot-budget",
+        type=_size_arg,
+        metavar="SIZE",
+        help="remove least recently used snapshots until all AVDs fit in SIZE (e.g. 4G)",
+    )
+    parser.add_argument(
+        "--snapshot-budget-per-avd",
+        type=_size_arg,
+        metavar="SIZE",
+        help="remove least recently used snapshots until each AVD fits in SIZE",
+    )
+    parser.add_argument(
+        "--list-snapshots",
+        action="store_true",
+        help="list the snapshots of every AVD, then exit",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="replace identical files across stopped AVDs with reflinks, then exit",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report how much would be freed (device cleanup) or shared (--dedupe)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="watch devices connect, disconnect and change state, then exit on Ctrl+C",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
     """Main entry point for the CLI."""
+    args = parse_args(argv)
+
     console.clear()
     console.print(create_header_panel())
     console.print()
 
+    if args.watch:
+        watch_devices()
+        return
+
+    if args.list_snapshots:
+        list_avd_snapshots()
+        return
+
+    if args.dedupe:
+        dedupe_avds(dry_run=args.dry_run)
+        return
+
+    # Finish deleting files an earlier --defer run left in the trash
+    resume_avd_trash()
+
     # Choose cleanup mode
     mode = questionary.checkbox(
         "What would you like to clean?",
@@ -473,12 +810,23 @@ def main() -> None:
 
     if "running" in mode:
         print_section_header("Running Devices")
-        if clean_running_devices():
+        if clean_running_devices(
+            max_workers=args.jobs,
+            fused=args.fused,
+            keep_data=args.keep_data,
+            dry_run=args.dry_run,
+            filters=CleanupFilter(args.older_than, args.larger_than),
+        ):
             cleaned_something = True
 
-    if "avd" in mode:
+    if "avd" in mode and args.dry_run:
+        print_section_header("AVD Files")
+        console.print("[yellow]Dry run: AVD cleanup skipped.[/yellow]")
+    elif "avd" in mode:
         print_section_header("AVD Files")
-        if clean_avd_files():
+        if clean_avd_files(
+            use_index=not args.no_cache, defer=args.defer, policy=snapshot_policy(args)
+        ):
             cleaned_something = True
 
     if cleaned_something:
@@ -489,6 +837,9 @@ def main() -> None:
 
 def run() -> None:
     """Entry point wrapper with error handling."""
+    # Validate arguments (and answer --help) before requiring ADB
+    parse_args()
+
     try:
         # Check ADB availability before starting
         if not check_adb_available():
@@ -7,29 +7,77 @@ from .adb import (
     check_adb_available,
     get_connected_devices,
 )
+from .aio import AsyncADBClient, AsyncDeviceCleaner, ConcurrencyLimiter
 from .avd import (
     clean_avd_cache,
+    clean_avd_images,
     clean_avd_snapshots,
+    clean_avds,
+    compact_avd_overlays,
+    dedupe_avd_home,
     format_size,
+    get_avd_home,
     get_avd_list,
     get_dir_size,
     get_total_avd_stats,
+    resume_avd_trash,
+    scan_avd_sizes,
+    sparsify_avd_images,
 )
 from .cleaner import CLEANUP_OPTIONS, DeviceCleaner, get_cleanup_options
+from .dedupe import dedupe_files
+from .delete import DeletionEngine, remove_path
+from .engine import DEFAULT_MAX_WORKERS, CleanupEngine
+from .index import SizeIndex
+from .protocol import ADBServer, ADBServerError, get_default_server
+from .qcow2 import compact_qcow2
+from .session import DeviceSession
+from .snapshots import list_snapshots, parse_snapshot_pb, plan_evictions
+from .sparsify import sparsify_image
+from .tracker import DeviceTracker
+from .usage import disk_usage
 
 __all__ = [
+    "DEFAULT_MAX_WORKERS",
     "ADBClient",
     "ADBError",
     "ADBNotFoundError",
+    "ADBServer",
+    "ADBServerError",
+    "AsyncADBClient",
+    "AsyncDeviceCleaner",
     "CLEANUP_OPTIONS",
+    "CleanupEngine",
+    "ConcurrencyLimiter",
+    "DeletionEngine",
     "DeviceCleaner",
+    "DeviceSession",
+    "DeviceTracker",
+    "SizeIndex",
     "check_adb_available",
     "clean_avd_cache",
+    "clean_avd_images",
     "clean_avd_snapshots",
+    "clean_avds",
+    "compact_avd_overlays",
+    "compact_qcow2",
+    "dedupe_avd_home",
+    "dedupe_files",
+    "disk_usage",
     "format_size",
+    "get_avd_home",
     "get_avd_list",
     "get_cleanup_options",
     "get_connected_devices",
+    "get_default_server",
     "get_dir_size",
     "get_total_avd_stats",
+    "list_snapshots",
+    "parse_snapshot_pb",
+    "plan_evictions",
+    "remove_path",
+    "resume_avd_trash",
+    "scan_avd_sizes",
+    "sparsify_avd_images",
+    "sparsify_image",
 ]
@@ -8,13 +8,24 @@ import shlex
 import shutil
 import subprocess
 import sys
-import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
-from ..models import Device, DeviceType, StorageInfo
+from ..models import AppStorage, Device, DeviceType, StorageInfo, StorageSnapshot
+from .protocol import ADBServer, ADBServerError, get_default_server
+from .script import build_script, new_marker, parse_script_output
+from .session import NOT_SENT, DeviceSession
+
+if TYPE_CHECKING:
+    from .tracker import DeviceTracker
 
 # Detect platform
 IS_WINDOWS = sys.platform == "win32"
 
+# Paths probed for storage info; the first one is the headline figure
+STORAGE_MOUNTS = ("/data", "/sdcard", "/cache", "/data/local/tmp")
+
 
 class ADBError(Exception):
     """Exception raised for ADB-related errors."""
@@ -48,19 +59,49 @@ def check_adb_available() -> bool:
     return find_adb() is not None
 
 
+def parse_adb_command(command: str) -> tuple[str | None, list[str]]:
+    """
+    Split an adb command line into its target device and arguments.
+
+    Args:
+        command: Command line, with or without the leading "adb"
+
+    Returns:
+        Tuple of (device_id from an explicit "-s <serial>" or None, arguments)
+    """
+    cmd_args = command[4:].strip() if command.startswith("adb ") else command
+
+    # Parse arguments: simple split on Windows, shlex for proper parsing on Unix
+    args = cmd_args.split() if IS_WINDOWS else shlex.split(cmd_args)
+
+    if len(args) >= 2 and args[0] == "-s":
+        return args[1], args[2:]
+    return None, args
+
+
 class ADBClient:
-    """Client for executing ADB commands."""
+    """
+    Client for executing ADB commands.
+
+    Shell commands run in the attached ``DeviceSession`` when one is open.
+    Otherwise commands are sent straight to the local adb server over its
+    socket protocol when it is reachable, and fall back to running the
+    ``adb`` executable.
+    """
 
     DEFAULT_TIMEOUT = 30
 
-    def __init__(self, device_id: str | None = None):
+    def __init__(self, device_id: str | None = None, server: ADBServer | None = None):
         """
         Initialize ADB client.
 
         Args:
             device_id: Optional device ID to target specific device
+            server: adb server client to use (defaults to the shared one)
         """
         self.device_id = device_id
+        self.server = server or get_default_server()
+        self.session: DeviceSession | None = None
         self._adb_path: str | None = None
 
     @property
@@ -89,24 +130,51 @@ class ADBClient:
         Returns:
             Tuple of (success, output)
         """
-        target_device = device_id or self.device_id
+        command_device, args = parse_adb_command(command)
+        target_device = command_device or device_id or self.device_id
+
+        shell_command = _as_shell_command(args)
+        if shell_command is not None:
+            direct_result = self._run_shell_direct(shell_command, target_device, timeout)
+            if direct_result is not None:
+                return direct_result
+        elif self.server.is_available():
+            native_result = self._run_native(args, target_device, timeout)
+            if native_result is not None:
+                return native_result
+
+        return self._run_subprocess(args, target_device, timeout)
+
+    def run_script(self, script: str, timeout: int = DEFAULT_TIMEOUT) -> tuple[bool, str]:
+        """
+        Run a (multi-line) shell script on the device verbatim.
 
-        # Build command list for safer execution
-        cmd_args = command[4:].strip() if command.startswith("adb ") else command
+        Unlike ``shell()``, the script is not split into arguments locally,
+        so its quoting reaches the device shell untouched.
+
+        Args:
+            script: Shell script to execute
+            timeout: Command timeout
 
+        Returns:
+            Tuple of (success, output)
+        """
+        direct_result = self._run_shell_direct(script, self.device_id, timeout)
+        if direct_result is not None:
+            return direct_result
+        return self._run_subprocess(["shell", script], self.device_id, timeout)
+
+    def _run_subprocess(
+        self, args: list[str], device_id: str | None, timeout: int
+    ) -> tuple[bool, str]:
+        """Run a command by spawning the adb executable."""
         # Build the command as a list
         cmd_list = [self.adb_path]
 
-        if target_device:
-            cmd_list.extend(["-s", target_device])
+        if device_id:
+            cmd_list.extend(["-s", device_id])
 
-        # Parse remaining arguments
-        if IS_WINDOWS:
-            # On Windows, use simple split for basic commands
-            cmd_list.extend(cmd_args.split())
-        else:
-            # On Unix, use shlex for proper parsing
-            cmd_list.extend(shlex.split(cmd_args))
+        cmd_list.extend(args)
 
         try:
             result = subprocess.run(cmd_list, capture_output=True, text=True, timeout=timeout)
@@ -120,6 +188,98 @@ class ADBClient:
         except Exception as e:
             return False, str(e)
 
+    def _run_shell_direct(
+        self, shell_command: str, device_id: str | None, timeout: int
+    ) -> tuple[bool, str] | None:
+        """
+        Run a shell command without spawning adb.
+
+        Uses the open session for the device if there is one, then the adb
+        server socket.
+
+        Returns:
+            Tuple of (success, output), or None if neither is usable
+        """
+        session = self.session
+        if session is not None and session.is_open and device_id == session.device_id:
+            exit_code, output = session.run(shell_command, timeout)
+            # Only a command that never reached the shell may be sent again;
+            # anything else may already have run (e.g. pm uninstall)
+            if exit_code != NOT_SENT:
+                output = output.strip()
+                return exit_code == 0 or "not installed" in output.lower(), output
+
+        if not self.server.is_available():
+            return None
+
+        try:
+            exit_code, stdout, stderr = self.server.shell(device_id, shell_command, timeout)
+        except ADBServerError as e:
+            return False, f"error: {e}"
+        except TimeoutError:
+            return False, "Command timed out"
+        except OSError:
+            # Server went away; use the executable from now on
+            self.server.mark_unavailable()
+            return None
+
+        output = stdout.strip() or stderr.strip()
+        success = exit_code == 0 or "not installed" in output.lower()
+        return success, output
+
+    def _run_native(
+        self, args: list[str], device_id: str | None, timeout: int
+    ) -> tuple[bool, str] | None:
+        """
+        Run a host or device service command through the adb server socket.
+
+        Args:
+            args: Command arguments without the leading "adb"
+            device_id: Target device ID
+            timeout: Command timeout in seconds
+
+        Returns:
+            Tuple of (success, output), or None if the command has no
+            native equivalent or the server could not be reached
+        """
+        try:
+            if args and args[0] == "devices":
+                listing = self.server.devices(long="-l" in args[1:])
+                return True, f"List of devices attached\n{listing}".strip()
+
+            if args == ["root"]:
+                output = self.server.root(device_id, timeout).strip()
+                if is_root_restarting(output) and not wait_for_root_restart(
+                    device_id, self.server, timeout
+                ):
+                    return False, "error: device did not come back after adbd restarted"
+                return parse_root_output(output) is True, output
+        except ADBServerError as e:
+            return False, f"error: {e}"
+        except TimeoutError:
+            return False, "Command timed out"
+        except OSError:
+            self.server.mark_unavailable()
+
+        return None
+
+    def open_session(self) -> bool:
+        """
+        Open a persistent shell session for this client's device.
+
+        Returns:
+            True if the session is ready
+        """
+        if self.session is None:
+            self.session = DeviceSession(self)
+        return self.session.open()
+
+    def close_session(self) -> None:
+        """Close the persistent shell session, if any."""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
     def shell(self, command: str, timeout: int = DEFAULT_TIMEOUT) -> tuple[bool, str]:
         """
         Execute a shell command on the device.
@@ -146,6 +306,16 @@ class ADBClient:
         success, output = self.shell(f"getprop {prop}")
         return output.strip() if success else "Unknown"
 
+    def get_properties(self) -> dict[str, str]:
+        """
+        Get all system properties from the device in one call.
+
+        Returns:
+            Dict of property name to value (empty on failure)
+        """
+        success, output = self.shell("getprop")
+        return parse_getprop_output(output) if success else {}
+
     def enable_root(self) -> bool:
         """
         Enable root access on the device.
@@ -154,15 +324,8 @@ class ADBClient:
             True if root access is available
         """
         success, output = self.run_command("adb root")
-
-        if success or "already running as root" in output.lower():
-            return True
-
-        if "restarting adbd as root" in output.lower():
-            time.sleep(1)
-            return True
-
-        return False
+        rooted = parse_root_output(output)
+        return success if rooted is None else rooted
 
     def get_storage_info(self) -> StorageInfo:
         """
@@ -171,22 +334,79 @@ class ADBClient:
         Returns:
             StorageInfo object
         """
-        success, output = self.shell("df -h /data")
+        success, output = self.shell("df -k /data")
         if success and output:
             return StorageInfo.from_df_output(output)
         return StorageInfo()
 
-    def uninstall_package(self, package: str) -> tuple[bool, str]:
+    def get_storage_snapshot(self, mounts: tuple[str, ...] = STORAGE_MOUNTS) -> StorageSnapshot:
+        """
+        Get byte counts of several mount points in one shell call.
+
+        Args:
+            mounts: Paths to probe
+
+        Returns:
+            StorageSnapshot with an entry for each path df could report on
+        """
+        marker = new_marker()
+        _, output = self.run_script(build_storage_script(mounts, marker))
+        return parse_storage_output(output, mounts, marker)
+
+    def measure_paths(self, paths: list[str]) -> list[int | None]:
+        """
+        Get the disk usage of several device paths in one shell call.
+
+        Paths may contain shell globs; the sizes of all matches are added up.
+
+        Args:
+            paths: Device paths (empty strings are skipped)
+
+        Returns:
+            Bytes used by each path (0 if nothing matches), or None where
+            the size couldn't be read
+        """
+        targets = [index for index, path in enumerate(paths) if path]
+        sizes: list[int | None] = [None] * len(paths)
+        if not targets:
+            return sizes
+
+        marker = new_marker()
+        _, output = self.run_script(
+            build_du_script([paths[index] for index in targets], marker),
+            timeout=self.DEFAULT_TIMEOUT * len(targets),
+        )
+        for index, step in zip(targets, parse_script_output(output, len(targets), marker)):
+            if step is not None:
+                sizes[index] = parse_du_output(step.output, step.success)
+        return sizes
+
+    def uninstall_package(self, package: str, keep_data: bool = False) -> tuple[bool, str]:
         """
         Uninstall an application.
 
         Args:
             package: Package name to uninstall
+            keep_data: Keep the app's data and cache directories
 
         Returns:
             Tuple of (success, output)
         """
-        return self.run_command(f"adb uninstall {package}")
+        flag = "-k " if keep_data else ""
+        return self.run_command(f"adb uninstall {flag}{package}")
+
+    def get_app_storage(self) -> dict[str, AppStorage]:
+        """
+        Get the space used by every installed app in one ``dumpsys`` call.
+
+        Returns:
+            Dict of package name to AppStorage (empty if the device has no
+            app size statistics yet)
+        """
+        success, output = self.shell("dumpsys diskstats", timeout=self.DEFAULT_TIMEOUT * 2)
+        if not success or not output:
+            return {}
+        return parse_diskstats_output(output.split("\n"))
 
     def list_packages(self, third_party_only: bool = True) -> list[str]:
         """
@@ -204,49 +424,370 @@ class ADBClient:
         if not success or not output:
             return []
 
-        packages = []
-        for line in output.strip().split("\n"):
-            if line.startswith("package:"):
-                package_name = line.replace("package:", "").strip()
-                if package_name:
-                    packages.append(package_name)
+        return parse_packages_output(output)
 
-        return sorted(packages)
 
+def _as_shell_command(args: list[str]) -> str | None:
+    """
+    Translate adb arguments into the equivalent device shell command.
+
+    Args:
+        args: Command arguments without the leading "adb"
 
-def get_connected_devices() -> list[Device]:
+    Returns:
+        Shell command line, or None if the command is not a shell command
     """
-    Get list of all connected devices/emulators.
+    if len(args) < 2:
+        return None
+    if args[0] == "shell":
+        return " ".join(args[1:])
+    if args[0] == "uninstall":
+        return "pm uninstall " + " ".join(args[1:])
+    return None
+
+
+def parse_root_output(output: str) -> bool | None:
+    """
+    Classify the reply to ``adb root``.
+
+    Args:
+        output: Message printed by adbd (or the adb client)
 
     Returns:
-        List of Device objects
+        True if adbd is (or is restarting as) root, False if it can't run as
+        root (e.g. on production builds), None if the reply is unknown
     """
-    client = ADBClient()
-    success, output = client.run_command("adb devices -l")
+    reply = output.lower()
+    if "cannot run as root" in reply:
+        return False
+    if "restarting adbd as root" in reply or "already running as root" in reply:
+        return True
+    return None
 
-    if not success:
-        return []
 
-    devices = []
-    lines = output.strip().split("\n")[1:]  # Skip header
+def is_root_restarting(output: str) -> bool:
+    """Check if a reply to ``adb root`` means adbd is restarting."""
+    return "restarting adbd as root" in output.lower()
 
-    for line in lines:
-        if not line.strip() or "device" not in line:
-            continue
 
+def wait_for_root_restart(
+    device_id: str | None, server: ADBServer | None = None, timeout: float = 30
+) -> bool:
+    """
+    Wait for a device to come back after adbd restarted as root.
+
+    Args:
+        device_id: Device serial
+        server: adb server client (defaults to the shared one)
+        timeout: Time limit in seconds
+
+    Returns:
+        True once the device is back (or if there is no server to ask; the
+        adb client already waits for the reconnect itself)
+    """
+    server = server or get_default_server()
+    if not server.is_available():
+        return True
+    return server.wait_for_restart(device_id, timeout)
+
+
+def parse_devices_output(output: str) -> list[dict[str, str]]:
+    """
+    Parse ``adb devices -l`` output.
+
+    Args:
+        output: Command output, with or without the header line
+
+    Returns:
+        One dict per device with "serial", "status" and any key:value
+        fields (model, product, device, transport_id, ...)
+    """
+    entries = []
+    for line in output.strip().split("\n"):
         parts = line.split()
-        if len(parts) < 2:
+        if len(parts) < 2 or line.startswith("List of devices") or line.startswith("*"):
             continue
 
-        device_id = parts[0]
-        status = parts[1]
+        entry = {"serial": parts[0], "status": parts[1]}
+        for field in parts[2:]:
+            key, sep, value = field.partition(":")
+            if sep:
+                entry[key] = value
+        entries.append(entry)
+    return entries
+
+
+def parse_getprop_output(output: str) -> dict[str, str]:
+    """
+    Parse the full ``getprop`` dump.
+
+    Args:
+        output: Lines of the form "[name]: [value]"
+
+    Returns:
+        Dict of property name to value
+    """
+    props = {}
+    for line in output.split("\n"):
+        name, sep, value = line.strip().partition("]: [")
+        if sep and name.startswith("[") and value.endswith("]"):
+            props[name[1:]] = value[:-1]
+    return props
+
 
-        if status != "device":
+def build_storage_script(mounts: tuple[str, ...], marker: str) -> str:
+    """
+    Build a script that runs ``df -k`` on each mount point.
+
+    Args:
+        mounts: Paths to probe
+        marker: Marker from ``new_marker()``
+
+    Returns:
+        Script text
+    """
+    return build_script([f"df -k {shlex.quote(mount)}" for mount in mounts], marker)
+
+
+def parse_storage_output(output: str, mounts: tuple[str, ...], marker: str) -> StorageSnapshot:
+    """
+    Parse the output of a ``build_storage_script()`` script.
+
+    Args:
+        output: Script output
+        mounts: Paths the script probed, in order
+        marker: Marker the script was built with
+
+    Returns:
+        StorageSnapshot without the paths df failed on
+    """
+    snapshot = StorageSnapshot()
+    for mount, step in zip(mounts, parse_script_output(output, len(mounts), marker)):
+        if step is None or not step.success:
             continue
+        info = StorageInfo.from_df_output(step.output)
+        if info.total is not None:
+            snapshot.mounts[mount] = info
+    return snapshot
+
+
+def _glob_base(path: str) -> str | None:
+    """Get the directory a glob is expanded in, or None if the path has no glob."""
+    parts = path.split("/")
+    for index, part in enumerate(parts):
+        if any(char in part for char in "*?["):
+            return "/".join(parts[:index]) or "/"
+    return None
+
+
+def du_command(path: str) -> str:
+    """
+    Build a shell command printing ``du -sk`` sizes for a device path.
+
+    A path ending in ``/*`` is measured through ``find`` on its directory,
+    so an emptied directory reports nothing instead of an unexpanded glob
+    (dotfiles are left out, as the shell glob would). A path that doesn't
+    exist, or a glob matching nothing in a directory that can be listed,
+    succeeds without output; anything else that can't be read fails.
+
+    Args:
+        path: Device path, may contain shell globs
+
+    Returns:
+        Shell command line
+    """
+    contents = path.endswith("/*")
+    root = path[:-2] if contents else path
+    if contents:
+        measure = "find \"$_aec_d\" -mindepth 1 -maxdepth 1 ! -name '.*' -exec du -sk {} +"
+    else:
+        measure = 'du -sk "$_aec_d"'
+
+    base = _glob_base(root)
+    if base is None:
+        missing = "continue"
+    else:
+        missing = f"{{ ls {shlex.quote(base)} >/dev/null || _aec_f=1; continue; }}"
+    return (
+        f"_aec_f=0; for _aec_d in {root}; do "
+        f'[ -e "$_aec_d" ] || {missing}; {measure} || _aec_f=1; '
+        "done; [ $_aec_f = 0 ]"
+    )
+
+
+def build_du_script(paths: list[str], marker: str) -> str:
+    """
+    Build a script that measures each path with ``du_command()``.
+
+    Args:
+        paths: Device paths
+        marker: Marker from ``new_marker()``
+
+    Returns:
+        Script text
+    """
+    return build_script([du_command(path) for path in paths], marker)
+
 
-        # Create device-specific client for property queries
-        device_client = ADBClient(device_id)
+def parse_du_output(output: str, success: bool = True) -> int | None:
+    """
+    Add up the sizes in ``du -sk`` output.
+
+    Error lines are ignored as long as some size was reported. If the only
+    errors are missing paths, there is nothing to measure and the size is 0.
+
+    Args:
+        output: Lines of the form "<KiB><whitespace><path>"
+        success: Whether the command exited with status 0
+
+    Returns:
+        Total bytes, or None if it failed without reporting any size
+    """
+    total = 0
+    found = False
+    errors = []
+    for line in output.split("\n"):
+        size = line.split(None, 1)[0] if line.strip() else ""
+        if size.isdigit():
+            total += int(size) * 1024
+            found = True
+        elif line.strip():
+            errors.append(line)
+    if found or success:
+        return total
+    if errors and all("No such file" in line for line in errors):
+        return 0
+    return None
+
+
+# dumpsys diskstats lines holding per-app arrays, and the AppStorage fields they fill
+_DISKSTATS_ARRAYS = {
+    "Package Names": "package",
+    "App Sizes": "app_size",
+    "App Data Sizes": "data_size",
+    "Cache Sizes": "cache_size",
+}
+
+
+def _iter_array_items(text: str) -> Iterator[str]:
+    """Yield the items of a ``["a","b"]`` or ``[1,2]`` array without building a list."""
+    start = text.find("[") + 1
+    end = text.rfind("]")
+    if start <= 0 or end < start:
+        return
+    pos = start
+    while pos < end:
+        comma = text.find(",", pos, end)
+        stop = end if comma < 0 else comma
+        item = text[pos:stop].strip().strip('"')
+        if item:
+            yield item
+        pos = stop + 1
+
+
+def parse_diskstats_output(lines: Iterable[str]) -> dict[str, AppStorage]:
+    """
+    Parse per-app sizes from ``dumpsys diskstats`` output.
+
+    Lines are consumed one at a time and everything but the per-app
+    arrays (``Package Names``, ``App Sizes``, ``App Data Sizes`` and
+    ``Cache Sizes``) is skipped, so the output can be streamed in.
+
+    Args:
+        lines: Output lines
+
+    Returns:
+        Dict of package name to AppStorage (empty if the arrays are missing
+        or don't line up)
+    """
+    packages: list[str] = []
+    sizes: dict[str, list[int]] = {}
+    for line in lines:
+        name, sep, value = line.partition(":")
+        field = _DISKSTATS_ARRAYS.get(name.strip()) if sep else None
+        if field == "package":
+            packages = list(_iter_array_items(value))
+        elif field is not None:
+            try:
+                sizes[field] = [int(item) for item in _iter_array_items(value)]
+            except ValueError:
+                return {}
+
+    if not packages or any(len(values) != len(packages) for values in sizes.values()):
+        return {}
+
+    zeros = [0] * len(packages)
+    return {
+        package: AppStorage(package, app_size, data_size, cache_size)
+        for package, app_size, data_size, cache_size in zip(
+            packages,
+            sizes.get("app_size", zeros),
+            sizes.get("data_size", zeros),
+            sizes.get("cache_size", zeros),
+        )
+    }
+
+
+def parse_packages_output(output: str) -> list[str]:
+    """
+    Parse ``pm list packages`` output.
 
+    Args:
+        output: Lines of the form "package:<name>"
+
+    Returns:
+        Sorted list of package names
+    """
+    packages = []
+    for line in output.strip().split("\n"):
+        if line.startswith("package:"):
+            package_name = line.replace("package:", "").strip()
+            if package_name:
+                packages.append(package_name)
+
+    return sorted(packages)
+
+
+def get_connected_devices(
+    max_workers: int = 8, tracker: "DeviceTracker | None" = None
+) -> list[Device]:
+    """
+    Get list of all connected devices/emulators.
+
+    Devices are built from the ``adb devices -l`` fields (or from a running
+    tracker's registry, which needs no round trip); the model name, Android
+    version and SDK level come from a single ``getprop`` dump per device,
+    fetched for all devices in parallel.
+
+    Args:
+        max_workers: Maximum number of devices queried at once
+        tracker: Optional running DeviceTracker to read the device list from
+
+    Returns:
+        List of Device objects
+    """
+    if tracker is not None and tracker.is_ready:
+        entries = tracker.online()
+    else:
+        client = ADBClient()
+        success, output = client.run_command("adb devices -l")
+
+        if not success:
+            return []
+
+        entries = [entry for entry in parse_devices_output(output) if entry["status"] == "device"]
+    if not entries:
+        return []
+
+    def fetch_properties(serial: str) -> dict[str, str]:
+        return ADBClient(serial).get_properties()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(entries)))) as pool:
+        all_props = list(pool.map(fetch_properties, [entry["serial"] for entry in entries]))
+
+    devices = []
+    for entry, props in zip(entries, all_props):
+        device_id = entry["serial"]
         device_type = (
             DeviceType.EMULATOR if device_id.startswith("emulator") else DeviceType.PHYSICAL
         )
@@ -254,11 +795,15 @@ def get_connected_devices() -> list[Device]:
         devices.append(
             Device(
                 device_id=device_id,
-                status=status,
+                status=entry["status"],
                 device_type=device_type,
-                model=device_client.get_property("ro.product.model"),
-                android_version=device_client.get_property("ro.build.version.release"),
-                sdk_version=device_client.get_property("ro.build.version.sdk"),
+                # getprop keeps the real name; devices -l swaps spaces for "_"
+                model=props.get("ro.product.model") or entry.get("model") or "Unknown",
+                android_version=props.get("ro.build.version.release", "Unknown"),
+                sdk_version=props.get("ro.build.version.sdk", "Unknown"),
+                product=entry.get("product", ""),
+                device_name=entry.get("device", ""),
+                transport_id=entry.get("transport_id", ""),
             )
         )
 
@@ -0,0 +1,476 @@
+"""
+Asyncio ADB operations module.
+
+This module provides asyncio counterparts of ``ADBClient`` and
+``DeviceCleaner`` built on ``asyncio.create_subprocess_exec``, so cleanup
+can be embedded in an event loop without wrapping blocking calls in threads.
+"""
+
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator, Callable
+
+from ..models import (
+    AppStorage,
+    CleanupFilter,
+    CleanupOption,
+    CleanupResult,
+    Device,
+    StorageInfo,
+    StorageSnapshot,
+    UninstallResult,
+)
+from .adb import (
+    STORAGE_MOUNTS,
+    ADBNotFoundError,
+    build_du_script,
+    build_storage_script,
+    find_adb,
+    is_root_restarting,
+    parse_adb_command,
+    parse_diskstats_output,
+    parse_du_output,
+    parse_getprop_output,
+    parse_packages_output,
+    parse_root_output,
+    parse_storage_output,
+    wait_for_root_restart,
+)
+from .cleaner import APP_STORAGE_CACHE, app_entries, cleanup_command
+from .script import new_marker, parse_script_output
+
+
+class ConcurrencyLimiter:
+    """
+    Limits concurrent adb calls per device and across a whole run.
+
+    Share one limiter between clients to bound the total number of adb
+    processes while still letting each device make progress.
+    """
+
+    DEFAULT_MAX_TOTAL = 16
+    DEFAULT_MAX_PER_DEVICE = 2
+
+    def __init__(
+        self, max_total: int = DEFAULT_MAX_TOTAL, max_per_device: int = DEFAULT_MAX_PER_DEVICE
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            max_total: Maximum concurrent adb calls overall
+            max_per_device: Maximum concurrent adb calls per device
+        """
+        self.max_per_device = max(1, max_per_device)
+        self._total = asyncio.Semaphore(max(1, max_total))
+        self._devices: dict[str, asyncio.Semaphore] = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, device_id: str | None) -> AsyncIterator[None]:
+        """
+        Hold one slot for a device (and one overall) while the block runs.
+
+        Args:
+            device_id: Target device ID (None for host-level commands)
+        """
+        key = device_id or ""
+        device_semaphore = self._devices.setdefault(key, asyncio.Semaphore(self.max_per_device))
+        # Wait for the device first so a busy device doesn't hold a global slot
+        async with device_semaphore, self._total:
+            yield
+
+
+class AsyncADBClient:
+    """Asyncio client for executing ADB commands."""
+
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, device_id: str | None = None, limiter: ConcurrencyLimiter | None = None):
+        """
+        Initialize async ADB client.
+
+        Args:
+            device_id: Optional device ID to target specific device
+            limiter: Shared concurrency limiter (a private one is created if omitted)
+        """
+        self.device_id = device_id
+        self.limiter = limiter or ConcurrencyLimiter()
+        self._adb_path: str | None = None
+
+    @property
+    def adb_path(self) -> str:
+        """Get the ADB executable path."""
+        if self._adb_path is None:
+            self._adb_path = find_adb()
+            if self._adb_path is None:
+                raise ADBNotFoundError(
+                    "ADB not found in PATH. Please install Android SDK Platform Tools "
+                    "and ensure 'adb' is in your system PATH."
+                )
+        return self._adb_path
+
+    async def run_command(
+        self, command: str, timeout: float = DEFAULT_TIMEOUT, device_id: str | None = None
+    ) -> tuple[bool, str]:
+        """
+        Execute an ADB command.
+
+        The adb process is killed if the call times out or the awaiting task
+        is cancelled; cancellation is re-raised to the caller.
+
+        Args:
+            command: The ADB command to run
+            timeout: Command timeout in seconds
+            device_id: Override device ID for this command
+
+        Returns:
+            Tuple of (success, output)
+        """
+        command_device, args = parse_adb_command(command)
+        return await self._exec(args, command_device or device_id or self.device_id, timeout)
+
+    async def run_script(self, script: str, timeout: float = DEFAULT_TIMEOUT) -> tuple[bool, str]:
+        """
+        Run a (multi-line) shell script on the device verbatim.
+
+        Args:
+            script: Shell script to execute
+            timeout: Command timeout in seconds
+
+        Returns:
+            Tuple of (success, output)
+        """
+        return await self._exec(["shell", script], self.device_id, timeout)
+
+    async def _exec(
+        self, args: list[str], target_device: str | None, timeout: float
+    ) -> tuple[bool, str]:
+        """Run the adb executable with arguments, killing it on timeout or cancellation."""
+        cmd_list = [self.adb_path]
+        if target_device:
+            cmd_list.extend(["-s", target_device])
+        cmd_list.extend(args)
+
+        async with self.limiter.slot(target_device):
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd_list,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            except FileNotFoundError:
+                return False, "ADB not found. Please ensure it's in your PATH."
+            except OSError as e:
+                return False, str(e)
+
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                await _kill(process)
+                return False, "Command timed out"
+            except asyncio.CancelledError:
+                await _kill(process)
+                raise
+
+        output = (
+            stdout.decode("utf-8", errors="replace").strip()
+            or stderr.decode("utf-8", errors="replace").strip()
+        )
+        success = process.returncode == 0 or "not installed" in output.lower()
+        return success, output
+
+    async def shell(self, command: str, timeout: float = DEFAULT_TIMEOUT) -> tuple[bool, str]:
+        """
+        Execute a shell command on the device.
+
+        Args:
+            command: Shell command to execute
+            timeout: Command timeout
+
+        Returns:
+            Tuple of (success, output)
+        """
+        return await self.run_command(f"adb shell {command}", timeout)
+
+    async def get_property(self, prop: str) -> str:
+        """
+        Get a system property from the device.
+
+        Args:
+            prop: Property name
+
+        Returns:
+            Property value or "Unknown"
+        """
+        success, output = await self.shell(f"getprop {prop}")
+        return output.strip() if success else "Unknown"
+
+    async def get_properties(self) -> dict[str, str]:
+        """
+        Get all system properties from the device in one call.
+
+        Returns:
+            Dict of property name to value (empty on failure)
+        """
+        success, output = await self.shell("getprop")
+        return parse_getprop_output(output) if success else {}
+
+    async def enable_root(self) -> bool:
+        """
+        Enable root access on the device.
+
+        Returns:
+            True if root access is available
+        """
+        success, output = await self.run_command("adb root")
+        if is_root_restarting(output) and not await asyncio.to_thread(
+            wait_for_root_restart, self.device_id, None, self.DEFAULT_TIMEOUT
+        ):
+            return False
+
+        rooted = parse_root_output(output)
+        return success if rooted is None else rooted
+
+    async def get_storage_info(self) -> StorageInfo:
+        """
+        Get storage information from the device.
+
+        Returns:
+            StorageInfo object
+        """
+        success, output = await self.shell("df -k /data")
+        if success and output:
+            return StorageInfo.from_df_output(output)
+        return StorageInfo()
+
+    async def get_storage_snapshot(
+        self, mounts: tuple[str, ...] = STORAGE_MOUNTS
+    ) -> StorageSnapshot:
+        """
+        Get byte counts of several mount points in one shell call.
+
+        Args:
+            mounts: Paths to probe
+
+        Returns:
+            StorageSnapshot with an entry for each path df could report on
+        """
+        marker = new_marker()
+        _, output = await self.run_script(build_storage_script(mounts, marker))
+        return parse_storage_output(output, mounts, marker)
+
+    async def measure_paths(self, paths: list[str]) -> list[int | None]:
+        """
+        Get the disk usage of several device paths in one shell call.
+
+        Args:
+            paths: Device paths, may contain shell globs (empty strings are skipped)
+
+        Returns:
+            Bytes used by each path, or None where the size couldn't be read
+        """
+        targets = [index for index, path in enumerate(paths) if path]
+        sizes: list[int | None] = [None] * len(paths)
+        if not targets:
+            return sizes
+
+        marker = new_marker()
+        _, output = await self.run_script(
+            build_du_script([paths[index] for index in targets], marker),
+            timeout=self.DEFAULT_TIMEOUT * len(targets),
+        )
+        for index, step in zip(targets, parse_script_output(output, len(targets), marker)):
+            if step is not None:
+                sizes[index] = parse_du_output(step.output, step.success)
+        return sizes
+
+    async def uninstall_package(self, package: str, keep_data: bool = False) -> tuple[bool, str]:
+        """
+        Uninstall an application.
+
+        Args:
+            package: Package name to uninstall
+            keep_data: Keep the app's data and cache directories
+
+        Returns:
+            Tuple of (success, output)
+        """
+        flag = "-k " if keep_data else ""
+        return await self.run_command(f"adb uninstall {flag}{package}")
+
+    async def get_app_storage(self) -> dict[str, AppStorage]:
+        """
+        Get the space used by every installed app in one ``dumpsys`` call.
+
+        Returns:
+            Dict of package name to AppStorage
+        """
+        success, output = await self.shell("dumpsys diskstats", timeout=self.DEFAULT_TIMEOUT * 2)
+        if not success or not output:
+            return {}
+        return parse_diskstats_output(output.split("\n"))
+
+    async def list_packages(self, third_party_only: bool = True) -> list[str]:
+        """
+        List installed packages.
+
+        Args:
+            third_party_only: If True, only list user-installed apps
+
+        Returns:
+            List of package names
+        """
+        flag = "-3" if third_party_only else ""
+        success, output = await self.shell(f"pm list packages {flag}")
+
+        if not success or not output:
+            return []
+
+        return parse_packages_output(output)
+
+
+class AsyncDeviceCleaner:
+    """Handles cleanup operations for a single device from an event loop."""
+
+    def __init__(
+        self,
+        device: Device,
+        limiter: ConcurrencyLimiter | None = None,
+        filters: CleanupFilter | None = None,
+    ):
+        """
+        Initialize cleaner for a device.
+
+        Args:
+            device: Device to clean
+            limiter: Shared concurrency limiter
+            filters: Age and size limits for path deletions
+        """
+        self.device = device
+        self.filters = filters
+        self.client = AsyncADBClient(device.device_id, limiter)
+        self._root_enabled: bool | None = None
+
+    async def enable_root(self) -> bool:
+        """Enable root access if device is an emulator (once per cleaner)."""
+        if self._root_enabled is None:
+            self._root_enabled = self.device.is_emulator and await self.client.enable_root()
+        return self._root_enabled
+
+    async def run_cleanup(
+        self, option: CleanupOption, progress_callback: Callable[[str], None] | None = None
+    ) -> CleanupResult:
+        """
+        Run a single cleanup operation.
+
+        Args:
+            option: Cleanup option to execute
+            progress_callback: Optional callback for progress updates
+
+        Returns:
+            CleanupResult object
+        """
+        if progress_callback:
+            progress_callback(f"{self.device.model}: {option.name}...")
+
+        success, output = await self.client.run_command(cleanup_command(option, self.filters))
+
+        return CleanupResult(option=option, success=success, output=output)
+
+    async def run_all_cleanups(
+        self,
+        options: list[CleanupOption],
+        progress_callback: Callable[[str], None] | None = None,
+        measure: bool = False,
+    ) -> list[CleanupResult]:
+        """
+        Run multiple cleanup operations in order.
+
+        Args:
+            options: List of cleanup options to execute
+            progress_callback: Optional callback for progress updates
+            measure: Record the bytes each option freed (one batched ``du``
+                call before and one after)
+
+        Returns:
+            List of CleanupResult objects
+        """
+        await self.enable_root()
+
+        paths = [option.path for option in options]
+        before = await self.client.measure_paths(paths) if measure else []
+
+        results = []
+        for option in options:
+            results.append(await self.run_cleanup(option, progress_callback))
+
+        if measure:
+            after = await self.client.measure_paths(paths)
+            for result, size_before, size_after in zip(results, before, after):
+                if size_before is not None and size_after is not None:
+                    result.bytes_freed = max(0, size_before - size_after)
+        return results
+
+    async def get_installed_apps(self) -> list[dict]:
+        """
+        Get list of user-installed apps on the device, largest first.
+
+        Returns:
+            List of dicts with 'package', 'name' and 'storage' keys
+        """
+        packages = await self.client.list_packages(third_party_only=True)
+        storage = APP_STORAGE_CACHE.get(self.device.device_id)
+        if storage is None:
+            storage = await self.client.get_app_storage()
+            APP_STORAGE_CACHE.put(self.device.device_id, storage)
+        return app_entries(packages, storage)
+
+    async def uninstall_app(self, package: str, keep_data: bool = False) -> UninstallResult:
+        """
+        Uninstall a single application.
+
+        Args:
+            package: Package name to uninstall
+            keep_data: Keep the app's data and cache directories
+
+        Returns:
+            UninstallResult object
+        """
+        success, output = await self.client.uninstall_package(package, keep_data)
+        return UninstallResult(package=package, success=success, output=output)
+
+    async def uninstall_apps(
+        self,
+        packages: list[str],
+        progress_callback: Callable[[str], None] | None = None,
+        keep_data: bool = False,
+    ) -> list[UninstallResult]:
+        """
+        Uninstall multiple applications concurrently.
+
+        Concurrency is bounded by the client's limiter; results keep the
+        order of ``packages``.
+
+        Args:
+            packages: List of package names to uninstall
+            progress_callback: Optional callback for progress updates
+            keep_data: Keep the apps' data and cache directories
+
+        Returns:
+            List of UninstallResult objects
+        """
+
+        async def uninstall(package: str) -> UninstallResult:
+            if progress_callback:
+                progress_callback(f"Uninstalling {package}...")
+            return await self.uninstall_app(package, keep_data)
+
+        return list(await asyncio.gather(*(uninstall(package) for package in packages)))
+
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    """Kill a subprocess and reap it."""
+    with contextlib.suppress(ProcessLookupError):
+        process.kill()
+    with contextlib.suppress(Exception):
+        await process.wait()
@@ -4,138 +4,438 @@ AVD (Android Virtual Device) management module.
 This module handles operations related to AVD files and directories.
 """
 
+import contextlib
 import os
-import shutil
-import stat
-import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-
-from ..models import AVD
+from typing import TYPE_CHECKING
+
+from ..models import (
+    AVD,
+    AVDSizes,
+    CompactionResult,
+    DedupeResult,
+    DeletionResult,
+    SnapshotPolicy,
+    format_size,
+)
 from .adb import ADBClient
+from .dedupe import DEFAULT_HASH_WORKERS, dedupe_files
+from .delete import DeletionEngine
+from .index import SizeIndex
+from .qcow2 import compact_qcow2, qcow2_overlays
+from .snapshots import list_snapshots, plan_evictions
+from .sparsify import raw_images, sparsify_image
+from .trash import (
+    TRASH_DIRNAME,
+    empty_trash,
+    move_to_trash,
+    resume_trash,
+    start_trash_worker,
+    trash_dir_for,
+)
+from .usage import TreeUsage, disk_usage, tree_usage
+
+if TYPE_CHECKING:
+    from .tracker import DeviceTracker
+
+# Lock files the emulator keeps inside an AVD directory while it runs
+AVD_LOCK_FILES = ("hardware-qemu.ini.lock", "multiinstance.lock")
+
+PROC_ROOT = Path("/proc")
 
-IS_WINDOWS = sys.platform == "win32"
+# Directory walks are bound by syscall latency, so oversubscribe the cores
+DEFAULT_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
 
+# Image scans read whole files, so keep them to a few at a time
+DEFAULT_SPARSIFY_WORKERS = 4
 
-def _handle_remove_readonly(
-    func: object, path: str, exc_info: tuple[type, BaseException, object]
-) -> None:
+
+def get_dir_size(path: str) -> int:
     """
-    Handle removal of read-only files on Windows.
+    Calculate directory size in bytes.
 
-    Windows sometimes marks files as read-only, preventing deletion.
-    This handler removes the read-only flag and retries.
+    Symlinks are not followed and hardlinked files are counted once.
+
+    Args:
+        path: Directory path
+
+    Returns:
+        Total (apparent) size in bytes
     """
-    if IS_WINDOWS:
-        os.chmod(path, stat.S_IWRITE)
-        if callable(func):
-            func(path)
-    else:
-        raise exc_info[1]
+    return disk_usage(path).apparent
 
 
-def safe_rmtree(path: Path) -> tuple[bool, str]:
+def classify_avd_entry(name: str, is_dir: bool) -> str:
     """
-    Safely remove a directory tree with Windows compatibility.
+    Get the size category of a top-level entry of an AVD directory.
 
     Args:
-        path: Path to remove
+        name: Entry name
+        is_dir: Whether the entry is a directory
 
     Returns:
-        Tuple of (success, error_message)
+        AVDSizes field name ("snapshots", "cache", "userdata", "sdcard" or "other")
     """
+    if is_dir:
+        return "snapshots" if name == "snapshots" else "other"
+    if name.startswith("cache.img"):
+        return "cache"
+    if name.startswith("userdata"):
+        return "userdata"
+    if name.startswith("sdcard.img"):
+        return "sdcard"
+    return "other"
+
+
+def _scan_top_level(path: str) -> tuple[list[tuple[str, TreeUsage]], list[tuple[str, str]]]:
+    """
+    Measure the top-level files of an AVD directory.
+
+    Args:
+        path: AVD directory path
+
+    Returns:
+        Tuple of ([(category, usage of the top-level files)], [(category, subdirectory path)])
+    """
+    files: dict[str, TreeUsage] = {}
+    subdirs: list[tuple[str, str]] = []
     try:
-        shutil.rmtree(path, onerror=_handle_remove_readonly)
-        return True, ""
-    except PermissionError:
-        return False, "File is locked. Close any programs using it and try again."
-    except Exception as e:
-        return False, str(e)
+        entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+    except OSError:
+        return [], subdirs
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append((classify_avd_entry(entry.name, is_dir=True), entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                category = classify_avd_entry(entry.name, is_dir=False)
+                files.setdefault(category, TreeUsage()).add_file(entry.stat(follow_symlinks=False))
+        except OSError:
+            continue
+    return list(files.items()), subdirs
 
 
-def safe_unlink(path: Path) -> tuple[bool, str]:
+def _combine_usage(parts: list[tuple[str, TreeUsage]]) -> tuple[AVDSizes, AVDSizes]:
     """
-    Safely remove a file with Windows compatibility.
+    Total an AVD's parts by category, counting each hardlinked inode once.
 
     Args:
-        path: Path to remove
+        parts: (category, usage) pairs in a stable order
 
     Returns:
-        Tuple of (success, error_message)
+        Tuple of (apparent sizes, allocated sizes)
     """
-    try:
-        if IS_WINDOWS:
-            os.chmod(path, stat.S_IWRITE)
-        path.unlink()
-        return True, ""
-    except PermissionError:
-        return False, "File is locked. Close any programs using it and try again."
-    except Exception as e:
-        return False, str(e)
+    apparent = AVDSizes()
+    allocated = AVDSizes()
+    seen: set[tuple[int, int]] = set()
+    for category, usage in parts:
+        resolved = usage.resolve(seen)
+        setattr(apparent, category, getattr(apparent, category) + resolved.apparent)
+        setattr(allocated, category, getattr(allocated, category) + resolved.allocated)
+    return apparent, allocated
 
 
-def get_dir_size(path: str) -> int:
+def _newest_mtime(path: str) -> int:
     """
-    Calculate directory size in bytes.
+    Get the newest mtime of a directory and its top-level entries.
+
+    The emulator rewrites top-level files such as ``userdata-qemu.img`` and
+    ``hardware-qemu.ini`` on every run, so this moves whenever it has used
+    the AVD.
 
     Args:
         path: Directory path
 
     Returns:
-        Total size in bytes
+        Newest mtime in nanoseconds (0 if the directory can't be read)
     """
-    total = 0
     try:
+        newest = os.stat(path).st_mtime_ns
         for entry in os.scandir(path):
-            if entry.is_file():
-                total += entry.stat().st_size
-            elif entry.is_dir():
-                total += get_dir_size(entry.path)
-    except (PermissionError, FileNotFoundError):
-        pass
-    return total
+            with contextlib.suppress(OSError):
+                newest = max(newest, entry.stat(follow_symlinks=False).st_mtime_ns)
+    except OSError:
+        return 0
+    return newest
 
 
-def format_size(size_bytes: int) -> str:
+def scan_avd_sizes(path: str, index: SizeIndex | None = None) -> tuple[AVDSizes, AVDSizes]:
     """
-    Format bytes to human-readable string.
+    Measure an AVD directory by category in a single walk.
 
     Args:
-        size_bytes: Size in bytes
+        path: AVD directory path
+        index: Optional size index to reuse unchanged subdirectories from
 
     Returns:
-        Formatted string (e.g., "1.5GB")
+        Tuple of (apparent sizes, allocated sizes); allocated sizes are what
+        deleting the files would actually free
     """
-    size: float = float(size_bytes)
-    for unit in ["B", "KB", "MB", "GB"]:
-        if size < 1024:
-            return f"{size:.1f}{unit}"
-        size /= 1024
-    return f"{size:.1f}TB"
+    measure = index.usage if index else tree_usage
+    files, subdirs = _scan_top_level(path)
+    parts = files + [(category, measure(subdir)) for category, subdir in subdirs]
+    return _combine_usage(parts)
 
 
-def get_running_emulator_names() -> list[str]:
+def scan_avd_sizes_parallel(
+    paths: list[str], max_workers: int = DEFAULT_SCAN_WORKERS, index: SizeIndex | None = None
+) -> list[tuple[AVDSizes, AVDSizes]]:
+    """
+    Measure several AVD directories at once.
+
+    The top level of every AVD is listed first, then each subdirectory
+    (snapshots, data, ...) is walked as an independent task on a thread
+    pool, so one large AVD doesn't serialize the rest. Parts are combined
+    in a fixed order, so the result matches ``scan_avd_sizes`` exactly.
+
+    Args:
+        paths: AVD directory paths
+        max_workers: Maximum number of directories walked at the same time
+        index: Optional size index to reuse unchanged subdirectories from
+
+    Returns:
+        One (apparent, allocated) pair per path, in input order
+    """
+    if max_workers <= 1:
+        return [scan_avd_sizes(path, index) for path in paths]
+
+    measure = index.usage if index else tree_usage
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        top_levels = list(executor.map(_scan_top_level, paths))
+        pending = [
+            [(category, executor.submit(measure, subdir)) for category, subdir in subdirs]
+            for _, subdirs in top_levels
+        ]
+
+        results = []
+        for (files, _), futures in zip(top_levels, pending):
+            parts = files + [(category, future.result()) for category, future in futures]
+            results.append(_combine_usage(parts))
+    return results
+
+
+def get_running_emulator_names(tracker: "DeviceTracker | None" = None) -> list[str]:
     """
     Get list of currently running emulator AVD names.
 
+    Args:
+        tracker: Optional running DeviceTracker to read the device list from
+
     Returns:
         List of AVD names that are currently running
     """
     running: list[str] = []
     client = ADBClient()
-    success, output = client.run_command("adb devices")
 
-    if not success:
-        return running
+    if tracker is not None and tracker.is_ready:
+        device_ids = [entry["serial"] for entry in tracker.online()]
+    else:
+        success, output = client.run_command("adb devices")
+        if not success:
+            return running
+        device_ids = [
+            line.split()[0]
+            for line in output.strip().split("\n")[1:]
+            if "emulator" in line and "device" in line
+        ]
+
+    for device_id in device_ids:
+        if not device_id.startswith("emulator"):
+            continue
+        name_success, name_output = client.run_command(f"adb -s {device_id} emu avd name")
+        if name_success and name_output:
+            avd_name = name_output.split("\n")[0].strip()
+            if avd_name and avd_name != "OK":
+                running.append(avd_name)
+
+    return running
+
+
+def _pid_is_alive(pid: int) -> bool:
+    """Check if a process exists (POSIX only)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _read_lock_pid(lock_path: Path) -> int | None:
+    """
+    Read the owner PID recorded in an emulator lock.
+
+    The emulator records its PID either in a ``pid`` file inside a lock
+    directory, as the target of a lock symlink, or as the lock file's
+    contents, depending on the emulator version.
+
+    Args:
+        lock_path: Path to the lock
+
+    Returns:
+        Owner PID or None if the lock records none
+    """
+    try:
+        if lock_path.is_symlink():
+            text = os.path.basename(os.readlink(lock_path))
+        elif lock_path.is_dir():
+            text = (lock_path / "pid").read_text(errors="ignore")
+        else:
+            text = lock_path.read_text(errors="ignore")
+    except OSError:
+        return None
+    text = text.strip()
+    return int(text) if text.isdigit() else None
+
+
+def _lock_is_held(lock_path: Path) -> bool:
+    """
+    Check if another process holds a lock on a file.
+
+    Probes with a shared, non-blocking ``flock`` that is released right
+    away; it only fails while an emulator holds the lock exclusively.
+
+    Args:
+        lock_path: Path to the lock file
+
+    Returns:
+        True if the file is locked by another process
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    try:
+        fd = os.open(lock_path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return False
+    finally:
+        os.close(fd)
+
+
+def is_avd_locked(avd_dir: Path) -> bool:
+    """
+    Check an AVD directory's lock files for a live emulator.
+
+    Stale locks left by a crashed emulator are ignored: a lock only
+    counts if its owner PID is still alive or the file is actually locked.
+
+    Args:
+        avd_dir: AVD directory (``<name>.avd``)
+
+    Returns:
+        True if an emulator is using the AVD
+    """
+    for lock_name in AVD_LOCK_FILES:
+        lock_path = avd_dir / lock_name
+        if not lock_path.exists() and not lock_path.is_symlink():
+            continue
+        pid = _read_lock_pid(lock_path)
+        if pid is not None and _pid_is_alive(pid):
+            return True
+        if lock_path.is_file() and _lock_is_held(lock_path):
+            return True
+    return False
+
+
+def parse_emulator_cmdline(argv: list[str]) -> str | None:
+    """
+    Get the AVD name from an emulator process's arguments.
+
+    Args:
+        argv: Process arguments
+
+    Returns:
+        AVD name, or None if the process is not an emulator
+    """
+    if not argv:
+        return None
+    program = os.path.basename(argv[0])
+    if not (program.startswith("qemu-system-") or program.startswith("emulator")):
+        return None
+
+    for index, arg in enumerate(argv[1:], start=1):
+        if arg == "-avd" and index + 1 < len(argv):
+            return argv[index + 1]
+        if arg.startswith("-avd="):
+            return arg[len("-avd=") :]
+        if arg.startswith("@") and len(arg) > 1:
+            return arg[1:]
+    return None
+
+
+def scan_emulator_processes(proc_root: Path = PROC_ROOT) -> set[str] | None:
+    """
+    Find the AVDs of running emulator processes by scanning ``/proc``.
+
+    Args:
+        proc_root: procfs mount point
+
+    Returns:
+        Set of AVD names, or None if procfs is not available
+    """
+    try:
+        entries = list(os.scandir(proc_root))
+    except OSError:
+        return None
+
+    names: set[str] = set()
+    for entry in entries:
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, "cmdline"), "rb") as f:
+                raw = f.read()
+        except OSError:
+            continue
+        argv = [arg.decode("utf-8", errors="replace") for arg in raw.split(b"\0") if arg]
+        name = parse_emulator_cmdline(argv)
+        if name:
+            names.add(name)
+    return names
+
+
+def detect_running_avds(avd_home: Path, names: list[str]) -> set[str]:
+    """
+    Find which AVDs are running using only host-local state.
 
-    for line in output.strip().split("\n")[1:]:
-        if "emulator" in line and "device" in line:
-            device_id = line.split()[0]
-            name_success, name_output = client.run_command(f"adb -s {device_id} emu avd name")
-            if name_success and name_output:
-                avd_name = name_output.split("\n")[0].strip()
-                if avd_name and avd_name != "OK":
-                    running.append(avd_name)
+    Checks each AVD's lock files and, where available, the emulator
+    processes in ``/proc``. ADB is only queried when there is no ``/proc``
+    to scan (e.g. macOS and Windows), since a lock file alone can miss an
+    emulator that doesn't hold one.
 
+    Args:
+        avd_home: AVD home directory
+        names: AVD names to check
+
+    Returns:
+        Set of running AVD names
+    """
+    running = {name for name in names if is_avd_locked(avd_home / f"{name}.avd")}
+
+    processes = scan_emulator_processes()
+    if processes is not None:
+        return running | (processes & set(names))
+
+    running.update(get_running_emulator_names())
     return running
 
 
@@ -150,10 +450,18 @@ def get_avd_home() -> Path | None:
     return avd_home if avd_home.exists() else None
 
 
-def get_avd_list() -> list[AVD]:
+def get_avd_list(max_workers: int = DEFAULT_SCAN_WORKERS, use_index: bool = True) -> list[AVD]:
     """
     Get list of all AVDs with their sizes.
 
+    With ``use_index``, sizes of subdirectories that haven't changed since
+    the last run come from the on-disk size index. Running AVDs are always
+    rescanned, since the emulator rewrites their files in place.
+
+    Args:
+        max_workers: Maximum number of directories sized in parallel
+        use_index: Reuse and update the persistent size index
+
     Returns:
         List of AVD objects
     """
@@ -161,45 +469,154 @@ def get_avd_list() -> list[AVD]:
     if not avd_home:
         return []
 
-    running_avds = get_running_emulator_names()
-    avds = []
-
-    for ini_file in avd_home.glob("*.ini"):
-        avd_name = ini_file.stem
-        avd_dir = avd_home / f"{avd_name}.avd"
-
-        if not avd_dir.exists():
-            continue
-
-        # Calculate sizes
-        total_size = get_dir_size(str(avd_dir))
-        snapshot_dir = avd_dir / "snapshots"
-        snapshot_size = get_dir_size(str(snapshot_dir)) if snapshot_dir.exists() else 0
+    avd_names = [
+        ini_file.stem
+        for ini_file in avd_home.glob("*.ini")
+        if (avd_home / f"{ini_file.stem}.avd").exists()
+    ]
+    running_avds = detect_running_avds(avd_home, avd_names)
+    avd_dirs = [avd_home / f"{avd_name}.avd" for avd_name in avd_names]
+
+    index = SizeIndex.load() if use_index else None
+    scanned_ns = time.time_ns()
+    if index is not None:
+        for avd_name, avd_dir in zip(avd_names, avd_dirs):
+            if avd_name in running_avds:
+                index.invalidate(str(avd_dir))
+            else:
+                index.invalidate_if_modified(str(avd_dir), _newest_mtime(str(avd_dir)))
+
+    all_sizes = scan_avd_sizes_parallel([str(avd_dir) for avd_dir in avd_dirs], max_workers, index)
+    if index is not None:
+        for avd_name, avd_dir in zip(avd_names, avd_dirs):
+            if avd_name not in running_avds:
+                index.mark_scanned(str(avd_dir), scanned_ns)
+        index.save()
 
-        cache_size = 0
-        for cache_file in avd_dir.glob("cache.img*"):
-            cache_size += cache_file.stat().st_size
+    avds = []
 
+    for avd_name, avd_dir, (sizes, allocated) in zip(avd_names, avd_dirs, all_sizes):
         avds.append(
             AVD(
                 name=avd_name,
                 path=str(avd_dir),
-                total_size=format_size(total_size),
-                snapshot_size=format_size(snapshot_size),
-                cache_size=format_size(cache_size),
+                total_size=allocated.total,
+                snapshot_size=allocated.snapshots,
+                cache_size=allocated.cache,
                 is_running=avd_name in running_avds,
+                sizes=sizes,
+                allocated=allocated,
             )
         )
 
     return avds
 
 
-def clean_avd_snapshots(avd: AVD) -> tuple[bool, str, int]:
+def _snapshot_targets(avd: AVD) -> list[str]:
+    """List the entries of an AVD's snapshots directory."""
+    snapshot_dir = os.path.join(avd.path, "snapshots")
+    try:
+        with os.scandir(snapshot_dir) as entries:
+            return sorted(entry.path for entry in entries)
+    except OSError:
+        return []
+
+
+def _snapshot_groups(
+    avds: list[AVD], policy: SnapshotPolicy | None
+) -> dict[str, tuple[list[str], int]]:
+    """Get the snapshot paths to delete for each AVD under a policy, with their size."""
+    if policy is None or policy.evicts_all:
+        return {avd.path: (_snapshot_targets(avd), avd.allocated.snapshots) for avd in avds}
+
+    evictions = plan_evictions(
+        [list_snapshots(avd.path) for avd in avds],
+        keep=policy.keep,
+        budget=policy.budget,
+        per_avd_budget=policy.per_avd_budget,
+    )
+    groups: dict[str, tuple[list[str], int]] = {avd.path: ([], 0) for avd in avds}
+    for snapshot in evictions:
+        avd_path = os.path.dirname(os.path.dirname(snapshot.path))
+        paths, size = groups[avd_path]
+        paths.append(snapshot.path)
+        groups[avd_path] = (paths, size + snapshot.size)
+    return groups
+
+
+def _cache_targets(avd: AVD) -> list[str]:
+    """List an AVD's cache image files."""
+    return sorted(str(path) for path in Path(avd.path).glob("cache.img*"))
+
+
+def _deletion_outcome(result: DeletionResult) -> tuple[bool, str, int]:
+    """Convert a DeletionResult to a (success, message, bytes_freed) tuple."""
+    if not result.success:
+        return False, "; ".join(result.errors), result.bytes_freed
+    return True, f"Freed {format_size(result.bytes_freed)}", result.bytes_freed
+
+
+def _discard(
+    groups: dict[str, tuple[list[str], int]],
+    engine: DeletionEngine | None,
+    defer: bool,
+    on_progress: Callable[[str, DeletionResult], None] | None = None,
+) -> DeletionResult:
+    """
+    Delete AVD files now, or move them to the trash for a background worker.
+
+    Args:
+        groups: Paths to delete and their allocated size (from the AVD scan),
+            keyed by the AVD directory they belong to
+        engine: Deletion engine to use (a default one is created if omitted)
+        defer: Move the paths to the trash and return without deleting them
+        on_progress: Optional callback with each removed path and its result
+
+    Returns:
+        Combined DeletionResult (trashed bytes count as freed)
+    """
+    engine = engine or DeletionEngine()
+    if not defer:
+        return engine.delete([path for paths, _ in groups.values() for path in paths], on_progress)
+
+    result = DeletionResult()
+    direct: list[str] = []
+    trash_dirs: set[str] = set()
+    for avd_path, (paths, size) in groups.items():
+        trash_dir = trash_dir_for(avd_path)
+        moved, failed = move_to_trash(paths, trash_dir, size)
+        if len(failed) < len(paths):
+            trash_dirs.add(trash_dir)
+        result.bytes_freed += moved
+        if on_progress and moved:
+            on_progress(avd_path, DeletionResult(bytes_freed=moved))
+        direct.extend(failed)
+
+    # Without a worker, empty the trash here so nothing is left behind
+    if trash_dirs and not start_trash_worker(sorted(trash_dirs)):
+        for trash_dir in sorted(trash_dirs):
+            result.errors.extend(empty_trash(trash_dir, engine).errors)
+
+    # Paths that couldn't be renamed (e.g. on another filesystem) are deleted now
+    if direct:
+        result.update(engine.delete(direct, on_progress))
+    return result
+
+
+def clean_avd_snapshots(
+    avd: AVD,
+    engine: DeletionEngine | None = None,
+    defer: bool = False,
+    policy: SnapshotPolicy | None = None,
+) -> tuple[bool, str, int]:
     """
     Clean snapshots for an AVD.
 
     Args:
         avd: AVD to clean
+        engine: Deletion engine to use (a default one is created if omitted)
+        defer: Move snapshots to the trash and delete them in the background
+        policy: Snapshots to keep and byte budgets (all are removed if omitted)
 
     Returns:
         Tuple of (success, message, bytes_freed)
@@ -207,33 +624,23 @@ def clean_avd_snapshots(avd: AVD) -> tuple[bool, str, int]:
     if avd.is_running:
         return False, "Cannot clean running emulator", 0
 
-    snapshot_dir = Path(avd.path) / "snapshots"
-    if not snapshot_dir.exists():
+    if not os.path.isdir(os.path.join(avd.path, "snapshots")):
         return True, "No snapshots found", 0
 
-    size_before = get_dir_size(str(snapshot_dir))
-    errors: list[str] = []
+    result = _discard(_snapshot_groups([avd], policy), engine, defer)
+    return _deletion_outcome(result)
 
-    for item in snapshot_dir.iterdir():
-        if item.is_dir():
-            success, error = safe_rmtree(item)
-        else:
-            success, error = safe_unlink(item)
-        if not success:
-            errors.append(f"{item.name}: {error}")
 
-    if errors:
-        return False, "; ".join(errors), 0
-
-    return True, f"Freed {format_size(size_before)}", size_before
-
-
-def clean_avd_cache(avd: AVD) -> tuple[bool, str, int]:
+def clean_avd_cache(
+    avd: AVD, engine: DeletionEngine | None = None, defer: bool = False
+) -> tuple[bool, str, int]:
     """
     Clean cache files for an AVD.
 
     Args:
         avd: AVD to clean
+        engine: Deletion engine to use (a default one is created if omitted)
+        defer: Move cache files to the trash and delete them in the background
 
     Returns:
         Tuple of (success, message, bytes_freed)
@@ -241,38 +648,201 @@ def clean_avd_cache(avd: AVD) -> tuple[bool, str, int]:
     if avd.is_running:
         return False, "Cannot clean running emulator", 0
 
-    avd_path = Path(avd.path)
-    total_freed = 0
-    errors: list[str] = []
+    result = _discard({avd.path: (_cache_targets(avd), avd.allocated.cache)}, engine, defer)
+    return _deletion_outcome(result)
 
-    for cache_file in avd_path.glob("cache.img*"):
-        size = cache_file.stat().st_size
-        success, error = safe_unlink(cache_file)
-        if success:
-            total_freed += size
-        else:
-            errors.append(f"{cache_file.name}: {error}")
 
+def clean_avds(
+    avds: list[AVD],
+    snapshots: bool = True,
+    cache: bool = True,
+    engine: DeletionEngine | None = None,
+    on_progress: Callable[[str, DeletionResult], None] | None = None,
+    defer: bool = False,
+    policy: SnapshotPolicy | None = None,
+) -> DeletionResult:
+    """
+    Clean several AVDs in one parallel deletion pass.
+
+    Files from every AVD are removed together, so a small AVD doesn't wait
+    behind a large one. Running AVDs are skipped.
+
+    Args:
+        avds: AVDs to clean
+        snapshots: Remove snapshots
+        cache: Remove cache files
+        engine: Deletion engine to use (a default one is created if omitted)
+        on_progress: Optional callback with each removed path and its result
+        defer: Move the files to the trash and delete them in the background
+        policy: Snapshots to keep and byte budgets (all are removed if omitted);
+            a global budget applies across all the given AVDs
+
+    Returns:
+        Combined DeletionResult
+    """
+    cleanable = [avd for avd in avds if not avd.is_running]
+    groups: dict[str, tuple[list[str], int]] = {avd.path: ([], 0) for avd in cleanable}
+    if snapshots:
+        groups.update(_snapshot_groups(cleanable, policy))
+    if cache:
+        for avd in cleanable:
+            paths, size = groups[avd.path]
+            groups[avd.path] = (paths + _cache_targets(avd), size + avd.allocated.cache)
+
+    return _discard(groups, engine, defer, on_progress)
+
+
+def _stopped_images(avds: list[AVD], find: Callable[[str], list[str]]) -> list[tuple[str, str]]:
+    """List (AVD name, image path) for AVDs that are stopped and not locked."""
+    return [
+        (avd.name, path)
+        for avd in avds
+        if not avd.is_running and not is_avd_locked(Path(avd.path))
+        for path in find(avd.path)
+    ]
+
+
+def _run_compactions(
+    images: list[tuple[str, str]],
+    compact: Callable[[str], CompactionResult],
+    max_workers: int,
+    on_progress: Callable[[CompactionResult], None] | None,
+) -> list[tuple[str, CompactionResult]]:
+    """Compact images on a thread pool, returning (AVD name, result) pairs."""
+    if not images:
+        return []
+
+    results = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as executor:
+        compacted = executor.map(compact, [path for _, path in images])
+        for (avd_name, _), result in zip(images, compacted):
+            results.append((avd_name, result))
+            if on_progress:
+                on_progress(result)
+    return results
+
+
+def sparsify_avd_images(
+    avds: list[AVD],
+    max_workers: int = DEFAULT_SPARSIFY_WORKERS,
+    on_progress: Callable[[CompactionResult], None] | None = None,
+) -> list[CompactionResult]:
+    """
+    Release the zero blocks of the raw disk images of stopped AVDs.
+
+    AVDs that are running, or whose lock files show they started since the
+    scan, are skipped.
+
+    Args:
+        avds: AVDs to compact
+        max_workers: Maximum number of images compacted at the same time
+        on_progress: Optional callback with each image's result, called on
+            the calling thread
+
+    Returns:
+        CompactionResult for each image
+    """
+    images = _stopped_images(avds, raw_images)
+    return [
+        result for _, result in _run_compactions(images, sparsify_image, max_workers, on_progress)
+    ]
+
+
+def compact_avd_overlays(
+    avds: list[AVD],
+    max_workers: int = DEFAULT_SPARSIFY_WORKERS,
+    on_progress: Callable[[CompactionResult], None] | None = None,
+) -> dict[str, list[CompactionResult]]:
+    """
+    Compact the qcow2 overlays of stopped AVDs.
+
+    AVDs that are running, or whose lock files show they started since the
+    scan, are skipped.
+
+    Args:
+        avds: AVDs to compact
+        max_workers: Maximum number of overlays compacted at the same time
+        on_progress: Optional callback with each overlay's result, called on
+            the calling thread
+
+    Returns:
+        CompactionResults of each AVD's overlays, keyed by AVD name
+    """
+    images = _stopped_images(avds, qcow2_overlays)
+    by_avd: dict[str, list[CompactionResult]] = {}
+    for avd_name, result in _run_compactions(images, compact_qcow2, max_workers, on_progress):
+        by_avd.setdefault(avd_name, []).append(result)
+    return by_avd
+
+
+def clean_avd_images(avd: AVD) -> tuple[bool, str, int]:
+    """
+    Sparsify the raw disk images of an AVD.
+
+    Args:
+        avd: AVD to compact
+
+    Returns:
+        Tuple of (success, message, bytes_freed)
+    """
+    if avd.is_running:
+        return False, "Cannot clean running emulator", 0
+
+    results = sparsify_avd_images([avd])
+    freed = sum(result.bytes_freed for result in results)
+    errors = [f"{os.path.basename(r.path)}: {r.error}" for r in results if not r.success]
     if errors:
-        return False, "; ".join(errors), total_freed
+        return False, "; ".join(errors), freed
+    return True, f"Freed {format_size(freed)}", freed
+
+
+def dedupe_avd_home(dry_run: bool = False, max_workers: int = DEFAULT_HASH_WORKERS) -> DedupeResult:
+    """
+    Share identical files across stopped AVDs through reflinks.
 
-    return True, f"Freed {format_size(total_freed)}", total_freed
+    Args:
+        dry_run: Only report what could be shared
+        max_workers: Processes used for hashing
+
+    Returns:
+        DedupeResult object
+    """
+    avd_home = get_avd_home()
+    if not avd_home:
+        return DedupeResult(dry_run=dry_run)
+
+    names = [ini_file.stem for ini_file in avd_home.glob("*.ini")]
+    names = [name for name in names if (avd_home / f"{name}.avd").is_dir()]
+    running = detect_running_avds(avd_home, names)
+    roots = [str(avd_home / f"{name}.avd") for name in sorted(names) if name not in running]
+    return dedupe_files(roots, dry_run=dry_run, max_workers=max_workers)
+
+
+def resume_avd_trash() -> bool:
+    """
+    Restart background deletion of AVD files left in the trash.
+
+    Returns:
+        True if a worker was started
+    """
+    avd_home = get_avd_home()
+    if not avd_home:
+        return False
+    return resume_trash([str(avd_home / TRASH_DIRNAME)])
 
 
 def get_total_avd_stats(avds: list[AVD]) -> tuple[int, int]:
     """
     Calculate total AVD statistics.
 
+    Totals are summed from the allocated sizes measured by
+    ``get_avd_list``; nothing is walked again.
+
     Args:
         avds: List of AVDs
 
     Returns:
         Tuple of (total_size, total_snapshot_size) in bytes
     """
-    total_size = sum(get_dir_size(avd.path) for avd in avds)
-    total_snapshots = sum(
-        get_dir_size(str(Path(avd.path) / "snapshots"))
-        for avd in avds
-        if (Path(avd.path) / "snapshots").exists()
-    )
-    return total_size, total_snapshots
+    totals = sum((avd.allocated for avd in avds), AVDSizes())
+    return totals.total, totals.snapshots
@@ -4,10 +4,14 @@ Core cleanup operations module.
 This module contains the main cleanup logic and predefined cleanup options.
 """
 
+import shlex
+import threading
 from collections.abc import Callable
 
 from ..models import (
+    AppStorage,
     CleanupCategory,
+    CleanupFilter,
     CleanupOption,
     CleanupResult,
     Device,
@@ -15,6 +19,7 @@ from ..models import (
     UninstallResult,
 )
 from .adb import ADBClient
+from .script import build_script, new_marker, parse_script_output
 
 # Predefined cleanup options
 # Note: Crash Dumps (/data/tombstones) and ANR Traces (/data/anr) require root access
@@ -78,24 +83,181 @@ def get_cleanup_options() -> list[CleanupOption]:
     return CLEANUP_OPTIONS.copy()
 
 
+def build_delete_command(path: str, filters: CleanupFilter | None = None) -> str:
+    """
+    Build a streaming ``find -delete`` shell command for a cleanup path.
+
+    ``find`` walks and deletes entries as it goes, so directories with
+    hundreds of thousands of files never have to be expanded into one
+    argument list the way ``rm -rf <dir>/*`` does. A trailing ``/*``
+    deletes the contents of each matching directory rather than the
+    directory itself, skipping top-level dot entries such as ``.nomedia``
+    just as the shell glob did; globs elsewhere in the path are still
+    expanded by the shell. Directories that don't exist are skipped.
+
+    Args:
+        path: Device path such as ``/sdcard/Android/data/*/cache/*``
+        filters: Only delete files older or larger than these limits
+            (directories are then left in place)
+
+    Returns:
+        Shell command line
+    """
+    contents = path.endswith("/*")
+    root = path[:-2] if contents else path
+
+    tests = ["-mindepth 1", '! -path "$_aec_d/.*"'] if contents else []
+    if filters is not None and filters.is_active:
+        tests.append("-type f")
+        if filters.older_than_days is not None:
+            tests.append(f"-mmin +{filters.older_than_days * 24 * 60}")
+        if filters.larger_than is not None:
+            tests.append(f"-size +{filters.larger_than}c")
+    find_args = " ".join([*tests, "-delete"])
+
+    return (
+        f"_aec_f=0; for _aec_d in {root}; do "
+        f'[ -e "$_aec_d" ] || continue; find "$_aec_d" {find_args} || _aec_f=1; '
+        "done; [ $_aec_f = 0 ]"
+    )
+
+
+def deletes_path(option: CleanupOption) -> bool:
+    """
+    Check if a cleanup option does nothing but delete its path.
+
+    Only such options can be skipped when their path is empty; others (e.g.
+    ``pm trim-caches``) do more than their path shows.
+
+    Args:
+        option: Cleanup option
+
+    Returns:
+        True if the option's command is ``rm -rf <path>``
+    """
+    return option.command == f"adb shell rm -rf {option.path}"
+
+
+def cleanup_command(option: CleanupOption, filters: CleanupFilter | None = None) -> str:
+    """
+    Get the adb command that runs a cleanup option.
+
+    Options that delete their path (``rm -rf <path>``) are run as a
+    streaming ``find`` deletion; other commands are used as they are.
+
+    Args:
+        option: Cleanup option
+        filters: Age and size limits for path deletions
+
+    Returns:
+        adb command line
+    """
+    if deletes_path(option):
+        return f"adb shell {build_delete_command(option.path, filters)}"
+    return option.command
+
+
+class AppStorageCache:
+    """
+    Per-app storage of each device, kept for the length of a run.
+
+    ``dumpsys diskstats`` is slow, so it is read once per device and shared
+    by every cleaner (sync or async) created afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._storage: dict[str, dict[str, AppStorage]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, device_id: str) -> dict[str, AppStorage] | None:
+        """Get the cached storage of a device, or None if it wasn't read yet."""
+        with self._lock:
+            return self._storage.get(device_id)
+
+    def put(self, device_id: str, storage: dict[str, AppStorage]) -> None:
+        """Remember the storage of a device (empty results are not kept)."""
+        if storage:
+            with self._lock:
+                self._storage[device_id] = storage
+
+    def clear(self) -> None:
+        """Forget every device."""
+        with self._lock:
+            self._storage.clear()
+
+
+APP_STORAGE_CACHE = AppStorageCache()
+
+
+def app_entries(packages: list[str], storage: dict[str, AppStorage]) -> list[dict]:
+    """
+    Describe installed apps, largest first.
+
+    Args:
+        packages: Package names
+        storage: Per-app storage from ``dumpsys diskstats``
+
+    Returns:
+        List of dicts with 'package', 'name' and 'storage' (AppStorage or
+        None if unknown) keys; apps of unknown size come last, by name
+    """
+    apps = [
+        {"package": pkg, "name": pkg.split(".")[-1], "storage": storage.get(pkg)}
+        for pkg in packages
+    ]
+    return sorted(
+        apps, key=lambda app: (-app["storage"].total if app["storage"] else 1, app["package"])
+    )
+
+
 class DeviceCleaner:
     """Handles cleanup operations for a single device."""
 
-    def __init__(self, device: Device):
+    def __init__(self, device: Device, filters: CleanupFilter | None = None):
         """
         Initialize cleaner for a device.
 
         Args:
             device: Device to clean
+            filters: Age and size limits for path deletions
         """
         self.device = device
+        self.filters = filters
         self.client = ADBClient(device.device_id)
+        self._root_enabled: bool | None = None
+
+    def __enter__(self) -> "DeviceCleaner":
+        # adb root restarts adbd, which would kill a session opened first
+        self.enable_root()
+        self.open_session()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close_session()
+
+    def open_session(self) -> bool:
+        """
+        Keep one shell open on the device for all following commands.
+
+        Returns:
+            True if the session is ready (commands fall back to one-shot
+            calls otherwise)
+        """
+        return self.client.open_session()
+
+    def close_session(self) -> None:
+        """Close the persistent shell session."""
+        self.client.close_session()
 
     def enable_root(self) -> bool:
-        """Enable root access if device is an emulator."""
-        if self.device.is_emulator:
-            return self.client.enable_root()
-        return False
+        """Enable root access if device is an emulator (once per cleaner)."""
+        if self._root_enabled is None:
+            self._root_enabled = self.device.is_emulator and self.client.enable_root()
+            if self._root_enabled and self.client.session is not None:
+                # The adbd restart dropped the open session; start a new one
+                self.close_session()
+                self.open_session()
+        return self._root_enabled
 
     def run_cleanup(
         self, option: CleanupOption, progress_callback: Callable[[str], None] | None = None
@@ -113,12 +275,17 @@ class DeviceCleaner:
         if progress_callback:
             progress_callback(f"{self.device.model}: {option.name}...")
 
-        success, output = self.client.run_command(option.command)
+        success, output = self.client.run_command(cleanup_command(option, self.filters))
 
         return CleanupResult(option=option, success=success, output=output)
 
     def run_all_cleanups(
-        self, options: list[CleanupOption], progress_callback: Callable[[str], None] | None = None
+        self,
+        options: list[CleanupOption],
+        progress_callback: Callable[[str], None] | None = None,
+        fused: bool = False,
+        measure: bool = False,
+        sizes: list[int | None] | None = None,
     ) -> list[CleanupResult]:
         """
         Run multiple cleanup operations.
@@ -126,59 +293,229 @@ class DeviceCleaner:
         Args:
             options: List of cleanup options to execute
             progress_callback: Optional callback for progress updates
+            fused: Run all options as one device-side script
+            measure: Size every option's path before and after (one batched
+                ``du`` call each) and record the difference as bytes freed
+            sizes: Sizes of the options' paths measured beforehand (e.g. by
+                an estimate), with None where unknown; options that only
+                delete their path are skipped at 0 bytes, and known sizes
+                stand in for the "before" measurement
 
         Returns:
-            List of CleanupResult objects
+            List of CleanupResult objects, in the order of ``options``
         """
-        self.enable_root()
 
-        results = []
-        for option in options:
-            result = self.run_cleanup(option, progress_callback)
-            results.append(result)
+        def empty(sizes: list[int | None]) -> set[int]:
+            return {
+                index
+                for index, (option, size) in enumerate(zip(options, sizes))
+                if size == 0 and deletes_path(option)
+            }
+
+        before: list[int | None] = list(sizes) if sizes is not None else [None] * len(options)
+        skipped = empty(before)
+        if measure and any(
+            size is None for index, size in enumerate(before) if index not in skipped
+        ):
+            # Measure as the cleanup will run, so root-only paths are readable
+            self.enable_root()
+            before = self.measure_options(options)
+            skipped |= empty(before)
+        to_run = [option for index, option in enumerate(options) if index not in skipped]
+
+        if not to_run:
+            ran = []
+        elif fused:
+            ran = self.run_fused_cleanups(to_run, progress_callback)
+        else:
+            self.enable_root()
+            ran = [self.run_cleanup(option, progress_callback) for option in to_run]
+
+        ran_results = iter(ran)
+        results = [
+            CleanupResult(option=option, success=True, output="Already empty, skipped")
+            if index in skipped
+            else next(ran_results)
+            for index, option in enumerate(options)
+        ]
+
+        if measure and to_run:
+            after = self.measure_options(options)
+            for index, (result, size_after) in enumerate(zip(results, after)):
+                size_before = before[index]
+                if index not in skipped and size_before is not None and size_after is not None:
+                    result.bytes_freed = max(0, size_before - size_after)
 
         return results
 
+    def measure_options(self, options: list[CleanupOption]) -> list[int | None]:
+        """
+        Get the disk usage of each option's target path in one shell call.
+
+        Root is not requested here, so measuring never restarts adbd; paths
+        the current adbd user can't read come back as None.
+
+        Args:
+            options: Cleanup options to size
+
+        Returns:
+            Bytes used by each option's path, or None where it couldn't be read
+        """
+        return self.client.measure_paths([option.path for option in options])
+
+    def run_fused_cleanups(
+        self, options: list[CleanupOption], progress_callback: Callable[[str], None] | None = None
+    ) -> list[CleanupResult]:
+        """
+        Run multiple cleanup operations in a single shell invocation.
+
+        The options are compiled into one script; each option's exit status,
+        output and duration are parsed back into its own CleanupResult.
+        Options that are not plain shell commands run individually.
+
+        Args:
+            options: List of cleanup options to execute
+            progress_callback: Optional callback for progress updates
+
+        Returns:
+            List of CleanupResult objects, in the order of ``options``
+        """
+        self.enable_root()
+
+        commands = [cleanup_command(option, self.filters) for option in options]
+        shell_steps = {
+            index: command[len("adb shell ") :]
+            for index, command in enumerate(commands)
+            if command.startswith("adb shell ")
+        }
+
+        results: dict[int, CleanupResult] = {}
+        if shell_steps:
+            if progress_callback:
+                progress_callback(f"{self.device.model}: {len(shell_steps)} cleanups...")
+
+            marker = new_marker()
+            indexes = list(shell_steps)
+            script = build_script([shell_steps[index] for index in indexes], marker)
+            success, output = self.client.run_script(
+                script, timeout=ADBClient.DEFAULT_TIMEOUT * len(indexes)
+            )
+            steps = parse_script_output(output, len(indexes), marker)
+
+            for index, step in zip(indexes, steps):
+                if step is None:
+                    results[index] = CleanupResult(
+                        option=options[index],
+                        success=False,
+                        output=output if not success else "No result reported",
+                    )
+                else:
+                    results[index] = CleanupResult(
+                        option=options[index],
+                        success=step.success or "not installed" in step.output.lower(),
+                        output=step.output,
+                        duration=step.duration,
+                    )
+
+        for index, option in enumerate(options):
+            if index not in results:
+                results[index] = self.run_cleanup(option, progress_callback)
+
+        return [results[index] for index in range(len(options))]
+
     def get_installed_apps(self) -> list[dict]:
         """
-        Get list of user-installed apps on the device.
+        Get list of user-installed apps on the device, largest first.
 
         Returns:
-            List of dicts with 'package' and 'name' keys
+            List of dicts with 'package', 'name' and 'storage' keys
         """
         packages = self.client.list_packages(third_party_only=True)
-        return [{"package": pkg, "name": pkg.split(".")[-1]} for pkg in packages]
+        return app_entries(packages, self.get_app_storage())
 
-    def uninstall_app(self, package: str) -> UninstallResult:
+    def get_app_storage(self) -> dict[str, AppStorage]:
+        """
+        Get the space used by each app, read once per device and run.
+
+        Returns:
+            Dict of package name to AppStorage
+        """
+        storage = APP_STORAGE_CACHE.get(self.device.device_id)
+        if storage is None:
+            storage = self.client.get_app_storage()
+            APP_STORAGE_CACHE.put(self.device.device_id, storage)
+        return storage
+
+    def uninstall_app(self, package: str, keep_data: bool = False) -> UninstallResult:
         """
         Uninstall a single application.
 
         Args:
             package: Package name to uninstall
+            keep_data: Keep the app's data and cache directories
 
         Returns:
             UninstallResult object
         """
-        success, output = self.client.uninstall_package(package)
+        success, output = self.client.uninstall_package(package, keep_data)
         return UninstallResult(package=package, success=success, output=output)
 
     def uninstall_apps(
-        self, packages: list[str], progress_callback: Callable[[str], None] | None = None
+        self,
+        packages: list[str],
+        progress_callback: Callable[[str], None] | None = None,
+        keep_data: bool = False,
     ) -> list[UninstallResult]:
         """
-        Uninstall multiple applications.
+        Uninstall multiple applications in a single shell invocation.
+
+        Every package gets its own ``pm uninstall`` step in one device-side
+        script, so N packages cost one round trip instead of N.
 
         Args:
             packages: List of package names to uninstall
             progress_callback: Optional callback for progress updates
+            keep_data: Keep the apps' data and cache directories (``-k``)
 
         Returns:
-            List of UninstallResult objects
+            List of UninstallResult objects, in the order of ``packages``
         """
+        if not packages:
+            return []
+
+        if progress_callback:
+            progress_callback(f"{self.device.model}: uninstalling {len(packages)} apps...")
+
+        flag = "-k " if keep_data else ""
+        marker = new_marker()
+        script = build_script(
+            [f"pm uninstall {flag}{shlex.quote(package)}" for package in packages], marker
+        )
+        success, output = self.client.run_script(
+            script, timeout=ADBClient.DEFAULT_TIMEOUT * len(packages)
+        )
+        steps = parse_script_output(output, len(packages), marker)
+
         results = []
-        for package in packages:
-            if progress_callback:
-                progress_callback(f"Uninstalling {package}...")
-            result = self.uninstall_app(package)
-            results.append(result)
+        for package, step in zip(packages, steps):
+            if step is None:
+                results.append(
+                    UninstallResult(
+                        package=package,
+                        success=False,
+                        output=output if not success else "No result reported",
+                    )
+                )
+                continue
+
+            # Older pm versions exit 0 even when they print "Failure [...]"
+            step_output = step.output.lower()
+            step_success = step.success and "failure" not in step_output
+            results.append(
+                UninstallResult(
+                    package=package,
+                    success=step_success or "not installed" in step_output,
+                    output=step.output,
+                )
+            )
         return results
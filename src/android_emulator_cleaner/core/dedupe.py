@@ -0,0 +1,352 @@
+"""
+Content deduplication module.
+
+AVDs cloned from the same device profile often hold byte-identical large
+files. This module finds them (by size, then by the hash of the first
+chunk, then by the hash of the whole file, with hashing spread over a
+process pool) and replaces each duplicate with a reflink (``FICLONE``) of
+one copy, so the files share their data on disk while staying independent
+copy-on-write files. Reflinks need a filesystem that supports them (Btrfs,
+XFS, bcachefs); elsewhere the pass only reports what could be shared.
+Files whose extent maps (``FIEMAP``) already match are left alone, so a
+second pass doesn't clone them again.
+"""
+
+import contextlib
+import errno
+import hashlib
+import os
+import stat
+import struct
+import sys
+import tempfile
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+from ..models import DedupeResult
+
+MIN_DEDUPE_SIZE = 1024 * 1024
+HASH_CHUNK = 1024 * 1024
+DEFAULT_HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+# ioctl number of FICLONE (_IOW(0x94, 9, int)) on Linux
+FICLONE = 0x40049409
+
+# ioctl number of FS_IOC_FIEMAP (_IOWR('f', 11, struct fiemap)) on Linux
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_FLAG_SYNC = 0x1
+FIEMAP_EXTENT_LAST = 0x1
+# UNKNOWN, DELALLOC, ENCODED and DATA_INLINE extents have no comparable address
+FIEMAP_EXTENT_UNRELIABLE = 0x2 | 0x4 | 0x8 | 0x200
+FIEMAP_MAX_EXTENTS = 128
+
+# struct fiemap header and struct fiemap_extent
+_FIEMAP_HEADER = struct.Struct("=QQIIII")
+_FIEMAP_EXTENT = struct.Struct("=QQQ16xI12x")
+
+REFLINK_SUPPORTED = sys.platform.startswith("linux")
+
+# Errors meaning the filesystem (or platform) can't reflink at all
+_UNSUPPORTED_ERRNOS = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL}
+
+
+def hash_file(path: str, limit: int | None = None) -> str | None:
+    """
+    Hash a file chunk by chunk.
+
+    Args:
+        path: File path
+        limit: Only hash this many leading bytes
+
+    Returns:
+        Hex digest, or None if the file can't be read
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    remaining = limit
+    try:
+        with open(path, "rb") as f:
+            while remaining is None or remaining > 0:
+                size = HASH_CHUNK if remaining is None else min(HASH_CHUNK, remaining)
+                chunk = f.read(size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _hash_head(path: str) -> str | None:
+    """Hash the first chunk of a file."""
+    return hash_file(path, HASH_CHUNK)
+
+
+def same_content(first: str, second: str) -> bool:
+    """
+    Compare two files byte by byte.
+
+    Args:
+        first: File path
+        second: File path
+
+    Returns:
+        True if both files hold the same bytes
+    """
+    with open(first, "rb") as a, open(second, "rb") as b:
+        while True:
+            chunk = a.read(HASH_CHUNK)
+            if chunk != b.read(HASH_CHUNK):
+                return False
+            if not chunk:
+                return True
+
+
+def _iter_files(root: str) -> Iterator[tuple[str, os.stat_result]]:
+    """Yield (path, lstat) of the regular files below a directory, without recursion."""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry.path, entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def _split_by_hash(
+    groups: list[list[str]],
+    hasher: Callable[[str], str | None],
+    executor: ProcessPoolExecutor | None,
+) -> list[list[str]]:
+    """Split groups of paths into groups with equal hashes."""
+    paths = [path for group in groups for path in group]
+    if executor is not None:
+        digests = dict(zip(paths, executor.map(hasher, paths, chunksize=4)))
+    else:
+        digests = {path: hasher(path) for path in paths}
+
+    result: list[list[str]] = []
+    for group in groups:
+        by_digest: dict[str, list[str]] = defaultdict(list)
+        for path in group:
+            digest = digests[path]
+            if digest is not None:
+                by_digest[digest].append(path)
+        result.extend(sorted(same) for same in by_digest.values() if len(same) > 1)
+    return result
+
+
+def find_duplicates(
+    roots: list[str],
+    min_size: int = MIN_DEDUPE_SIZE,
+    max_workers: int = DEFAULT_HASH_WORKERS,
+) -> list[list[str]]:
+    """
+    Find groups of byte-identical files.
+
+    Files are grouped by filesystem and size, then narrowed by the hash of
+    their first chunk and finally by the hash of their whole content. Files
+    that are already hardlinks of each other count once.
+
+    Args:
+        roots: Directories to search
+        min_size: Ignore files smaller than this
+        max_workers: Processes used for hashing (1 hashes in this process)
+
+    Returns:
+        Groups of identical file paths, each sorted
+    """
+    by_size: dict[tuple[int, int], list[str]] = defaultdict(list)
+    seen: set[tuple[int, int]] = set()
+    for root in roots:
+        for path, st in _iter_files(root):
+            if st.st_size < min_size or (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+            by_size[(st.st_dev, st.st_size)].append(path)
+
+    groups = [sorted(paths) for paths in by_size.values() if len(paths) > 1]
+    if not groups:
+        return []
+
+    if max_workers <= 1:
+        return _split_by_hash(_split_by_hash(groups, _hash_head, None), hash_file, None)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        groups = _split_by_hash(groups, _hash_head, executor)
+        return _split_by_hash(groups, hash_file, executor)
+
+
+def _extent_map(path: str) -> list[tuple[int, int, int]] | None:
+    """Get the (logical, physical, length) extents of a file, or None if unknown."""
+    if not REFLINK_SUPPORTED:
+        return None
+    import fcntl
+
+    buf = bytearray(_FIEMAP_HEADER.size + FIEMAP_MAX_EXTENTS * _FIEMAP_EXTENT.size)
+    _FIEMAP_HEADER.pack_into(buf, 0, 0, 2**64 - 1, FIEMAP_FLAG_SYNC, 0, FIEMAP_MAX_EXTENTS, 0)
+    try:
+        with open(path, "rb") as f:
+            fcntl.ioctl(f.fileno(), FS_IOC_FIEMAP, buf)
+    except OSError:
+        return None
+
+    extents = []
+    flags = 0
+    for i in range(_FIEMAP_HEADER.unpack_from(buf)[3]):
+        offset = _FIEMAP_HEADER.size + i * _FIEMAP_EXTENT.size
+        logical, physical, length, flags = _FIEMAP_EXTENT.unpack_from(buf, offset)
+        if flags & FIEMAP_EXTENT_UNRELIABLE:
+            return None
+        extents.append((logical, physical, length))
+    # Empty files and maps longer than one call aren't compared
+    if not extents or not flags & FIEMAP_EXTENT_LAST:
+        return None
+    return extents
+
+
+def shares_extents(first: str, second: str) -> bool:
+    """
+    Check if two files already share all their data on disk.
+
+    Args:
+        first: File path
+        second: File path
+
+    Returns:
+        True if both files map to the same physical extents (False if the
+        filesystem can't tell)
+    """
+    extents = _extent_map(first)
+    return extents is not None and extents == _extent_map(second)
+
+
+def _copy_xattrs(target: str, fd: int) -> None:
+    """Give an open file the extended attributes of another file."""
+    try:
+        names = os.listxattr(target, follow_symlinks=False)
+    except OSError as e:
+        if e.errno in (errno.ENOTSUP, errno.EOPNOTSUPP):
+            return
+        raise
+    for attr in names:
+        value = os.getxattr(target, attr, follow_symlinks=False)
+        with contextlib.suppress(OSError):
+            if os.getxattr(fd, attr) == value:
+                continue
+        os.setxattr(fd, attr, value)
+
+
+def reflink_file(source: str, target: str) -> None:
+    """
+    Replace a file with a reflink of an identical file.
+
+    The clone is written next to the target, compared with it, given the
+    target's owner, extended attributes, mode and times, and renamed over
+    it, so the target is never left partial or changed. A target whose
+    owner or attributes can't be kept is left alone.
+
+    Args:
+        source: File to share data with
+        target: Identical file to replace
+
+    Raises:
+        OSError: If the filesystem can't reflink, the target's owner or
+            attributes can't be kept, or the target changed
+    """
+    if not REFLINK_SUPPORTED:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    import fcntl
+
+    st = os.stat(target)
+    directory, name = os.path.split(target)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with open(source, "rb") as src:
+            fcntl.ioctl(fd, FICLONE, src.fileno())
+        try:
+            # chown clears set-id bits and capabilities, so it goes first
+            clone = os.fstat(fd)
+            if (clone.st_uid, clone.st_gid) != (st.st_uid, st.st_gid):
+                os.chown(fd, st.st_uid, st.st_gid)
+            _copy_xattrs(target, fd)
+        except OSError as e:
+            raise OSError(errno.EPERM, f"Can't keep the owner and attributes of {name}") from e
+        os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        current = os.stat(target)
+        unchanged = (current.st_size, current.st_mtime_ns) == (st.st_size, st.st_mtime_ns)
+        if not unchanged or not same_content(tmp_path, target):
+            raise OSError(errno.EBUSY, f"{name} changed while deduplicating")
+        os.replace(tmp_path, target)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    finally:
+        os.close(fd)
+
+
+def dedupe_files(
+    roots: list[str],
+    dry_run: bool = False,
+    min_size: int = MIN_DEDUPE_SIZE,
+    max_workers: int = DEFAULT_HASH_WORKERS,
+) -> DedupeResult:
+    """
+    Share the data of identical files through reflinks.
+
+    The first path of each group (in sorted order) is kept; the others are
+    replaced with reflinks of it, unless they already share its extents.
+    The pass stops at the first file the filesystem can't reflink.
+
+    Args:
+        roots: Directories to search
+        dry_run: Only report what could be shared
+        min_size: Ignore files smaller than this
+        max_workers: Processes used for hashing
+
+    Returns:
+        DedupeResult with the bytes shared (or shareable, in a dry run)
+    """
+    result = DedupeResult(dry_run=dry_run)
+    unsupported = False
+    for group in find_duplicates(roots, min_size, max_workers):
+        if unsupported:
+            break
+        source, duplicates = group[0], group[1:]
+        try:
+            size = os.stat(source).st_size
+        except OSError as e:
+            result.errors.append(f"{os.path.basename(source)}: {e}")
+            continue
+
+        shared = 0
+        for target in duplicates:
+            if shares_extents(source, target):
+                continue
+            if not dry_run:
+                try:
+                    reflink_file(source, target)
+                except OSError as e:
+                    result.errors.append(f"{target}: {e}")
+                    if e.errno in _UNSUPPORTED_ERRNOS:
+                        unsupported = True
+                        break
+                    continue
+            shared += 1
+        if shared:
+            result.groups += 1
+            result.files += shared
+            result.shared_bytes += shared * size
+    return result
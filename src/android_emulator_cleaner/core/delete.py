@@ -0,0 +1,324 @@
+"""
+Deletion engine module.
+
+This module removes files and directory trees on the host. Trees are
+removed iteratively with fd-relative ``unlink``/``rmdir`` calls where the
+platform supports them, so paths are never re-resolved and symlinks are
+never followed. Independent paths are removed in parallel, with a limit on
+concurrent deletions per filesystem.
+"""
+
+import os
+import stat
+import sys
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from ..models import DeletionResult
+from .usage import allocated_size
+
+DEFAULT_DELETE_WORKERS = 8
+DEFAULT_PER_FILESYSTEM = 4
+
+IS_WINDOWS = sys.platform == "win32"
+
+# fd-relative operations are unavailable on Windows
+USE_DIR_FD = (
+    os.unlink in os.supports_dir_fd
+    and os.rmdir in os.supports_dir_fd
+    and os.open in os.supports_dir_fd
+    and os.scandir in os.supports_fd
+)
+
+_DIR_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_NOFOLLOW", 0)
+
+# A directory handle is an open fd (fd-relative mode) or a path
+Handle = int | str
+
+
+class FilesystemLimiter:
+    """Bounds concurrent deletions on each filesystem (by ``st_dev``)."""
+
+    def __init__(self, per_filesystem: int = DEFAULT_PER_FILESYSTEM):
+        """
+        Initialize the limiter.
+
+        Args:
+            per_filesystem: Maximum concurrent deletions per filesystem
+        """
+        self.per_filesystem = max(1, per_filesystem)
+        self._semaphores: dict[int, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, device: int) -> Iterator[None]:
+        """
+        Hold one slot on a filesystem while the block runs.
+
+        Args:
+            device: ``st_dev`` of the filesystem
+        """
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                device, threading.BoundedSemaphore(self.per_filesystem)
+            )
+        with semaphore:
+            yield
+
+
+class DeletionEngine:
+    """Removes files and directory trees in parallel."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_DELETE_WORKERS,
+        per_filesystem: int = DEFAULT_PER_FILESYSTEM,
+    ):
+        """
+        Initialize the engine.
+
+        Args:
+            max_workers: Maximum number of paths removed at the same time
+            per_filesystem: Maximum concurrent removals on one filesystem
+        """
+        self.max_workers = max(1, max_workers)
+        self.limiter = FilesystemLimiter(per_filesystem)
+
+    def delete(
+        self,
+        paths: list[str],
+        on_progress: Callable[[str, DeletionResult], None] | None = None,
+    ) -> DeletionResult:
+        """
+        Remove files and directory trees.
+
+        Directories are split into their entries, which are removed in
+        parallel before the emptied directory itself. ``on_progress`` is
+        called on the calling thread as each entry finishes, so callers can
+        report bytes freed as the run goes.
+
+        Args:
+            paths: Files or directories to remove
+            on_progress: Optional callback with each removed path and its result
+
+        Returns:
+            Combined DeletionResult for all paths
+        """
+        total = DeletionResult()
+        units, containers = _split_paths(paths)
+
+        if units:
+            workers = min(self.max_workers, len(units))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self._delete_path, unit): unit for unit in units}
+                for future in as_completed(futures):
+                    result = future.result()
+                    total.update(result)
+                    if on_progress:
+                        on_progress(futures[future], result)
+
+        # Remove the emptied directories (and anything that appeared meanwhile)
+        for container in containers:
+            result = remove_path(container)
+            total.update(result)
+            if on_progress and (result.files_removed or result.errors):
+                on_progress(container, result)
+        return total
+
+    def _delete_path(self, path: str) -> DeletionResult:
+        """Remove one path while holding a slot on its filesystem."""
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            return DeletionResult()
+        except OSError as e:
+            return DeletionResult(errors=[f"{os.path.basename(path)}: {e}"])
+
+        with self.limiter.slot(st.st_dev):
+            return remove_path(path)
+
+
+def _split_paths(paths: list[str]) -> tuple[list[str], list[str]]:
+    """
+    Split directories into their entries so subtrees are removed in parallel.
+
+    Args:
+        paths: Files or directories to remove
+
+    Returns:
+        Tuple of (paths to remove in parallel, directories to remove afterwards)
+    """
+    units: list[str] = []
+    containers: list[str] = []
+    for path in paths:
+        try:
+            is_dir = stat.S_ISDIR(os.lstat(path).st_mode)
+        except OSError:
+            units.append(path)
+            continue
+        if not is_dir:
+            units.append(path)
+            continue
+        try:
+            with os.scandir(path) as entries:
+                units.extend(sorted(entry.path for entry in entries))
+        except OSError:
+            pass
+        containers.append(path)
+    return units, containers
+
+
+def remove_path(path: str) -> DeletionResult:
+    """
+    Remove a file or a whole directory tree.
+
+    Bytes freed count the allocated size of every removed file that had no
+    other hardlinks. Errors are collected and don't stop the removal.
+
+    Args:
+        path: File or directory to remove
+
+    Returns:
+        DeletionResult object
+    """
+    result = DeletionResult()
+    parent, name = os.path.split(os.path.abspath(path))
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return result
+    except OSError as e:
+        result.errors.append(f"{name}: {e}")
+        return result
+
+    if not stat.S_ISDIR(st.st_mode):
+        _remove_file(parent, name, st, result)
+        return result
+
+    try:
+        parent_handle = _open_dir(parent)
+    except OSError as e:
+        result.errors.append(f"{name}: {e}")
+        return result
+    try:
+        _remove_tree(parent_handle, name, result)
+    finally:
+        _close_dir(parent_handle)
+    return result
+
+
+def _remove_tree(parent: Handle, name: str, result: DeletionResult) -> None:
+    """Remove a directory tree iteratively, deepest directories first."""
+    try:
+        root = _open_child(parent, name)
+    except OSError as e:
+        result.errors.append(f"{name}: {e}")
+        return
+
+    # Frames of (handle, parent handle, name, subdirectories still to remove)
+    stack = [(root, parent, name, _clear_files(root, name, result))]
+    while stack:
+        handle, parent_handle, dir_name, pending = stack[-1]
+        if pending:
+            child_name = pending.pop()
+            try:
+                child = _open_child(handle, child_name)
+            except OSError as e:
+                result.errors.append(f"{child_name}: {e}")
+                continue
+            stack.append((child, handle, child_name, _clear_files(child, child_name, result)))
+            continue
+
+        stack.pop()
+        _close_dir(handle)
+        try:
+            _rmdir(parent_handle, dir_name)
+        except OSError as e:
+            result.errors.append(f"{dir_name}: {e}")
+
+
+def _clear_files(handle: Handle, dir_name: str, result: DeletionResult) -> list[str]:
+    """Remove the files in a directory and return its subdirectory names."""
+    subdirs: list[str] = []
+    try:
+        with os.scandir(handle) as entries:
+            items = list(entries)
+    except OSError as e:
+        result.errors.append(f"{dir_name}: {e}")
+        return subdirs
+
+    for entry in items:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+                continue
+            st = entry.stat(follow_symlinks=False)
+        except OSError as e:
+            result.errors.append(f"{entry.name}: {e}")
+            continue
+        _remove_file(handle, entry.name, st, result)
+    return subdirs
+
+
+def _remove_file(parent: Handle, name: str, st: os.stat_result, result: DeletionResult) -> None:
+    """Unlink one file (or symlink) and account for the space it frees."""
+    try:
+        _unlink(parent, name)
+    except PermissionError as e:
+        if not (IS_WINDOWS and isinstance(parent, str)):
+            result.errors.append(f"{name}: {e}")
+            return
+        # Windows refuses to delete read-only files
+        try:
+            os.chmod(os.path.join(parent, name), stat.S_IWRITE)
+            _unlink(parent, name)
+        except OSError:
+            result.errors.append(
+                f"{name}: File is locked. Close any programs using it and try again."
+            )
+            return
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        result.errors.append(f"{name}: {e}")
+        return
+
+    result.files_removed += 1
+    if st.st_nlink <= 1 and stat.S_ISREG(st.st_mode):
+        result.bytes_freed += allocated_size(st)
+
+
+def _open_dir(path: str) -> Handle:
+    """Open a directory handle for a path."""
+    return os.open(path, _DIR_FLAGS) if USE_DIR_FD else path
+
+
+def _open_child(parent: Handle, name: str) -> Handle:
+    """Open a handle for a subdirectory without following symlinks."""
+    if isinstance(parent, int):
+        return os.open(name, _DIR_FLAGS, dir_fd=parent)
+    return os.path.join(parent, name)
+
+
+def _close_dir(handle: Handle) -> None:
+    """Close a directory handle."""
+    if isinstance(handle, int):
+        os.close(handle)
+
+
+def _unlink(parent: Handle, name: str) -> None:
+    """Unlink an entry of a directory."""
+    if isinstance(parent, int):
+        os.unlink(name, dir_fd=parent)
+    else:
+        os.unlink(os.path.join(parent, name))
+
+
+def _rmdir(parent: Handle, name: str) -> None:
+    """Remove an empty subdirectory of a directory."""
+    if isinstance(parent, int):
+        os.rmdir(name, dir_fd=parent)
+    else:
+        os.rmdir(os.path.join(parent, name))
@@ -0,0 +1,206 @@
+"""
+Concurrent multi-device cleanup module.
+
+This module runs each device's whole cleanup pipeline (storage before,
+uninstalls, cleanups, storage after) on a bounded thread pool. Workers only
+post progress events to a queue; a single consumer on the calling thread
+drains it, so UI code such as a Rich progress bar is never touched from
+more than one thread.
+"""
+
+import queue
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ..models import (
+    CleanupFilter,
+    CleanupOption,
+    Device,
+    DeviceCleanupSummary,
+    ProgressEvent,
+    ReclaimEstimate,
+    StorageSnapshot,
+)
+from .cleaner import DeviceCleaner
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class CleanupEngine:
+    """Runs device cleanup pipelines in parallel."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        fused: bool = False,
+        keep_data: bool = False,
+        measure: bool = True,
+        filters: CleanupFilter | None = None,
+    ):
+        """
+        Initialize the engine.
+
+        Args:
+            max_workers: Maximum number of devices processed at once
+            fused: Run each device's cleanup options as one device-side script
+            keep_data: Keep data and cache directories of uninstalled apps
+            measure: Record the bytes each cleanup option freed
+            filters: Age and size limits for path deletions
+        """
+        self.max_workers = max(1, max_workers)
+        self.fused = fused
+        self.keep_data = keep_data
+        self.measure = measure
+        self.filters = filters
+
+    def run(
+        self,
+        devices: list[Device],
+        options: list[CleanupOption],
+        apps_to_uninstall: dict[str, list[str]] | None = None,
+        on_progress: Callable[[ProgressEvent], None] | None = None,
+        storage_before: dict[str, StorageSnapshot] | None = None,
+        estimates: dict[str, ReclaimEstimate] | None = None,
+    ) -> list[DeviceCleanupSummary]:
+        """
+        Clean several devices concurrently.
+
+        Args:
+            devices: Devices to clean
+            options: Cleanup options to run on every device
+            apps_to_uninstall: Packages to uninstall, keyed by device ID
+            on_progress: Callback for progress events, always invoked on the
+                calling thread
+            storage_before: Storage already probed, keyed by device ID; these
+                devices are not probed again before cleaning
+            estimates: Results of ``estimate()``, keyed by device ID; options
+                whose targets were empty are skipped on those devices
+
+        Returns:
+            List of DeviceCleanupSummary objects, in the order of ``devices``;
+            a device whose pipeline raised has its ``error`` set
+        """
+        if not devices:
+            return []
+
+        apps = apps_to_uninstall or {}
+        probed = storage_before or {}
+        estimated = estimates or {}
+        events: queue.Queue[ProgressEvent] = queue.Queue()
+        workers = min(self.max_workers, len(devices))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aec-device") as pool:
+            futures = [
+                pool.submit(
+                    self._run_device,
+                    device,
+                    options,
+                    apps.get(device.device_id, []),
+                    events,
+                    probed.get(device.device_id),
+                    estimated.get(device.device_id),
+                )
+                for device in devices
+            ]
+
+            finished = 0
+            while finished < len(devices):
+                event = events.get()
+                if event.finished:
+                    finished += 1
+                if on_progress:
+                    on_progress(event)
+
+        return [future.result() for future in futures]
+
+    def estimate(
+        self,
+        devices: list[Device],
+        options: list[CleanupOption],
+        on_progress: Callable[[ProgressEvent], None] | None = None,
+    ) -> list[ReclaimEstimate]:
+        """
+        Measure what the cleanup options would free, without deleting anything.
+
+        Each device's option paths are sized in one batched ``du`` call, with
+        the devices measured concurrently. Device state is left alone: adbd
+        is not restarted as root, so paths only root can read are unknown.
+
+        Args:
+            devices: Devices to measure
+            options: Cleanup options to size
+            on_progress: Callback for progress events, invoked on the calling
+                thread as each device finishes
+
+        Returns:
+            List of ReclaimEstimate objects, in the order of ``devices``
+            (sizes are unknown for a device that couldn't be measured)
+        """
+        if not devices:
+            return []
+
+        def measure(device: Device) -> ReclaimEstimate:
+            sizes: list[int | None]
+            try:
+                sizes = DeviceCleaner(device).measure_options(options) if options else []
+            except Exception:
+                sizes = [None] * len(options)
+            return ReclaimEstimate(device=device, options=list(options), sizes=sizes)
+
+        workers = min(self.max_workers, len(devices))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aec-estimate") as pool:
+            futures = {pool.submit(measure, device): device for device in devices}
+            for future in as_completed(futures):
+                if on_progress:
+                    device_id = futures[future].device_id
+                    on_progress(ProgressEvent(device_id=device_id, advance=1, finished=True))
+
+        return [future.result() for future in futures]
+
+    def _run_device(
+        self,
+        device: Device,
+        options: list[CleanupOption],
+        packages: list[str],
+        events: "queue.Queue[ProgressEvent]",
+        storage_before: StorageSnapshot | None = None,
+        estimate: ReclaimEstimate | None = None,
+    ) -> DeviceCleanupSummary:
+        """Run the full pipeline for one device (worker thread)."""
+        device_id = device.device_id
+
+        def report(message: str) -> None:
+            events.put(ProgressEvent(device_id=device_id, message=message))
+
+        summary = DeviceCleanupSummary(device=device)
+        try:
+            with DeviceCleaner(device, self.filters) as cleaner:
+                summary.storage_before = storage_before or cleaner.client.get_storage_snapshot()
+
+                if packages:
+                    summary.uninstall_results = cleaner.uninstall_apps(
+                        packages, report, keep_data=self.keep_data
+                    )
+                    events.put(ProgressEvent(device_id=device_id, advance=len(packages)))
+
+                if options:
+                    sizes = None
+                    if estimate is not None:
+                        sizes = [estimate.size_of(option) for option in options]
+                        if packages:
+                            # Uninstalls may have shrunk the targets; only keep
+                            # the "empty" flags and measure the rest again
+                            sizes = [0 if size == 0 else None for size in sizes]
+                    summary.cleanup_results = cleaner.run_all_cleanups(
+                        options, report, fused=self.fused, measure=self.measure, sizes=sizes
+                    )
+                    events.put(ProgressEvent(device_id=device_id, advance=len(options)))
+
+                summary.storage_after = cleaner.client.get_storage_snapshot()
+        except Exception as e:
+            # One device failing must not discard the other devices' results
+            summary.error = str(e) or type(e).__name__
+        finally:
+            events.put(ProgressEvent(device_id=device_id, finished=True))
+
+        return summary
@@ -0,0 +1,239 @@
+"""
+AVD size index module.
+
+This module keeps an on-disk index of directory sizes so AVDs that haven't
+changed since the last run don't have to be walked again. Each directory is
+keyed by its path, inode and mtime; a directory whose key still matches
+reuses its cached file totals, hardlinked files and subdirectory list.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from .usage import DirectoryScan, TreeUsage, scan_directory, tree_usage
+
+INDEX_VERSION = 2
+INDEX_FILENAME = "avd-sizes.json"
+
+
+def default_index_path() -> Path:
+    """
+    Get the default index location.
+
+    Returns:
+        ``$XDG_CACHE_HOME/android-emulator-cleaner/avd-sizes.json`` (or under ``~/.cache``)
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(cache_home) / "android-emulator-cleaner" / INDEX_FILENAME
+
+
+class SizeIndex:
+    """
+    Persistent per-directory size index.
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed in it, so matching (inode, mtime) means its listing is unchanged.
+    Files rewritten in place don't touch the directory mtime, so each scanned
+    root also records when it was scanned; ``invalidate_if_modified`` drops a
+    root that has been written to since (e.g. by an emulator run).
+    """
+
+    def __init__(self, path: Path | None = None):
+        """
+        Initialize an empty index.
+
+        Args:
+            path: Index file (defaults to ``default_index_path()``)
+        """
+        self.path = path or default_index_path()
+        self._entries: dict[str, dict] = {}
+        self._roots: dict[str, int] = {}
+        self._touched: set[str] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "SizeIndex":
+        """
+        Load the index from disk.
+
+        A missing, unreadable or corrupt index yields an empty one, which is
+        rebuilt on the next ``save()``.
+
+        Args:
+            path: Index file (defaults to ``default_index_path()``)
+
+        Returns:
+            SizeIndex object
+        """
+        index = cls(path)
+        try:
+            with open(index.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return index
+        entries = data.get("entries")
+        if not isinstance(entries, dict):
+            return index
+
+        roots = data.get("roots")
+        if isinstance(roots, dict):
+            index._roots = {key: value for key, value in roots.items() if isinstance(value, int)}
+        index._entries = {key: entry for key, entry in entries.items() if _valid_entry(entry)}
+        return index
+
+    def save(self) -> bool:
+        """
+        Write the index to disk atomically.
+
+        Only directories visited since the index was loaded are kept, so
+        deleted AVDs drop out of the index.
+
+        Returns:
+            True if the index was written
+        """
+        with self._lock:
+            entries = {key: self._entries[key] for key in self._touched if key in self._entries}
+            roots = {key: self._roots[key] for key in self._touched if key in self._roots}
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.path.parent, prefix=".avd-sizes-", suffix=".tmp"
+            )
+        except OSError:
+            return False
+
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "roots": roots, "entries": entries}, f)
+            os.replace(tmp_path, self.path)
+            return True
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            return False
+
+    def invalidate(self, path: str) -> None:
+        """
+        Drop cached entries for a directory and everything below it.
+
+        Args:
+            path: Directory path
+        """
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            for key in [k for k in self._entries if k == path or k.startswith(prefix)]:
+                del self._entries[key]
+
+    def invalidate_if_modified(self, path: str, modified_ns: int) -> bool:
+        """
+        Drop a root's entries if it was modified after it was last scanned.
+
+        Args:
+            path: Root directory path
+            modified_ns: Newest known modification time under the root
+
+        Returns:
+            True if the root was invalidated
+        """
+        with self._lock:
+            scanned_ns = self._roots.get(path)
+        if scanned_ns is not None and modified_ns < scanned_ns:
+            return False
+        self.invalidate(path)
+        return True
+
+    def mark_scanned(self, path: str, scanned_ns: int) -> None:
+        """
+        Record when a root was scanned.
+
+        Args:
+            path: Root directory path
+            scanned_ns: Time the scan started (``time.time_ns()``)
+        """
+        with self._lock:
+            self._roots[path] = scanned_ns
+            self._touched.add(path)
+
+    def usage(self, path: str) -> TreeUsage:
+        """
+        Measure a directory tree, reusing unchanged directories.
+
+        Counts the same bytes as ``usage.tree_usage``.
+
+        Args:
+            path: Directory path
+
+        Returns:
+            TreeUsage of every file below ``path``
+        """
+        return tree_usage(path, self._lookup)
+
+    def dir_size(self, path: str) -> int:
+        """
+        Calculate directory size in bytes, reusing unchanged directories.
+
+        Args:
+            path: Directory path
+
+        Returns:
+            Total (apparent) size in bytes
+        """
+        return self.usage(path).resolve().apparent
+
+    def _lookup(self, path: str) -> DirectoryScan | None:
+        """Get a directory's contents, rescanning it if its key changed."""
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            self._touched.add(path)
+        if entry is not None and entry["ino"] == st.st_ino and entry["mtime"] == st.st_mtime_ns:
+            links = {(dev, ino): (size, alloc) for dev, ino, size, alloc in entry["links"]}
+            return DirectoryScan(
+                usage=TreeUsage(entry["files"], entry["blocks"], links), dirs=entry["dirs"]
+            )
+
+        result = scan_directory(path)
+        if result is None:
+            return None
+
+        entry = {
+            "ino": st.st_ino,
+            "mtime": st.st_mtime_ns,
+            "files": result.usage.apparent,
+            "blocks": result.usage.allocated,
+            "links": [[*key, *sizes] for key, sizes in result.usage.links.items()],
+            "dirs": result.dirs,
+        }
+        with self._lock:
+            self._entries[path] = entry
+        return result
+
+
+def _valid_entry(entry: object) -> bool:
+    """Check that an index entry has the expected shape."""
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get("ino"), int)
+        and isinstance(entry.get("mtime"), int)
+        and isinstance(entry.get("files"), int)
+        and isinstance(entry.get("blocks"), int)
+        and isinstance(entry.get("dirs"), list)
+        and all(isinstance(name, str) for name in entry["dirs"])
+        and isinstance(entry.get("links"), list)
+        and all(
+            isinstance(link, list) and len(link) == 4 and all(isinstance(n, int) for n in link)
+            for link in entry["links"]
+        )
+    )
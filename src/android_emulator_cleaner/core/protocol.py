@@ -0,0 +1,409 @@
+"""
+ADB server protocol module.
+
+This module talks the ADB "smart socket" protocol directly to the local adb
+server (TCP 5037 by default), so commands can be sent to devices without
+spawning a new ``adb`` process for each one.
+"""
+
+import contextlib
+import os
+import socket
+import struct
+import time
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+# shell v2 packet ids
+SHELL_ID_STDOUT = 1
+SHELL_ID_STDERR = 2
+SHELL_ID_EXIT = 3
+
+# Marker used to recover the exit code from legacy (v1) shell sessions
+_LEGACY_EXIT_MARKER = ":AEC_EXIT:"
+
+
+class ADBServerError(Exception):
+    """Exception raised when the adb server rejects a request."""
+
+    pass
+
+
+class ADBServerConnection:
+    """A single connection to the adb server."""
+
+    def __init__(self, host: str, port: int, timeout: float | None):
+        """
+        Open a connection to the adb server.
+
+        Args:
+            host: Server host
+            port: Server port
+            timeout: Socket timeout in seconds (None blocks forever)
+        """
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+
+    def __enter__(self) -> "ADBServerConnection":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection."""
+        with contextlib.suppress(OSError):
+            self.sock.close()
+
+    def send(self, request: str) -> None:
+        """
+        Send a length-prefixed request and wait for its status.
+
+        Args:
+            request: Request payload (e.g. "host:version")
+
+        Raises:
+            ADBServerError: If the server answers with FAIL
+        """
+        payload = request.encode("utf-8")
+        self.sock.sendall(f"{len(payload):04x}".encode("ascii") + payload)
+        self.read_status()
+
+    def read_status(self) -> None:
+        """
+        Read an OKAY/FAIL status from the server.
+
+        Raises:
+            ADBServerError: If the server answers with FAIL
+        """
+        status = self.read_exactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise ADBServerError(self.read_length_prefixed())
+        raise ADBServerError(f"Unexpected response from adb server: {status!r}")
+
+    def read_exactly(self, size: int) -> bytes:
+        """
+        Read exactly ``size`` bytes.
+
+        Raises:
+            ConnectionError: If the connection closes early
+        """
+        chunks = []
+        remaining = size
+        while remaining:
+            chunk = self.sock.recv(remaining)
+            if not chunk:
+                raise ConnectionError("Connection closed by adb server")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def read_length_prefixed(self) -> str:
+        """Read a 4-hex-digit length prefixed string."""
+        length = int(self.read_exactly(4), 16)
+        return self.read_exactly(length).decode("utf-8", errors="replace")
+
+    def read_all(self) -> bytes:
+        """Read until the server closes the connection."""
+        chunks = []
+        while True:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+class ADBServer:
+    """Client for the local adb server."""
+
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, host: str | None = None, port: int | None = None):
+        """
+        Initialize the server client.
+
+        Args:
+            host: Server host (defaults to localhost)
+            port: Server port (defaults to $ANDROID_ADB_SERVER_PORT or 5037)
+        """
+        self.host = host or DEFAULT_HOST
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_PORT))
+        self._available: bool | None = None
+        self._features: dict[str, set[str]] = {}
+
+    def connect(self, timeout: float | None = DEFAULT_TIMEOUT) -> ADBServerConnection:
+        """
+        Open a new connection to the server.
+
+        Args:
+            timeout: Socket timeout in seconds
+
+        Returns:
+            ADBServerConnection
+        """
+        return ADBServerConnection(self.host, self.port, timeout)
+
+    def is_available(self) -> bool:
+        """
+        Check whether an adb server is listening.
+
+        The result is cached; call ``reset()`` to probe again.
+
+        Returns:
+            True if the server answered a version request
+        """
+        if self._available is None:
+            try:
+                self.version()
+                self._available = True
+            except (OSError, ADBServerError, ValueError):
+                self._available = False
+        return self._available
+
+    def mark_unavailable(self) -> None:
+        """Stop using the server until ``reset()`` is called."""
+        self._available = False
+
+    def reset(self) -> None:
+        """Forget cached availability and device features."""
+        self._available = None
+        self._features.clear()
+
+    def version(self) -> int:
+        """
+        Get the adb server protocol version.
+
+        Returns:
+            Server version number
+        """
+        with self.connect(timeout=2) as conn:
+            conn.send("host:version")
+            return int(conn.read_length_prefixed(), 16)
+
+    def devices(self, long: bool = True) -> str:
+        """
+        List devices known to the server.
+
+        Args:
+            long: Include product/model/device/transport_id fields
+
+        Returns:
+            Raw device list, one device per line
+        """
+        with self.connect() as conn:
+            conn.send("host:devices-l" if long else "host:devices")
+            return conn.read_length_prefixed()
+
+    def features(self, serial: str | None) -> set[str]:
+        """
+        Get the feature set supported by a device.
+
+        Args:
+            serial: Device serial (None for the only connected device)
+
+        Returns:
+            Set of feature names (e.g. "shell_v2")
+        """
+        key = serial or ""
+        if key not in self._features:
+            prefix = f"host-serial:{serial}" if serial else "host"
+            with self.connect() as conn:
+                conn.send(f"{prefix}:features")
+                self._features[key] = set(filter(None, conn.read_length_prefixed().split(",")))
+        return self._features[key]
+
+    def open_service(
+        self, serial: str | None, service: str, timeout: float | None = DEFAULT_TIMEOUT
+    ) -> ADBServerConnection:
+        """
+        Open a device service through the server.
+
+        Args:
+            serial: Device serial (None for the only connected device)
+            service: Service name (e.g. "shell:ls")
+            timeout: Socket timeout in seconds
+
+        Returns:
+            Connection positioned at the start of the service stream
+        """
+        conn = self.connect(timeout=timeout)
+        try:
+            conn.send(f"host:transport:{serial}" if serial else "host:transport-any")
+            conn.send(service)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def shell(
+        self, serial: str | None, command: str, timeout: float | None = DEFAULT_TIMEOUT
+    ) -> tuple[int, str, str]:
+        """
+        Run a shell command on a device.
+
+        Uses the shell v2 protocol when the device supports it, so stdout,
+        stderr and the exit code are reported separately.
+
+        Args:
+            serial: Device serial
+            command: Shell command line
+            timeout: Socket timeout in seconds
+
+        Returns:
+            Tuple of (exit_code, stdout, stderr)
+        """
+        if "shell_v2" in self.features(serial):
+            return self._shell_v2(serial, command, timeout)
+        return self._shell_legacy(serial, command, timeout)
+
+    def exec_out(
+        self, serial: str | None, command: str, timeout: float | None = DEFAULT_TIMEOUT
+    ) -> bytes:
+        """
+        Run a command through the raw ``exec:`` service.
+
+        Args:
+            serial: Device serial
+            command: Command line
+            timeout: Socket timeout in seconds
+
+        Returns:
+            Raw command output
+        """
+        with self.open_service(serial, f"exec:{command}", timeout) as conn:
+            return conn.read_all()
+
+    def root(self, serial: str | None, timeout: float | None = DEFAULT_TIMEOUT) -> str:
+        """
+        Restart adbd with root permissions.
+
+        Args:
+            serial: Device serial
+            timeout: Socket timeout in seconds
+
+        Returns:
+            Message printed by adbd
+        """
+        with self.open_service(serial, "root:", timeout) as conn:
+            return conn.read_all().decode("utf-8", errors="replace")
+
+    def get_state(self, serial: str | None) -> str:
+        """
+        Get the connection state of a device.
+
+        Args:
+            serial: Device serial (None for the only connected device)
+
+        Returns:
+            State reported by the server (e.g. "device", "offline")
+
+        Raises:
+            ADBServerError: If the device is not connected
+        """
+        prefix = f"host-serial:{serial}" if serial else "host"
+        with self.connect(timeout=2) as conn:
+            conn.send(f"{prefix}:get-state")
+            return conn.read_length_prefixed()
+
+    def wait_for_restart(
+        self,
+        serial: str | None,
+        timeout: float = DEFAULT_TIMEOUT,
+        drop_timeout: float = 5.0,
+        interval: float = 0.1,
+    ) -> bool:
+        """
+        Wait for adbd to restart: the transport drops, then comes back online.
+
+        If the transport is never seen dropping within ``drop_timeout`` the
+        restart is assumed to have been too quick to observe.
+
+        Args:
+            serial: Device serial (None for the only connected device)
+            timeout: Overall time limit in seconds
+            drop_timeout: How long to wait for the transport to drop
+            interval: Polling interval in seconds
+
+        Returns:
+            True if the device is back in the "device" state
+        """
+        start = time.monotonic()
+        dropped = False
+        while True:
+            try:
+                state = self.get_state(serial)
+            except ADBServerError:
+                state = ""
+            if state != "device":
+                dropped = True
+            elif dropped or time.monotonic() - start >= drop_timeout:
+                return True
+            if time.monotonic() - start >= timeout:
+                return False
+            time.sleep(interval)
+
+    def _shell_v2(
+        self, serial: str | None, command: str, timeout: float | None
+    ) -> tuple[int, str, str]:
+        """Run a command with the shell v2 packet protocol."""
+        stdout = bytearray()
+        stderr = bytearray()
+        exit_code = 255
+
+        with self.open_service(serial, f"shell,v2,raw:{command}", timeout) as conn:
+            while True:
+                try:
+                    header = conn.read_exactly(5)
+                except ConnectionError:
+                    break
+                packet_id, length = struct.unpack("<BI", header)
+                data = conn.read_exactly(length) if length else b""
+                if packet_id == SHELL_ID_STDOUT:
+                    stdout += data
+                elif packet_id == SHELL_ID_STDERR:
+                    stderr += data
+                elif packet_id == SHELL_ID_EXIT:
+                    exit_code = data[0] if data else 0
+                    break
+
+        return (
+            exit_code,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+        )
+
+    def _shell_legacy(
+        self, serial: str | None, command: str, timeout: float | None
+    ) -> tuple[int, str, str]:
+        """Run a command with the v1 shell service and recover the exit code."""
+        service = f"shell:{command} ; echo {_LEGACY_EXIT_MARKER}$?"
+        with self.open_service(serial, service, timeout) as conn:
+            output = conn.read_all().decode("utf-8", errors="replace")
+
+        body, marker, tail = output.rpartition(_LEGACY_EXIT_MARKER)
+        if not marker:
+            return 255, output, ""
+        try:
+            exit_code = int(tail.strip())
+        except ValueError:
+            exit_code = 255
+        return exit_code, body, ""
+
+
+_default_server: ADBServer | None = None
+
+
+def get_default_server() -> ADBServer:
+    """
+    Get the shared server client for this process.
+
+    Returns:
+        ADBServer instance
+    """
+    global _default_server
+    if _default_server is None:
+        _default_server = ADBServer()
+    return _default_server
@@ -0,0 +1,423 @@
+"""
+qcow2 overlay compaction module.
+
+AVDs keep their writable state in qcow2 overlays on top of the read-only
+system images. Overlays only grow: clusters the guest frees stay allocated
+on the host. This module reads an overlay's L1/L2 tables and writes a new
+overlay that only holds the clusters still needed:
+
+- unallocated clusters stay unallocated (they read through to the backing file)
+- all-zero clusters become unallocated when there is no backing file, or
+  zero-flagged clusters (qcow2 v3) when there is one
+- every other cluster is copied as-is
+
+The new image is verified cluster by cluster against the original before it
+atomically replaces it. Images this module can't rewrite safely (internal
+snapshots, encryption, compressed clusters, dirty or unknown feature bits)
+are left untouched.
+"""
+
+import contextlib
+import os
+import struct
+import tempfile
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from ..models import CompactionResult
+from .usage import allocated_size
+
+QCOW2_MAGIC = b"QFI\xfb"
+
+# Header field offsets (big-endian)
+_HEADER_V2 = struct.Struct(">4sIQIIQIIQQIIQ")
+_HEADER_V3_EXTRA = struct.Struct(">QQQII")
+_L1_TABLE_OFFSET = 40
+_REFCOUNT_TABLE_OFFSET = 48
+_REFCOUNT_TABLE_CLUSTERS = 56
+_NB_SNAPSHOTS = 60
+_SNAPSHOTS_OFFSET = 64
+
+OFFSET_MASK = 0x00FFFFFFFFFFFE00
+COPIED_FLAG = 1 << 63
+COMPRESSED_FLAG = 1 << 62
+ZERO_FLAG = 1
+
+
+class Qcow2Error(Exception):
+    """Raised when a qcow2 image can't be read or safely rewritten."""
+
+
+@dataclass
+class Qcow2Header:
+    """Fields of a qcow2 header needed for compaction."""
+
+    version: int
+    backing_file_offset: int
+    backing_file_size: int
+    cluster_bits: int
+    size: int
+    crypt_method: int
+    l1_size: int
+    l1_table_offset: int
+    nb_snapshots: int
+    incompatible_features: int = 0
+    autoclear_features: int = 0
+    refcount_order: int = 4
+
+    @property
+    def cluster_size(self) -> int:
+        """Get the cluster size in bytes."""
+        return 1 << self.cluster_bits
+
+    @property
+    def has_backing_file(self) -> bool:
+        """Check if unallocated clusters read through to a backing file."""
+        return self.backing_file_offset != 0
+
+
+def read_header(f: BinaryIO) -> Qcow2Header:
+    """
+    Parse a qcow2 header.
+
+    Args:
+        f: Image opened in binary mode
+
+    Returns:
+        Qcow2Header object
+
+    Raises:
+        Qcow2Error: If the file isn't a qcow2 image
+    """
+    f.seek(0)
+    data = f.read(_HEADER_V2.size + _HEADER_V3_EXTRA.size)
+    if len(data) < _HEADER_V2.size or data[:4] != QCOW2_MAGIC:
+        raise Qcow2Error("Not a qcow2 image")
+
+    fields = _HEADER_V2.unpack_from(data)
+    header = Qcow2Header(
+        version=fields[1],
+        backing_file_offset=fields[2],
+        backing_file_size=fields[3],
+        cluster_bits=fields[4],
+        size=fields[5],
+        crypt_method=fields[6],
+        l1_size=fields[7],
+        l1_table_offset=fields[8],
+        nb_snapshots=fields[11],
+    )
+    if header.version >= 3:
+        if len(data) < _HEADER_V2.size + _HEADER_V3_EXTRA.size:
+            raise Qcow2Error("Truncated header")
+        extra = _HEADER_V3_EXTRA.unpack_from(data, _HEADER_V2.size)
+        header.incompatible_features = extra[0]
+        header.autoclear_features = extra[2]
+        header.refcount_order = extra[3]
+    return header
+
+
+def unsupported_reason(header: Qcow2Header) -> str:
+    """
+    Check whether an image can be compacted safely.
+
+    Args:
+        header: Image header
+
+    Returns:
+        Reason the image is skipped, or an empty string
+    """
+    if header.version not in (2, 3):
+        return f"unsupported qcow2 version {header.version}"
+    if not 9 <= header.cluster_bits <= 21:
+        return "unsupported cluster size"
+    if header.crypt_method:
+        return "image is encrypted"
+    if header.nb_snapshots:
+        return "image has internal snapshots"
+    if header.incompatible_features:
+        return "image is dirty or uses unsupported features"
+    if header.autoclear_features:
+        return "image has bitmaps or other autoclear features"
+    if header.refcount_order < 3 or header.refcount_order > 6:
+        return "unsupported refcount width"
+    if header.backing_file_offset + header.backing_file_size > header.cluster_size:
+        return "backing file name is outside the header cluster"
+    return ""
+
+
+class Qcow2Image:
+    """Read access to the cluster mapping of a qcow2 image."""
+
+    def __init__(self, f: BinaryIO):
+        """
+        Initialize the reader.
+
+        Args:
+            f: Image opened in binary mode
+
+        Raises:
+            Qcow2Error: If the file isn't a qcow2 image
+        """
+        self.file = f
+        self.header = read_header(f)
+        self.cluster_size = self.header.cluster_size
+        self.l2_entries = self.cluster_size // 8
+
+    def l1_table(self) -> list[int]:
+        """Get the L1 table entries."""
+        self.file.seek(self.header.l1_table_offset)
+        data = self.file.read(self.header.l1_size * 8)
+        if len(data) != self.header.l1_size * 8:
+            raise Qcow2Error("Truncated L1 table")
+        return list(struct.unpack(f">{self.header.l1_size}Q", data))
+
+    def l2_table(self, offset: int) -> list[int]:
+        """Get the entries of the L2 table at a host offset."""
+        self.file.seek(offset)
+        data = self.file.read(self.cluster_size)
+        if len(data) != self.cluster_size:
+            raise Qcow2Error("Truncated L2 table")
+        return list(struct.unpack(f">{self.l2_entries}Q", data))
+
+    def read_data(self, offset: int) -> bytes:
+        """Read one data cluster, padding a short read at the end of the file."""
+        self.file.seek(offset)
+        data = self.file.read(self.cluster_size)
+        return data.ljust(self.cluster_size, b"\0")
+
+    def mapping(self) -> Iterator[list[int]]:
+        """
+        Yield the L2 entries for each L1 slot.
+
+        Slots without an L2 table yield a table of unallocated entries.
+        """
+        empty = [0] * self.l2_entries
+        for l1_entry in self.l1_table():
+            l2_offset = l1_entry & OFFSET_MASK
+            yield self.l2_table(l2_offset) if l2_offset else empty
+
+    def cluster_content(self, entry: int) -> bytes | None:
+        """
+        Get the guest-visible content of a cluster.
+
+        Args:
+            entry: L2 entry
+
+        Returns:
+            Cluster bytes, or None if the cluster reads through to the backing
+            file (or reads as zeros without one)
+        """
+        if entry & COMPRESSED_FLAG:
+            raise Qcow2Error("Image has compressed clusters")
+        if self.header.version >= 3 and entry & ZERO_FLAG:
+            return bytes(self.cluster_size)
+        host = entry & OFFSET_MASK
+        return self.read_data(host) if host else None
+
+
+def _refcount_layout(first_free: int, cluster_size: int, refcount_bits: int) -> tuple[int, int]:
+    """Get the (refcount table clusters, refcount blocks) covering every cluster."""
+    per_block = cluster_size * 8 // refcount_bits
+    table_clusters = blocks = 0
+    while True:
+        total = first_free + table_clusters + blocks
+        needed_blocks = -(-total // per_block)
+        needed_table = -(-needed_blocks * 8 // cluster_size)
+        if (needed_table, needed_blocks) == (table_clusters, blocks):
+            return table_clusters, blocks
+        table_clusters, blocks = needed_table, needed_blocks
+
+
+def write_compacted(src: Qcow2Image, out: BinaryIO) -> None:
+    """
+    Write a compacted copy of an image.
+
+    Data clusters are written first, in guest order, followed by the L2
+    tables, the L1 table and the refcount structures.
+
+    Args:
+        src: Image to copy
+        out: Empty file opened for writing in binary mode
+
+    Raises:
+        Qcow2Error: If the image can't be rewritten safely
+    """
+    header = src.header
+    cluster_size = src.cluster_size
+    zero_cluster = bytes(cluster_size)
+    zero_flag_allowed = header.version >= 3
+    next_cluster = 1
+
+    l2_tables: list[tuple[int, list[int]]] = []
+    for l1_index, entries in enumerate(src.mapping()):
+        new_entries = [0] * src.l2_entries
+        for i, entry in enumerate(entries):
+            if entry & COMPRESSED_FLAG:
+                raise Qcow2Error("Image has compressed clusters")
+            if zero_flag_allowed and entry & ZERO_FLAG:
+                new_entries[i] = ZERO_FLAG
+                continue
+            host = entry & OFFSET_MASK
+            if not host:
+                continue
+            data = src.read_data(host)
+            if data == zero_cluster:
+                if not header.has_backing_file:
+                    continue
+                if zero_flag_allowed:
+                    new_entries[i] = ZERO_FLAG
+                    continue
+            out.seek(next_cluster * cluster_size)
+            out.write(data)
+            new_entries[i] = (next_cluster * cluster_size) | COPIED_FLAG
+            next_cluster += 1
+        if any(new_entries):
+            l2_tables.append((l1_index, new_entries))
+
+    l1 = [0] * header.l1_size
+    for l1_index, new_entries in l2_tables:
+        out.seek(next_cluster * cluster_size)
+        out.write(struct.pack(f">{src.l2_entries}Q", *new_entries))
+        l1[l1_index] = (next_cluster * cluster_size) | COPIED_FLAG
+        next_cluster += 1
+
+    l1_offset = next_cluster * cluster_size
+    out.seek(l1_offset)
+    out.write(struct.pack(f">{header.l1_size}Q", *l1))
+    next_cluster += max(1, -(-header.l1_size * 8 // cluster_size))
+
+    refcount_bits = 1 << header.refcount_order
+    table_clusters, blocks = _refcount_layout(next_cluster, cluster_size, refcount_bits)
+    table_offset = next_cluster * cluster_size
+    first_block = next_cluster + table_clusters
+    total_clusters = first_block + blocks
+
+    out.seek(table_offset)
+    out.write(
+        struct.pack(f">{blocks}Q", *((first_block + i) * cluster_size for i in range(blocks)))
+    )
+    one = (1).to_bytes(refcount_bits // 8, "big")
+    out.seek(first_block * cluster_size)
+    out.write(one * total_clusters)
+    out.truncate(total_clusters * cluster_size)
+
+    # Header cluster: header, extensions and backing file name, with new offsets
+    src.file.seek(0)
+    first = bytearray(src.file.read(cluster_size).ljust(cluster_size, b"\0"))
+    struct.pack_into(">Q", first, _L1_TABLE_OFFSET, l1_offset)
+    struct.pack_into(">Q", first, _REFCOUNT_TABLE_OFFSET, table_offset)
+    struct.pack_into(">I", first, _REFCOUNT_TABLE_CLUSTERS, table_clusters)
+    struct.pack_into(">I", first, _NB_SNAPSHOTS, 0)
+    struct.pack_into(">Q", first, _SNAPSHOTS_OFFSET, 0)
+    out.seek(0)
+    out.write(first)
+
+
+def verify_same_content(original: Qcow2Image, compacted: Qcow2Image) -> bool:
+    """
+    Check that two images show the guest the same data.
+
+    Args:
+        original: Original image
+        compacted: Compacted image
+
+    Returns:
+        True if every cluster reads the same
+    """
+    if original.header.size != compacted.header.size:
+        return False
+    zero_cluster = bytes(original.cluster_size)
+    backed = original.header.has_backing_file
+
+    for old_entries, new_entries in zip(original.mapping(), compacted.mapping(), strict=True):
+        for old_entry, new_entry in zip(old_entries, new_entries):
+            if old_entry == new_entry == 0:
+                continue
+            old = original.cluster_content(old_entry)
+            new = compacted.cluster_content(new_entry)
+            if not backed:
+                old = zero_cluster if old is None else old
+                new = zero_cluster if new is None else new
+            if old != new:
+                return False
+    return True
+
+
+def compact_qcow2(path: str) -> CompactionResult:
+    """
+    Compact a qcow2 overlay in place.
+
+    The overlay must not be in use. The compacted copy is written next to
+    it, verified, and only then renamed over the original.
+
+    Args:
+        path: Overlay path
+
+    Returns:
+        CompactionResult with the allocated bytes before and after
+    """
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        return CompactionResult(path, 0, 0, error=str(e))
+    before = allocated_size(st)
+
+    directory, name = os.path.split(os.path.abspath(path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    except OSError as e:
+        return CompactionResult(path, before, before, error=str(e))
+
+    try:
+        with open(path, "rb") as f, os.fdopen(fd, "w+b") as out:
+            src = Qcow2Image(f)
+            reason = unsupported_reason(src.header)
+            if reason:
+                raise Qcow2Error(reason)
+            write_compacted(src, out)
+            out.flush()
+            os.fsync(out.fileno())
+
+            if not verify_same_content(src, Qcow2Image(out)):
+                raise Qcow2Error("Compacted image doesn't match the original")
+            after = allocated_size(os.fstat(out.fileno()))
+
+        if after >= before:
+            os.unlink(tmp_path)
+            return CompactionResult(path, before, before)
+
+        os.chmod(tmp_path, st.st_mode & 0o7777)
+        os.replace(tmp_path, path)
+        return CompactionResult(path, before, after)
+    except (OSError, Qcow2Error, struct.error) as e:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        return CompactionResult(path, before, before, error=str(e))
+
+
+def qcow2_overlays(avd_path: str) -> list[str]:
+    """
+    List the qcow2 overlays of an AVD.
+
+    Args:
+        avd_path: AVD directory path
+
+    Returns:
+        Paths of the top-level ``*.qcow2`` files that are qcow2 images
+    """
+    overlays = []
+    try:
+        with os.scandir(avd_path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".qcow2") or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    with open(entry.path, "rb") as f:
+                        if f.read(len(QCOW2_MAGIC)) == QCOW2_MAGIC:
+                            overlays.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    return sorted(overlays)
@@ -0,0 +1,121 @@
+"""
+Fused device-side script module.
+
+This module compiles several shell commands into one script that runs in a
+single shell invocation and reports each step's exit status, timing and
+output between marker lines, so the results can be split apart again on
+the host.
+"""
+
+import uuid
+from dataclasses import dataclass
+
+
+@dataclass
+class StepResult:
+    """Outcome of one step of a fused script."""
+
+    exit_code: int
+    output: str
+    duration: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        """Check if the step exited with status 0."""
+        return self.exit_code == 0
+
+
+def new_marker() -> str:
+    """
+    Create a marker that won't collide with command output.
+
+    Returns:
+        Unique marker string
+    """
+    return f"__AEC_{uuid.uuid4().hex}__"
+
+
+def build_script(commands: list[str], marker: str) -> str:
+    """
+    Compile commands into one device-side script.
+
+    Each step is bracketed by ``<marker>:BEGIN:<n>`` and
+    ``<marker>:END:<n>:<exit>:<start_ns>:<end_ns>`` lines. Steps run in a
+    subshell with stdin closed and stderr merged into stdout, and a failing
+    step doesn't stop the ones after it.
+
+    Args:
+        commands: Shell command lines
+        marker: Marker from ``new_marker()``
+
+    Returns:
+        Script text
+    """
+    steps = []
+    for index, command in enumerate(commands):
+        steps.append(
+            f'echo "{marker}:BEGIN:{index}"\n'
+            "_aec_s=$(date +%s%N 2>/dev/null)\n"
+            f"( {command}\n) </dev/null 2>&1\n"
+            "_aec_r=$?\n"
+            "_aec_e=$(date +%s%N 2>/dev/null)\n"
+            f'printf \'\\n{marker}:END:{index}:%s:%s:%s\\n\' "$_aec_r" "$_aec_s" "$_aec_e"\n'
+        )
+    return "".join(steps)
+
+
+def parse_script_output(output: str, count: int, marker: str) -> list[StepResult | None]:
+    """
+    Split fused script output back into per-step results.
+
+    Args:
+        output: Combined script output
+        count: Number of steps in the script
+        marker: Marker the script was built with
+
+    Returns:
+        One StepResult per step, or None for steps that never reported
+        (e.g. because the script was killed)
+    """
+    results: list[StepResult | None] = [None] * count
+    begin = f"{marker}:BEGIN:"
+    end = f"{marker}:END:"
+    current: int | None = None
+    lines: list[str] = []
+
+    for raw_line in output.split("\n"):
+        line = raw_line.rstrip("\r")
+        if line.startswith(begin):
+            current = _parse_int(line[len(begin) :])
+            lines = []
+        elif line.startswith(end):
+            fields = line[len(end) :].split(":")
+            index = _parse_int(fields[0])
+            if index is None or index != current or not 0 <= index < count:
+                current = None
+                continue
+            # Drop the blank line added by the closing printf
+            if lines and lines[-1] == "":
+                lines.pop()
+            exit_code = _parse_int(fields[1]) if len(fields) > 1 else None
+            start = _parse_int(fields[2]) if len(fields) > 2 else None
+            finish = _parse_int(fields[3]) if len(fields) > 3 else None
+            duration = (finish - start) / 1e9 if start and finish and finish >= start else 0.0
+            results[index] = StepResult(
+                exit_code=exit_code if exit_code is not None else -1,
+                output="\n".join(lines).strip(),
+                duration=duration,
+            )
+            current = None
+        elif current is not None:
+            lines.append(line)
+
+    return results
+
+
+def _parse_int(value: str) -> int | None:
+    """Parse an int, returning None for anything else (e.g. a literal %N)."""
+    try:
+        return int(value)
+    except ValueError:
+        return None
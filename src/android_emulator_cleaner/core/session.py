@@ -0,0 +1,290 @@
+"""
+Persistent device shell session module.
+
+This module keeps one shell open per device and pipelines many commands
+through it, so each command costs a write and a read instead of a new
+adb connection.
+"""
+
+import contextlib
+import queue
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Protocol
+
+from .protocol import ADBServerConnection, ADBServerError
+
+if TYPE_CHECKING:
+    from .adb import ADBClient
+
+# Exit code of commands that never reached the shell (safe to send elsewhere)
+NOT_SENT = -2
+
+
+class _ShellStream(Protocol):
+    """Byte stream to a device-side ``sh``."""
+
+    def write(self, data: bytes) -> None: ...
+
+    def read(self) -> bytes: ...
+
+    def close(self) -> None: ...
+
+
+class _SocketStream:
+    """Shell stream over an adb server ``exec:sh`` connection."""
+
+    def __init__(self, conn: ADBServerConnection):
+        self.conn = conn
+        self.conn.sock.settimeout(None)
+
+    def write(self, data: bytes) -> None:
+        self.conn.sock.sendall(data)
+
+    def read(self) -> bytes:
+        return self.conn.sock.recv(65536)
+
+    def close(self) -> None:
+        # close() alone doesn't wake the reader thread blocked in recv()
+        with contextlib.suppress(OSError):
+            self.conn.sock.shutdown(socket.SHUT_RDWR)
+        self.conn.close()
+
+
+class _ProcessStream:
+    """Shell stream over an ``adb shell`` subprocess with piped stdin."""
+
+    def __init__(self, process: subprocess.Popen):
+        self.process = process
+
+    def write(self, data: bytes) -> None:
+        assert self.process.stdin is not None
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def read(self) -> bytes:
+        assert self.process.stdout is not None
+        return self.process.stdout.read1(65536)  # type: ignore[attr-defined,no-any-return]
+
+    def close(self) -> None:
+        try:
+            if self.process.stdin:
+                self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class DeviceSession:
+    """
+    A long-lived shell on one device.
+
+    Every command is framed with a per-session sentinel that carries a
+    sequence number and the command's exit code, so output from pipelined
+    commands can be split back into per-command results.
+    """
+
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, client: "ADBClient"):
+        """
+        Initialize a session.
+
+        Args:
+            client: ADB client targeting the device
+        """
+        self.client = client
+        self.device_id = client.device_id
+        self._stream: _ShellStream | None = None
+        self._lines: queue.Queue[str | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._sentinel = f"__AEC_{uuid.uuid4().hex}__"
+        self._sequence = 0
+
+    def __enter__(self) -> "DeviceSession":
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        """Check if the session is connected."""
+        return self._stream is not None
+
+    def open(self, timeout: int = 10) -> bool:
+        """
+        Open the shell connection.
+
+        Args:
+            timeout: Seconds to wait for the shell to answer
+
+        Returns:
+            True if the shell is ready for commands
+        """
+        if self._stream is not None:
+            return True
+
+        stream = self._connect()
+        if stream is None:
+            return False
+
+        self._stream = stream
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_loop, args=(stream, self._lines), daemon=True).start()
+
+        # Round-trip a no-op to make sure the shell is actually alive
+        exit_code, _ = self.run(":", timeout=timeout)
+        if exit_code != 0:
+            self.close()
+            return False
+        return True
+
+    def close(self) -> None:
+        """Close the shell connection."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            with contextlib.suppress(OSError):
+                stream.write(b"exit\n")
+            stream.close()
+
+    def run(self, command: str, timeout: int = DEFAULT_TIMEOUT) -> tuple[int, str]:
+        """
+        Run a single command in the session.
+
+        Args:
+            command: Shell command line
+            timeout: Command timeout in seconds
+
+        Returns:
+            Tuple of (exit_code, output)
+        """
+        return self.run_many([command], timeout)[0]
+
+    def run_many(
+        self, commands: list[str], timeout: int = DEFAULT_TIMEOUT
+    ) -> list[tuple[int, str]]:
+        """
+        Pipeline several commands through the session.
+
+        All commands are written at once and their results are read back in
+        order. stderr is merged into each command's output.
+
+        Args:
+            commands: Shell command lines
+            timeout: Timeout in seconds for the whole batch
+
+        Returns:
+            List of (exit_code, output) tuples, one per command. Commands
+            that were sent but could not complete report exit code -1 (they
+            may have run); commands never sent report ``NOT_SENT``.
+        """
+        with self._lock:
+            if self._stream is None:
+                return [(NOT_SENT, "Session is not open")] * len(commands)
+
+            first = self._sequence
+            self._sequence += len(commands)
+            script = "".join(
+                self._frame(command, first + index) for index, command in enumerate(commands)
+            )
+            try:
+                self._stream.write(script.encode("utf-8"))
+            except OSError as e:
+                self.close()
+                return [(-1, str(e))] * len(commands)
+
+            results: list[tuple[int, str]] = []
+            deadline = time.monotonic() + timeout
+            for index in range(len(commands)):
+                result = self._collect(first + index, deadline)
+                if result is None:
+                    # Output no longer lines up with commands; drop the session
+                    self.close()
+                    timed_out = time.monotonic() >= deadline
+                    message = "Command timed out" if timed_out else "Session closed"
+                    results.extend([(-1, message)] * (len(commands) - index))
+                    break
+                results.append(result)
+            return results
+
+    def _frame(self, command: str, sequence: int) -> str:
+        """Wrap a command so its output ends with a sentinel line."""
+        # The subshell keeps "exit"/"cd" from leaking into the session and
+        # </dev/null stops the command from eating the commands queued after it
+        return f"( {command}\n) </dev/null 2>&1; printf '\\n{self._sentinel}:{sequence}:%d\\n' $?\n"
+
+    def _collect(self, sequence: int, deadline: float) -> tuple[int, str] | None:
+        """Read lines until the sentinel for ``sequence`` arrives."""
+        prefix = f"{self._sentinel}:{sequence}:"
+        output: list[str] = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if line is None:
+                return None
+            if line.startswith(prefix):
+                try:
+                    exit_code = int(line[len(prefix) :])
+                except ValueError:
+                    exit_code = -1
+                # Drop the blank line added by the framing printf
+                if output and output[-1] == "":
+                    output.pop()
+                return exit_code, "\n".join(output)
+            output.append(line)
+
+    def _connect(self) -> _ShellStream | None:
+        """Open a stream to ``sh`` on the device."""
+        server = self.client.server
+        if server.is_available():
+            try:
+                return _SocketStream(server.open_service(self.device_id, "exec:sh"))
+            except (OSError, ADBServerError):
+                pass
+
+        cmd_list = [self.client.adb_path]
+        if self.device_id:
+            cmd_list.extend(["-s", self.device_id])
+        cmd_list.append("shell")
+        try:
+            process = subprocess.Popen(
+                cmd_list,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+        except OSError:
+            return None
+        return _ProcessStream(process)
+
+    @staticmethod
+    def _read_loop(stream: _ShellStream, lines: "queue.Queue[str | None]") -> None:
+        """Split the stream into lines until it closes."""
+        buffer = b""
+        try:
+            while True:
+                chunk = stream.read()
+                if not chunk:
+                    break
+                buffer += chunk
+                *complete, buffer = buffer.split(b"\n")
+                for raw in complete:
+                    lines.put(raw.decode("utf-8", errors="replace").rstrip("\r"))
+        except (OSError, ValueError):
+            pass
+        if buffer:
+            lines.put(buffer.decode("utf-8", errors="replace").rstrip("\r"))
+        lines.put(None)
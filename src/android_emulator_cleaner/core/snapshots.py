@@ -0,0 +1,262 @@
+"""
+AVD snapshot module.
+
+This module lists the individual snapshots of an AVD with their size, the
+time they were last used and the metadata the emulator stores in each
+``snapshot.pb``, and picks snapshots to evict so that a byte budget is met
+while the Quick Boot (or newest) snapshot is kept.
+"""
+
+import os
+from collections.abc import Iterator
+
+from ..models import Snapshot, SnapshotKeep
+from .usage import tree_usage
+
+SNAPSHOT_PB = "snapshot.pb"
+
+# Field numbers of the emulator's Snapshot message (snapshot.proto)
+_PB_CREATION_TIME = 2
+_PB_LOGICAL_NAME = 12
+_PB_PARENT = 13
+_PB_DESCRIPTION = 14
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_BYTES = 2
+_WIRE_FIXED32 = 5
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Decode a protobuf varint, returning the value and the next offset."""
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _iter_fields(data: bytes) -> Iterator[tuple[int, int | bytes]]:
+    """Yield (field number, value) pairs of a protobuf message."""
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 0x7
+        value: int | bytes
+        if wire_type == _WIRE_VARINT:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == _WIRE_FIXED64:
+            value, pos = int.from_bytes(data[pos : pos + 8], "little"), pos + 8
+        elif wire_type == _WIRE_BYTES:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos : pos + length], pos + length
+        elif wire_type == _WIRE_FIXED32:
+            value, pos = int.from_bytes(data[pos : pos + 4], "little"), pos + 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        if pos > len(data):
+            raise ValueError("Truncated field")
+        yield number, value
+
+
+def parse_snapshot_pb(data: bytes) -> dict[str, int | str]:
+    """
+    Parse the metadata fields of a ``snapshot.pb`` file.
+
+    Only the informative fields are decoded; anything else is skipped.
+
+    Args:
+        data: Raw file contents
+
+    Returns:
+        Dict with any of ``creation_time``, ``logical_name``, ``parent`` and
+        ``description`` (empty if the file can't be parsed)
+    """
+    names = {
+        _PB_LOGICAL_NAME: "logical_name",
+        _PB_PARENT: "parent",
+        _PB_DESCRIPTION: "description",
+    }
+    metadata: dict[str, int | str] = {}
+    try:
+        for number, value in _iter_fields(data):
+            if number == _PB_CREATION_TIME and isinstance(value, int):
+                metadata["creation_time"] = value
+            elif number in names and isinstance(value, bytes):
+                metadata[names[number]] = value.decode("utf-8", errors="replace")
+    except ValueError:
+        return {}
+    return metadata
+
+
+def _last_used(path: str) -> float:
+    """
+    Get the newest access or modification time of the files in a snapshot.
+
+    ``snapshot.pb`` only counts by mtime, since listing snapshots reads it.
+    """
+    newest = 0.0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                atime = st.st_mtime if entry.name == SNAPSHOT_PB else st.st_atime
+                newest = max(newest, atime, st.st_mtime)
+    except OSError:
+        pass
+    return newest
+
+
+def _read_noatime(path: str) -> bytes:
+    """Read a file without updating its access time where the OS allows it."""
+    flags = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+    noatime = getattr(os, "O_NOATIME", 0)
+    try:
+        fd = os.open(path, flags | noatime)
+    except PermissionError:
+        if not noatime:
+            raise
+        # O_NOATIME is only allowed for the file's owner
+        fd = os.open(path, flags)
+    with os.fdopen(fd, "rb") as f:
+        return f.read()
+
+
+def read_snapshot(path: str) -> Snapshot:
+    """
+    Describe one snapshot directory.
+
+    Args:
+        path: Snapshot directory path
+
+    Returns:
+        Snapshot object
+    """
+    last_used = _last_used(path)
+    try:
+        metadata = parse_snapshot_pb(_read_noatime(os.path.join(path, SNAPSHOT_PB)))
+    except OSError:
+        metadata = {}
+
+    creation_time = metadata.get("creation_time")
+    return Snapshot(
+        name=os.path.basename(path),
+        path=path,
+        size=tree_usage(path).resolve().allocated,
+        last_used=last_used,
+        creation_time=creation_time if isinstance(creation_time, int) else None,
+        logical_name=str(metadata.get("logical_name", "")),
+        description=str(metadata.get("description", "")),
+        parent=str(metadata.get("parent", "")),
+    )
+
+
+def list_snapshots(avd_path: str) -> list[Snapshot]:
+    """
+    List the snapshots of an AVD, least recently used first.
+
+    Args:
+        avd_path: AVD directory path
+
+    Returns:
+        List of Snapshot objects
+    """
+    snapshot_dir = os.path.join(avd_path, "snapshots")
+    try:
+        with os.scandir(snapshot_dir) as entries:
+            paths = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return []
+    return sorted((read_snapshot(path) for path in paths), key=lambda s: (s.last_used, s.name))
+
+
+def _protected(snapshots: list[Snapshot], keep: SnapshotKeep) -> set[str]:
+    """Get the paths of the snapshots each AVD keeps."""
+    if keep == SnapshotKeep.DEFAULT_BOOT:
+        return {s.path for s in snapshots if s.is_quick_boot}
+    if keep == SnapshotKeep.NEWEST:
+        newest: dict[str, Snapshot] = {}
+        for snapshot in snapshots:
+            avd = os.path.dirname(snapshot.path)
+            if avd not in newest or snapshot.last_used > newest[avd].last_used:
+                newest[avd] = snapshot
+        return {s.path for s in newest.values()}
+    return set()
+
+
+def select_evictions(
+    snapshots: list[Snapshot], budget: int = 0, keep: SnapshotKeep = SnapshotKeep.NONE
+) -> list[Snapshot]:
+    """
+    Pick snapshots to delete, least recently used first, until a budget is met.
+
+    Snapshots of several AVDs can be passed together to apply one global
+    budget; each AVD still keeps its own protected snapshot.
+
+    Args:
+        snapshots: Snapshots to choose from
+        budget: Bytes the remaining snapshots may occupy
+        keep: Snapshot of each AVD that is never evicted
+
+    Returns:
+        Snapshots to delete
+    """
+    protected = _protected(snapshots, keep)
+    remaining = sum(s.size for s in snapshots)
+    evictions = []
+    for snapshot in sorted(snapshots, key=lambda s: (s.last_used, s.name)):
+        if remaining <= budget:
+            break
+        if snapshot.path in protected:
+            continue
+        evictions.append(snapshot)
+        remaining -= snapshot.size
+    return evictions
+
+
+def plan_evictions(
+    snapshots_by_avd: list[list[Snapshot]],
+    keep: SnapshotKeep = SnapshotKeep.NONE,
+    budget: int | None = None,
+    per_avd_budget: int | None = None,
+) -> list[Snapshot]:
+    """
+    Pick snapshots to delete across AVDs.
+
+    The per-AVD budget is applied first, then the global budget to what is
+    left. Without any budget every unprotected snapshot is evicted.
+
+    Args:
+        snapshots_by_avd: Snapshots of each AVD
+        keep: Snapshot of each AVD that is never evicted
+        budget: Bytes all remaining snapshots may occupy together
+        per_avd_budget: Bytes the remaining snapshots of each AVD may occupy
+
+    Returns:
+        Snapshots to delete
+    """
+    if budget is None and per_avd_budget is None:
+        budget = 0
+
+    evictions: list[Snapshot] = []
+    remaining: list[Snapshot] = []
+    for snapshots in snapshots_by_avd:
+        evicted = (
+            select_evictions(snapshots, per_avd_budget, keep) if per_avd_budget is not None else []
+        )
+        evictions.extend(evicted)
+        evicted_paths = {s.path for s in evicted}
+        remaining.extend(s for s in snapshots if s.path not in evicted_paths)
+
+    if budget is not None:
+        evictions.extend(select_evictions(remaining, budget, keep))
+    return evictions
@@ -0,0 +1,221 @@
+"""
+Disk image sparsification module.
+
+This module releases the all-zero blocks of raw AVD disk images back to
+the host filesystem. Images are read through ``mmap`` in large windows,
+only over the ranges that are actually allocated (``SEEK_DATA``/
+``SEEK_HOLE``), and runs of zero blocks are punched out with
+``fallocate(FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE)``. The file size
+and contents stay the same; a punched range reads back as zeros.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import functools
+import mmap
+import os
+import sys
+from collections.abc import Callable, Iterator
+from typing import cast
+
+from ..models import CompactionResult
+from .usage import allocated_size
+
+# Raw images an AVD may hold (qcow2 overlays are handled separately)
+RAW_IMAGE_NAMES = ("cache.img", "sdcard.img", "userdata-qemu.img")
+QCOW2_MAGIC = b"QFI\xfb"
+
+DEFAULT_STRIDE = 64 * 1024 * 1024
+ZERO_CHUNK = 1024 * 1024
+
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+
+PUNCH_HOLE_SUPPORTED = sys.platform.startswith("linux")
+
+
+@functools.cache
+def _load_fallocate() -> Callable[[int, int, int, int], int]:
+    """Load ``fallocate`` from the C library."""
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    func = getattr(libc, "fallocate64", None) or libc.fallocate
+    func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    func.restype = ctypes.c_int
+    return cast(Callable[[int, int, int, int], int], func)
+
+
+def punch_hole(fd: int, offset: int, length: int) -> None:
+    """
+    Deallocate a byte range of a file, keeping its size.
+
+    Args:
+        fd: File descriptor opened for writing
+        offset: Start of the range
+        length: Length of the range
+
+    Raises:
+        OSError: If the filesystem doesn't support hole punching
+    """
+    if not PUNCH_HOLE_SUPPORTED:
+        raise OSError("Hole punching is not supported on this platform")
+    fallocate = _load_fallocate()
+    if fallocate(fd, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE, offset, length) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+def _data_ranges(fd: int, size: int) -> Iterator[tuple[int, int]]:
+    """Yield (start, end) of the allocated ranges of a file."""
+    seek_data = getattr(os, "SEEK_DATA", None)
+    seek_hole = getattr(os, "SEEK_HOLE", None)
+    if seek_data is None or seek_hole is None:
+        yield 0, size
+        return
+
+    pos = 0
+    while pos < size:
+        try:
+            start = os.lseek(fd, pos, seek_data)
+            end = min(os.lseek(fd, start, seek_hole), size)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                return  # No data after pos
+            # Filesystem can't report holes: treat the rest as data
+            yield pos, size
+            return
+        yield start, end
+        pos = end
+
+
+def _window_zero_runs(view: memoryview, base: int, block_size: int) -> Iterator[tuple[int, int]]:
+    """Yield (offset, length) of zero block runs in a mapped window."""
+    zero_chunk = bytes(ZERO_CHUNK)
+    zero_block = bytes(block_size)
+    run_start = -1
+    length = len(view)
+    pos = 0
+    while pos < length:
+        # Compare whole chunks first; only split chunks that hold data
+        chunk_end = min(pos + ZERO_CHUNK, length)
+        if chunk_end - pos == ZERO_CHUNK and view[pos:chunk_end] == zero_chunk:
+            if run_start < 0:
+                run_start = pos
+            pos = chunk_end
+            continue
+        for block in range(pos, chunk_end, block_size):
+            block_end = min(block + block_size, chunk_end)
+            if block_end - block == block_size and view[block:block_end] == zero_block:
+                if run_start < 0:
+                    run_start = block
+            elif run_start >= 0:
+                yield base + run_start, block - run_start
+                run_start = -1
+        pos = chunk_end
+    if run_start >= 0:
+        yield base + run_start, length - run_start
+
+
+def find_zero_runs(
+    fd: int, size: int, block_size: int, stride: int = DEFAULT_STRIDE
+) -> Iterator[tuple[int, int]]:
+    """
+    Find runs of all-zero, allocated blocks in a file.
+
+    Args:
+        fd: File descriptor opened for reading
+        size: File size in bytes
+        block_size: Granularity of the runs (the filesystem block size)
+        stride: Bytes mapped at a time
+
+    Returns:
+        Iterator of (offset, length), merged across window boundaries
+    """
+    granularity = max(mmap.ALLOCATIONGRANULARITY, block_size)
+    stride = max(granularity, stride - stride % granularity)
+    pending: tuple[int, int] | None = None
+
+    for start, end in _data_ranges(fd, size):
+        offset = start - start % granularity
+        while offset < end:
+            length = min(stride, end - offset)
+            with (
+                mmap.mmap(fd, length, offset=offset, access=mmap.ACCESS_READ) as mm,
+                memoryview(mm) as view,
+            ):
+                for run in _window_zero_runs(view, offset, block_size):
+                    if pending and pending[0] + pending[1] == run[0]:
+                        pending = (pending[0], pending[1] + run[1])
+                        continue
+                    if pending:
+                        yield pending
+                    pending = run
+            offset += length
+    if pending:
+        yield pending
+
+
+def is_raw_image(path: str) -> bool:
+    """
+    Check that a disk image isn't in qcow2 format.
+
+    Args:
+        path: Image path
+
+    Returns:
+        True if the image is a raw image
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(QCOW2_MAGIC)) != QCOW2_MAGIC
+    except OSError:
+        return False
+
+
+def sparsify_image(path: str, stride: int = DEFAULT_STRIDE) -> CompactionResult:
+    """
+    Release the all-zero blocks of a raw disk image.
+
+    The image must not be in use. Its size and contents are unchanged.
+
+    Args:
+        path: Image path
+        stride: Bytes mapped at a time
+
+    Returns:
+        CompactionResult with the allocated bytes before and after
+    """
+    try:
+        fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    except OSError as e:
+        return CompactionResult(path, 0, 0, error=str(e))
+
+    try:
+        st = os.fstat(fd)
+        before = allocated_size(st)
+        if st.st_size == 0:
+            return CompactionResult(path, before, before)
+
+        block_size = getattr(st, "st_blksize", 0) or 4096
+        try:
+            for offset, length in find_zero_runs(fd, st.st_size, block_size, stride):
+                punch_hole(fd, offset, length)
+        except OSError as e:
+            return CompactionResult(path, before, allocated_size(os.fstat(fd)), error=str(e))
+        return CompactionResult(path, before, allocated_size(os.fstat(fd)))
+    finally:
+        os.close(fd)
+
+
+def raw_images(avd_path: str) -> list[str]:
+    """
+    List the raw disk images of an AVD.
+
+    Args:
+        avd_path: AVD directory path
+
+    Returns:
+        Paths of the raw images that exist
+    """
+    paths = [os.path.join(avd_path, name) for name in RAW_IMAGE_NAMES]
+    return [path for path in paths if os.path.isfile(path) and is_raw_image(path)]
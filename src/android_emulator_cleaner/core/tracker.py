@@ -0,0 +1,245 @@
+"""
+Device tracking module.
+
+This module keeps a live, in-memory registry of the devices known to the
+adb server by following its ``host:track-devices-l`` stream, instead of
+polling ``adb devices`` whenever a device list is needed.
+"""
+
+import contextlib
+import socket
+import threading
+from collections.abc import Callable
+
+from ..models import DeviceEvent, DeviceEventType
+from .adb import parse_devices_output
+from .protocol import ADBServer, ADBServerConnection, ADBServerError, get_default_server
+
+DeviceListener = Callable[[DeviceEvent], None]
+
+
+class DeviceTracker:
+    """
+    Live registry of devices reported by the adb server.
+
+    The registry is updated from a background thread. Lookups are O(1)
+    dict reads, and listeners are notified of every add, remove and status
+    change (on the tracker thread, so they should return quickly).
+    """
+
+    RECONNECT_DELAY = 1.0
+    MAX_RECONNECT_DELAY = 10.0
+
+    def __init__(self, server: ADBServer | None = None):
+        """
+        Initialize the tracker.
+
+        Args:
+            server: adb server client to use (defaults to the shared one)
+        """
+        self.server = server or get_default_server()
+        self._devices: dict[str, dict[str, str]] = {}
+        self._listeners: list[DeviceListener] = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._conn: ADBServerConnection | None = None
+
+    def __enter__(self) -> "DeviceTracker":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    @property
+    def is_running(self) -> bool:
+        """Check if the tracker thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """
+        Start tracking and wait for the first device list.
+
+        Args:
+            timeout: Seconds to wait for the first snapshot
+
+        Returns:
+            True once the registry holds a snapshot from the server
+        """
+        if not self.is_running:
+            self._stopped.clear()
+            self._ready.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="aec-device-tracker", daemon=True
+            )
+            self._thread.start()
+        return self._ready.wait(timeout)
+
+    def stop(self) -> None:
+        """Stop tracking."""
+        self._stopped.set()
+        conn = self._conn
+        if conn is not None:
+            # close() alone doesn't wake a thread blocked in recv() on Linux
+            with contextlib.suppress(OSError):
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            conn.close()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    @property
+    def is_ready(self) -> bool:
+        """Check if the registry holds a current snapshot."""
+        return self._ready.is_set()
+
+    def subscribe(self, listener: DeviceListener) -> Callable[[], None]:
+        """
+        Register a listener for device events.
+
+        Args:
+            listener: Called with a DeviceEvent for every change
+
+        Returns:
+            Function that removes the listener
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def get(self, serial: str) -> dict[str, str] | None:
+        """
+        Look up a device.
+
+        Args:
+            serial: Device serial
+
+        Returns:
+            Device fields ("serial", "status", "model", ...) or None
+        """
+        with self._lock:
+            entry = self._devices.get(serial)
+            return dict(entry) if entry else None
+
+    def status(self, serial: str) -> str | None:
+        """
+        Get a device's status ("device", "offline", "unauthorized", ...).
+
+        Args:
+            serial: Device serial
+
+        Returns:
+            Status string or None if the device is unknown
+        """
+        with self._lock:
+            entry = self._devices.get(serial)
+            return entry["status"] if entry else None
+
+    def snapshot(self) -> list[dict[str, str]]:
+        """
+        Get all known devices.
+
+        Returns:
+            List of device field dicts
+        """
+        with self._lock:
+            return [dict(entry) for entry in self._devices.values()]
+
+    def online(self) -> list[dict[str, str]]:
+        """Get devices that are online and authorized."""
+        return [entry for entry in self.snapshot() if entry["status"] == "device"]
+
+    def offline(self) -> list[dict[str, str]]:
+        """Get devices that are offline."""
+        return [entry for entry in self.snapshot() if entry["status"] == "offline"]
+
+    def unauthorized(self) -> list[dict[str, str]]:
+        """Get devices that have not authorized this host."""
+        return [entry for entry in self.snapshot() if entry["status"] == "unauthorized"]
+
+    def update(self, listing: str) -> list[DeviceEvent]:
+        """
+        Replace the registry with a new device list from the server.
+
+        Args:
+            listing: Device list payload (``adb devices -l`` format)
+
+        Returns:
+            Events describing the changes, in the order listeners saw them
+        """
+        entries = {entry["serial"]: entry for entry in parse_devices_output(listing)}
+        events: list[DeviceEvent] = []
+
+        with self._lock:
+            for serial, entry in entries.items():
+                previous = self._devices.get(serial)
+                if previous is None:
+                    events.append(DeviceEvent(DeviceEventType.ADDED, serial, entry["status"]))
+                elif previous["status"] != entry["status"]:
+                    events.append(
+                        DeviceEvent(
+                            DeviceEventType.CHANGED, serial, entry["status"], previous["status"]
+                        )
+                    )
+            for serial, previous in self._devices.items():
+                if serial not in entries:
+                    events.append(
+                        DeviceEvent(DeviceEventType.REMOVED, serial, "gone", previous["status"])
+                    )
+            self._devices = entries
+            listeners = list(self._listeners)
+
+        for event in events:
+            for listener in listeners:
+                listener(event)
+        return events
+
+    def _run(self) -> None:
+        """Follow the server's device stream, reconnecting until stopped."""
+        delay = self.RECONNECT_DELAY
+        while not self._stopped.is_set():
+            try:
+                self._follow()
+                delay = self.RECONNECT_DELAY
+            except (OSError, ADBServerError, ValueError):
+                pass
+
+            self._ready.clear()
+            if self._stopped.is_set():
+                break
+            # Lost the server: devices are unreachable until it comes back
+            self.update("")
+            if self._stopped.wait(delay):
+                break
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+    def _follow(self) -> None:
+        """Open a tracking connection and apply every update it sends."""
+        conn = self.server.connect(timeout=None)
+        self._conn = conn
+        try:
+            if self._stopped.is_set():
+                return
+            try:
+                conn.send("host:track-devices-l")
+            except ADBServerError:
+                # Older servers only know the short form
+                conn.close()
+                conn = self.server.connect(timeout=None)
+                self._conn = conn
+                conn.send("host:track-devices")
+
+            while not self._stopped.is_set():
+                self.update(conn.read_length_prefixed())
+                self._ready.set()
+        finally:
+            self._conn = None
+            conn.close()
@@ -0,0 +1,263 @@
+"""
+Deferred deletion module.
+
+This module makes cleanup return immediately: targets are renamed into a
+trash directory on the same filesystem (an atomic, constant-time
+operation), and a detached worker process removes the trash afterwards.
+The worker outlives the CLI, and trash left behind by an interrupted worker
+is picked up again on the next run.
+
+The worker is started as ``python -m android_emulator_cleaner.core.trash
+<trash_dir>...``.
+"""
+
+import contextlib
+import errno
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+from collections.abc import Iterator
+
+from ..models import DeletionResult
+from .delete import DeletionEngine
+from .usage import allocated_size, disk_usage
+
+TRASH_DIRNAME = ".cleaner-trash"
+LOCK_FILENAME = ".lock"
+
+
+def trash_dir_for(path: str) -> str:
+    """
+    Get the trash directory used for a path.
+
+    The trash lives next to the AVD directories so a rename into it never
+    crosses a filesystem boundary.
+
+    Args:
+        path: AVD directory path
+
+    Returns:
+        Trash directory path
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(path)), TRASH_DIRNAME)
+
+
+def _allocated_bytes(path: str, walk: bool = True) -> int:
+    """Get the space that deleting a path will free (directories count 0 unless walked)."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return 0
+    if stat.S_ISDIR(st.st_mode):
+        return disk_usage(path).allocated if walk else 0
+    if stat.S_ISREG(st.st_mode) and st.st_nlink <= 1:
+        return allocated_size(st)
+    return 0
+
+
+def move_to_trash(
+    paths: list[str], trash_dir: str, size: int | None = None
+) -> tuple[int, list[str]]:
+    """
+    Rename files and directories into a new batch in the trash.
+
+    Nothing is walked in the foreground: the bytes moved are ``size`` (the
+    caller's measurement of all the paths, e.g. from the AVD scan) minus
+    the paths that couldn't be renamed. Without it, only regular files are
+    counted, from one stat each.
+
+    Args:
+        paths: Files or directories to discard
+        trash_dir: Trash directory (created if missing)
+        size: Allocated bytes of all the paths, if already known
+
+    Returns:
+        Tuple of (allocated bytes moved to the trash, paths that couldn't be
+        renamed, e.g. because they are on another filesystem)
+    """
+    if not paths:
+        return 0, []
+
+    try:
+        os.makedirs(trash_dir, exist_ok=True)
+        batch = tempfile.mkdtemp(dir=trash_dir, prefix="batch-")
+    except OSError:
+        return 0, list(paths)
+
+    moved = 0
+    renamed = 0
+    failed: list[str] = []
+    for i, path in enumerate(paths):
+        entry_size = _allocated_bytes(path, walk=False) if size is None else 0
+        try:
+            os.rename(path, os.path.join(batch, f"{i}-{os.path.basename(path)}"))
+        except FileNotFoundError:
+            continue
+        except OSError:
+            failed.append(path)
+            continue
+        moved += entry_size
+        renamed += 1
+
+    if size is not None and renamed:
+        # Failed paths are deleted (and walked) by the caller anyway
+        moved = max(0, size - sum(_allocated_bytes(path) for path in failed))
+
+    with contextlib.suppress(OSError):
+        os.rmdir(batch)  # Only succeeds if nothing was moved
+    return moved, failed
+
+
+def has_pending_trash(trash_dir: str) -> bool:
+    """
+    Check if a trash directory still holds entries to delete.
+
+    Args:
+        trash_dir: Trash directory path
+
+    Returns:
+        True if there is anything besides the worker lock
+    """
+    try:
+        with os.scandir(trash_dir) as entries:
+            return any(entry.name != LOCK_FILENAME for entry in entries)
+    except OSError:
+        return False
+
+
+def start_trash_worker(trash_dirs: list[str]) -> bool:
+    """
+    Start a detached process that empties trash directories.
+
+    The process gets its own session (or process group on Windows) and no
+    standard streams, so it keeps running after the CLI exits.
+
+    Args:
+        trash_dirs: Trash directories to empty
+
+    Returns:
+        True if the worker was started
+    """
+    if not trash_dirs:
+        return False
+
+    kwargs: dict = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP  # type: ignore[attr-defined]
+        )
+    else:
+        kwargs["start_new_session"] = True
+
+    try:
+        subprocess.Popen(
+            [sys.executable, "-m", __name__, *trash_dirs],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            **kwargs,
+        )
+        return True
+    except OSError:
+        return False
+
+
+def resume_trash(trash_dirs: list[str]) -> bool:
+    """
+    Restart deletion of trash left behind by an earlier run.
+
+    Args:
+        trash_dirs: Trash directories to check
+
+    Returns:
+        True if a worker was started
+    """
+    pending = [trash_dir for trash_dir in trash_dirs if has_pending_trash(trash_dir)]
+    return start_trash_worker(pending)
+
+
+@contextlib.contextmanager
+def _worker_lock(trash_dir: str) -> Iterator[bool]:
+    """Hold the trash directory's worker lock; yields False if another worker has it."""
+    try:
+        import fcntl
+    except ImportError:
+        yield True
+        return
+
+    try:
+        fd = os.open(os.path.join(trash_dir, LOCK_FILENAME), os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError:
+        yield False
+        return
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def empty_trash(trash_dir: str, engine: DeletionEngine | None = None) -> DeletionResult:
+    """
+    Delete everything in a trash directory, then the directory itself.
+
+    Returns an empty result if another worker is already emptying it.
+
+    Args:
+        trash_dir: Trash directory path
+        engine: Deletion engine to use (a default one is created if omitted)
+
+    Returns:
+        DeletionResult object
+    """
+    engine = engine or DeletionEngine()
+    result = DeletionResult()
+    with _worker_lock(trash_dir) as acquired:
+        if not acquired:
+            return result
+        try:
+            with os.scandir(trash_dir) as entries:
+                targets = sorted(e.path for e in entries if e.name != LOCK_FILENAME)
+        except OSError:
+            return result
+
+        result = engine.delete(targets)
+
+        # Leave the directory in place if a new batch arrived meanwhile
+        with contextlib.suppress(OSError):
+            os.unlink(os.path.join(trash_dir, LOCK_FILENAME))
+        try:
+            os.rmdir(trash_dir)
+        except OSError as e:
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST, errno.ENOENT):
+                result.errors.append(f"{os.path.basename(trash_dir)}: {e}")
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Empty the trash directories given on the command line.
+
+    Args:
+        argv: Trash directory paths (defaults to sys.argv[1:])
+
+    Returns:
+        Exit status
+    """
+    trash_dirs = sys.argv[1:] if argv is None else argv
+    success = True
+    for trash_dir in trash_dirs:
+        if not empty_trash(trash_dir).success:
+            success = False
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
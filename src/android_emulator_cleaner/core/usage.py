@@ -0,0 +1,165 @@
+"""
+Disk usage module.
+
+This module walks directory trees iteratively and reports both the apparent
+size of the files (``st_size``) and the space they actually occupy
+(``st_blocks * 512``), which is much smaller for sparse disk images.
+Symlinks are never followed, and hardlinked files are counted once.
+"""
+
+import os
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from ..models import DiskUsage
+
+# (st_dev, st_ino) -> (apparent, allocated) of a file with more than one link
+LinkMap = dict[tuple[int, int], tuple[int, int]]
+
+
+def allocated_size(st: os.stat_result) -> int:
+    """
+    Get the space a file occupies on disk.
+
+    Args:
+        st: Result of ``os.stat``/``os.lstat``
+
+    Returns:
+        Allocated bytes (the apparent size where blocks aren't reported)
+    """
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+@dataclass
+class TreeUsage:
+    """
+    Sizes of a set of files, with hardlinked files kept apart.
+
+    Files with a single link are summed directly; files with more than one
+    link are kept by inode until ``resolve`` so each is counted once.
+    """
+
+    apparent: int = 0
+    allocated: int = 0
+    links: LinkMap = field(default_factory=dict)
+
+    def add_file(self, st: os.stat_result) -> None:
+        """
+        Count a regular file.
+
+        Args:
+            st: The file's ``lstat`` result
+        """
+        if st.st_nlink > 1:
+            self.links.setdefault((st.st_dev, st.st_ino), (st.st_size, allocated_size(st)))
+        else:
+            self.apparent += st.st_size
+            self.allocated += allocated_size(st)
+
+    def update(self, other: "TreeUsage") -> None:
+        """
+        Add another set of files to this one.
+
+        Args:
+            other: Usage to add
+        """
+        self.apparent += other.apparent
+        self.allocated += other.allocated
+        for key, sizes in other.links.items():
+            self.links.setdefault(key, sizes)
+
+    def resolve(self, seen: set[tuple[int, int]] | None = None) -> DiskUsage:
+        """
+        Get the final sizes, counting each hardlinked inode once.
+
+        Args:
+            seen: Inodes already counted elsewhere; updated in place
+
+        Returns:
+            DiskUsage object
+        """
+        seen = set() if seen is None else seen
+        usage = DiskUsage(apparent=self.apparent, allocated=self.allocated)
+        for key, (apparent, allocated) in self.links.items():
+            if key in seen:
+                continue
+            seen.add(key)
+            usage.apparent += apparent
+            usage.allocated += allocated
+        return usage
+
+
+@dataclass
+class DirectoryScan:
+    """Direct contents of one directory."""
+
+    usage: TreeUsage
+    dirs: list[str]
+
+
+def scan_directory(path: str) -> DirectoryScan | None:
+    """
+    Measure the files directly inside a directory.
+
+    Args:
+        path: Directory path
+
+    Returns:
+        DirectoryScan with the file sizes and subdirectory names, or None if
+        the directory can't be read
+    """
+    usage = TreeUsage()
+    dirs: list[str] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        usage.add_file(entry.stat(follow_symlinks=False))
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    dirs.sort()
+    return DirectoryScan(usage=usage, dirs=dirs)
+
+
+def tree_usage(
+    path: str, scan: Callable[[str], DirectoryScan | None] = scan_directory
+) -> TreeUsage:
+    """
+    Measure a directory tree without recursion.
+
+    Args:
+        path: Root directory path
+        scan: Function listing one directory (e.g. a cached one)
+
+    Returns:
+        TreeUsage of every file below ``path``
+    """
+    total = TreeUsage()
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        result = scan(current)
+        if result is None:
+            continue
+        total.update(result.usage)
+        stack.extend(os.path.join(current, name) for name in result.dirs)
+    return total
+
+
+def disk_usage(path: str) -> DiskUsage:
+    """
+    Measure a directory tree.
+
+    Args:
+        path: Root directory path
+
+    Returns:
+        DiskUsage with apparent and allocated bytes
+    """
+    return tree_usage(path).resolve()
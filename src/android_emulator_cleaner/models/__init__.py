@@ -2,26 +2,60 @@
 
 from .types import (
     AVD,
+    AppStorage,
+    AVDSizes,
     CleanupCategory,
+    CleanupFilter,
     CleanupOption,
     CleanupResult,
+    CompactionResult,
+    DedupeResult,
+    DeletionResult,
     Device,
     DeviceCleanupSummary,
+    DeviceEvent,
+    DeviceEventType,
     DeviceType,
+    DiskUsage,
+    ProgressEvent,
+    ReclaimEstimate,
     RiskLevel,
+    Snapshot,
+    SnapshotKeep,
+    SnapshotPolicy,
     StorageInfo,
+    StorageSnapshot,
     UninstallResult,
+    format_size,
+    parse_size,
 )
 
 __all__ = [
     "AVD",
+    "AVDSizes",
+    "AppStorage",
     "CleanupCategory",
+    "CleanupFilter",
     "CleanupOption",
     "CleanupResult",
+    "CompactionResult",
+    "DedupeResult",
     "Device",
+    "DeletionResult",
     "DeviceCleanupSummary",
+    "DeviceEvent",
+    "DeviceEventType",
     "DeviceType",
+    "DiskUsage",
+    "ProgressEvent",
+    "ReclaimEstimate",
     "RiskLevel",
+    "Snapshot",
+    "SnapshotKeep",
+    "SnapshotPolicy",
     "StorageInfo",
+    "StorageSnapshot",
     "UninstallResult",
+    "format_size",
+    "parse_size",
 ]
@@ -2,11 +2,56 @@
 Data models for Android Emulator Cleaner.
 
 This module contains all dataclasses and enums used throughout the application.
+Sizes are stored as integer byte counts; ``*_text`` properties format them.
 """
 
 from dataclasses import dataclass, field
 from enum import Enum
 
+SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4, "P": 1024**5}
+
+# Name of the snapshot the emulator saves on exit and loads for Quick Boot
+QUICK_BOOT_SNAPSHOT = "default_boot"
+
+
+def format_size(size_bytes: int) -> str:
+    """
+    Format bytes to human-readable string.
+
+    Args:
+        size_bytes: Size in bytes
+
+    Returns:
+        Formatted string (e.g., "1.5GB")
+    """
+    size: float = float(size_bytes)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def parse_size(text: str) -> int | None:
+    """
+    Parse a human-readable size (e.g. ``df -h`` output) into bytes.
+
+    Args:
+        text: Size such as "64G", "2.5M", "512K" or "0"
+
+    Returns:
+        Size in bytes, or None if the text isn't a size
+    """
+    value = text.strip().upper().removesuffix("IB").removesuffix("B")
+    unit = value[-1:] if value[-1:].isalpha() else ""
+    number = value[: len(value) - len(unit)]
+    if unit not in SIZE_UNITS:
+        return None
+    try:
+        return int(float(number) * SIZE_UNITS[unit])
+    except ValueError:
+        return None
+
 
 class CleanupCategory(Enum):
     """Categories of cleanup operations."""
@@ -33,7 +78,23 @@ class DeviceType(Enum):
     PHYSICAL = "physical"
 
 
-@dataclass
+class SnapshotKeep(Enum):
+    """Which snapshot of an AVD is protected from eviction."""
+
+    NONE = "none"
+    DEFAULT_BOOT = "default_boot"
+    NEWEST = "newest"
+
+
+class DeviceEventType(Enum):
+    """Kinds of device list changes reported by the device tracker."""
+
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+
+
+@dataclass(slots=True)
 class CleanupOption:
     """Represents a cleanup option with all its configuration."""
 
@@ -58,7 +119,22 @@ class CleanupOption:
         return indicators.get(self.risk_level, "⚪")
 
 
-@dataclass
+@dataclass(slots=True)
+class CleanupFilter:
+    """Limits path deletions to files matching an age and size."""
+
+    # Only delete files last modified more than this many days ago
+    older_than_days: int | None = None
+    # Only delete files larger than this many bytes
+    larger_than: int | None = None
+
+    @property
+    def is_active(self) -> bool:
+        """Check if any limit is set."""
+        return self.older_than_days is not None or self.larger_than is not None
+
+
+@dataclass(slots=True)
 class Device:
     """Represents a connected Android device or emulator."""
 
@@ -68,6 +144,9 @@ class Device:
     model: str
     android_version: str
     sdk_version: str
+    product: str = ""
+    device_name: str = ""
+    transport_id: str = ""
 
     @property
     def is_emulator(self) -> bool:
@@ -81,16 +160,68 @@ class Device:
         return f"{icon} {self.model} | Android {self.android_version} | {self.device_id}"
 
 
-@dataclass
+@dataclass(slots=True)
+class DiskUsage:
+    """Size of a set of files on the host."""
+
+    apparent: int = 0
+    allocated: int = 0
+
+
+@dataclass(slots=True)
+class AVDSizes:
+    """Byte counts of an AVD directory, by category."""
+
+    snapshots: int = 0
+    cache: int = 0
+    userdata: int = 0
+    sdcard: int = 0
+    other: int = 0
+
+    @property
+    def total(self) -> int:
+        """Get the total size in bytes."""
+        return self.snapshots + self.cache + self.userdata + self.sdcard + self.other
+
+    def __add__(self, other: "AVDSizes") -> "AVDSizes":
+        return AVDSizes(
+            snapshots=self.snapshots + other.snapshots,
+            cache=self.cache + other.cache,
+            userdata=self.userdata + other.userdata,
+            sdcard=self.sdcard + other.sdcard,
+            other=self.other + other.other,
+        )
+
+
+@dataclass(slots=True)
 class AVD:
     """Represents an Android Virtual Device (AVD)."""
 
     name: str
     path: str
-    total_size: str
-    snapshot_size: str
-    cache_size: str
+    # Bytes on disk (allocated) for the whole AVD, its snapshots and cache
+    total_size: int
+    snapshot_size: int
+    cache_size: int
     is_running: bool
+    # Apparent sizes (st_size) and space actually used on disk (st_blocks)
+    sizes: AVDSizes = field(default_factory=AVDSizes)
+    allocated: AVDSizes = field(default_factory=AVDSizes)
+
+    @property
+    def total_size_text(self) -> str:
+        """Get the formatted total size."""
+        return format_size(self.total_size)
+
+    @property
+    def snapshot_size_text(self) -> str:
+        """Get the formatted snapshot size."""
+        return format_size(self.snapshot_size)
+
+    @property
+    def cache_size_text(self) -> str:
+        """Get the formatted cache size."""
+        return format_size(self.cache_size)
 
     @property
     def status_text(self) -> str:
@@ -100,35 +231,150 @@ class AVD:
     @property
     def display_name(self) -> str:
         """Get a formatted display name."""
-        return f"💾 {self.name} | {self.total_size} | Snapshots: {self.snapshot_size} | {self.status_text}"
+        return (
+            f"💾 {self.name} | {self.total_size_text} | "
+            f"Snapshots: {self.snapshot_size_text} | {self.status_text}"
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class StorageInfo:
-    """Storage information for a device."""
+    """Storage information for a device, in bytes (None when unknown)."""
 
-    total: str = "N/A"
-    used: str = "N/A"
-    available: str = "N/A"
-    use_percent: str = "N/A"
+    total: int | None = None
+    used: int | None = None
+    available: int | None = None
+    use_percent: int | None = None
+    # Mount point df reported for the probed path
+    mounted_on: str = ""
+
+    @property
+    def total_text(self) -> str:
+        """Get the formatted total size."""
+        return _format_optional(self.total)
+
+    @property
+    def used_text(self) -> str:
+        """Get the formatted used size."""
+        return _format_optional(self.used)
+
+    @property
+    def available_text(self) -> str:
+        """Get the formatted free size."""
+        return _format_optional(self.available)
+
+    @property
+    def use_percent_text(self) -> str:
+        """Get the formatted usage percentage."""
+        return "N/A" if self.use_percent is None else f"{self.use_percent}%"
 
     @classmethod
     def from_df_output(cls, output: str) -> "StorageInfo":
-        """Parse storage info from df command output."""
+        """
+        Parse storage info from df command output.
+
+        Understands both ``df -k`` (1K-block counts) and ``df -h``
+        (human-readable sizes) output.
+        """
         lines = output.strip().split("\n")
         if len(lines) >= 2:
+            header = lines[0].lower()
             parts = lines[-1].split()
             if len(parts) >= 4:
+                if "1k-blocks" in header or "1024-blocks" in header:
+                    sizes = [_parse_blocks(part) for part in parts[1:4]]
+                else:
+                    sizes = [parse_size(part) for part in parts[1:4]]
+                percent = parts[4].rstrip("%") if len(parts) > 4 else ""
                 return cls(
-                    total=parts[1],
-                    used=parts[2],
-                    available=parts[3],
-                    use_percent=parts[4] if len(parts) > 4 else "N/A",
+                    total=sizes[0],
+                    used=sizes[1],
+                    available=sizes[2],
+                    use_percent=int(percent) if percent.isdigit() else None,
+                    mounted_on=parts[5] if len(parts) > 5 else "",
                 )
         return cls()
 
+    def freed_since(self, before: "StorageInfo") -> int | None:
+        """
+        Get the free space gained since an earlier probe.
+
+        Args:
+            before: Earlier probe of the same mount
+
+        Returns:
+            Bytes gained (negative if space was used), or None if unknown
+        """
+        if self.available is None or before.available is None:
+            return None
+        return self.available - before.available
+
+
+@dataclass(slots=True)
+class StorageSnapshot:
+    """Storage of several mount points of a device, probed in one call."""
+
+    # Probed path -> storage of the filesystem holding it
+    mounts: dict[str, StorageInfo] = field(default_factory=dict)
+
+    @property
+    def primary(self) -> StorageInfo:
+        """Get the storage of /data (or the first probed path)."""
+        if "/data" in self.mounts:
+            return self.mounts["/data"]
+        return next(iter(self.mounts.values()), StorageInfo())
+
+    def filesystems(self) -> dict[str, StorageInfo]:
+        """
+        Get one entry per filesystem.
+
+        Paths on the same mount (e.g. /data and /data/local/tmp) are listed
+        once, under the first path probed on it.
+
+        Returns:
+            Dict of probed path to storage info
+        """
+        seen: set[str] = set()
+        result = {}
+        for path, info in self.mounts.items():
+            key = info.mounted_on or path
+            if key not in seen:
+                seen.add(key)
+                result[path] = info
+        return result
+
+
+def _format_optional(size_bytes: int | None) -> str:
+    """Format a size that may be unknown."""
+    return "N/A" if size_bytes is None else format_size(size_bytes)
+
+
+def _parse_blocks(text: str) -> int | None:
+    """Parse a count of 1K blocks into bytes."""
+    return int(text) * 1024 if text.isdigit() else None
+
+
+@dataclass(slots=True)
+class AppStorage:
+    """Space used by an installed app, in bytes (from ``dumpsys diskstats``)."""
+
+    package: str
+    app_size: int = 0
+    data_size: int = 0
+    cache_size: int = 0
+
+    @property
+    def total(self) -> int:
+        """Get the total size in bytes."""
+        return self.app_size + self.data_size + self.cache_size
+
+    @property
+    def total_text(self) -> str:
+        """Get the formatted total size."""
+        return format_size(self.total)
+
 
-@dataclass
+@dataclass(slots=True)
 class CleanupResult:
     """Result of a cleanup operation."""
 
@@ -136,9 +382,161 @@ class CleanupResult:
     success: bool
     output: str
     bytes_freed: int = 0
+    duration: float = 0.0
+
+    @property
+    def bytes_freed_text(self) -> str:
+        """Get the formatted bytes freed."""
+        return format_size(self.bytes_freed)
+
+
+@dataclass(slots=True)
+class ReclaimEstimate:
+    """Bytes each cleanup option would free on a device, measured without deleting."""
+
+    device: Device
+    options: list[CleanupOption]
+    # Bytes under each option's path (None where it couldn't be read)
+    sizes: list[int | None]
+
+    @property
+    def total(self) -> int:
+        """Get the bytes the options would free, counting unknown sizes as 0."""
+        return sum(size or 0 for size in self.sizes)
+
+    @property
+    def total_text(self) -> str:
+        """Get the formatted total."""
+        return format_size(self.total)
+
+    @property
+    def empty_options(self) -> list[CleanupOption]:
+        """Get the options whose targets are already empty."""
+        return [option for option, size in zip(self.options, self.sizes) if size == 0]
+
+    def size_of(self, option: CleanupOption) -> int | None:
+        """
+        Get the measured size of an option's path.
+
+        Args:
+            option: Cleanup option
+
+        Returns:
+            Bytes, or None if the option wasn't measured or couldn't be read
+        """
+        for candidate, size in zip(self.options, self.sizes):
+            if candidate == option:
+                return size
+        return None
+
+
+@dataclass(slots=True)
+class DeletionResult:
+    """Result of removing files on the host."""
+
+    bytes_freed: int = 0
+    files_removed: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        """Check if everything was removed."""
+        return not self.errors
+
+    def update(self, other: "DeletionResult") -> None:
+        """Add another result to this one."""
+        self.bytes_freed += other.bytes_freed
+        self.files_removed += other.files_removed
+        self.errors.extend(other.errors)
+
+
+@dataclass(slots=True)
+class CompactionResult:
+    """Result of compacting one disk image in place."""
+
+    path: str
+    allocated_before: int
+    allocated_after: int
+    error: str = ""
+
+    @property
+    def success(self) -> bool:
+        """Check if the image was compacted without errors."""
+        return not self.error
+
+    @property
+    def bytes_freed(self) -> int:
+        """Get the host disk space released."""
+        return max(0, self.allocated_before - self.allocated_after)
+
 
+@dataclass(slots=True)
+class DedupeResult:
+    """Result of a content deduplication pass over AVD files."""
 
-@dataclass
+    dry_run: bool = False
+    groups: int = 0
+    files: int = 0
+    shared_bytes: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        """Check if every duplicate was handled."""
+        return not self.errors
+
+    @property
+    def shared_text(self) -> str:
+        """Get the shared (or shareable, in a dry run) bytes as a string."""
+        return format_size(self.shared_bytes)
+
+
+@dataclass(slots=True)
+class Snapshot:
+    """A single emulator snapshot of an AVD."""
+
+    name: str
+    path: str
+    size: int
+    last_used: float
+    creation_time: int | None = None
+    logical_name: str = ""
+    description: str = ""
+    parent: str = ""
+
+    @property
+    def is_quick_boot(self) -> bool:
+        """Check if this is the Quick Boot snapshot."""
+        return self.name == QUICK_BOOT_SNAPSHOT
+
+    @property
+    def size_text(self) -> str:
+        """Get the size as a human-readable string."""
+        return format_size(self.size)
+
+    @property
+    def display_name(self) -> str:
+        """Get the name shown to the user."""
+        return self.logical_name or self.name
+
+
+@dataclass(slots=True)
+class SnapshotPolicy:
+    """Which snapshots a cleanup evicts."""
+
+    keep: SnapshotKeep = SnapshotKeep.NONE
+    budget: int | None = None
+    per_avd_budget: int | None = None
+
+    @property
+    def evicts_all(self) -> bool:
+        """Check if the policy removes every snapshot."""
+        return (
+            self.keep == SnapshotKeep.NONE and self.budget is None and self.per_avd_budget is None
+        )
+
+
+@dataclass(slots=True)
 class UninstallResult:
     """Result of an app uninstall operation."""
 
@@ -147,15 +545,37 @@ class UninstallResult:
     output: str
 
 
-@dataclass
+@dataclass(slots=True)
+class DeviceEvent:
+    """A change in the set of devices known to the adb server."""
+
+    event_type: DeviceEventType
+    serial: str
+    status: str
+    previous_status: str | None = None
+
+
+@dataclass(slots=True)
+class ProgressEvent:
+    """Progress update emitted while a device is being cleaned."""
+
+    device_id: str
+    message: str = ""
+    advance: int = 0
+    finished: bool = False
+
+
+@dataclass(slots=True)
 class DeviceCleanupSummary:
     """Summary of cleanup operations for a device."""
 
     device: Device
     cleanup_results: list[CleanupResult] = field(default_factory=list)
     uninstall_results: list[UninstallResult] = field(default_factory=list)
-    storage_before: StorageInfo | None = None
-    storage_after: StorageInfo | None = None
+    storage_before: StorageSnapshot | None = None
+    storage_after: StorageSnapshot | None = None
+    # Why the pipeline stopped early, if it did (results above are partial)
+    error: str = ""
 
     @property
     def successful_cleanups(self) -> int:
@@ -166,3 +586,8 @@ class DeviceCleanupSummary:
     def successful_uninstalls(self) -> int:
         """Count of successful uninstall operations."""
         return sum(1 for r in self.uninstall_results if r.success)
+
+    @property
+    def bytes_freed(self) -> int:
+        """Total bytes freed by the cleanup operations."""
+        return sum(r.bytes_freed for r in self.cleanup_results)
@@ -14,9 +14,11 @@ from .panels import (
     create_avd_summary_panel,
     create_completion_panel,
     create_confirmation_panel,
+    create_estimate_table,
     create_header_panel,
     create_results_table,
     create_running_warning_panel,
+    create_snapshot_table,
     create_summary_panel,
     print_device_results,
     print_header_row,
@@ -28,10 +30,12 @@ __all__ = [
     "create_avd_summary_panel",
     "create_completion_panel",
     "create_confirmation_panel",
+    "create_estimate_table",
     "create_header_panel",
     "create_progress_bar",
     "create_results_table",
     "create_running_warning_panel",
+    "create_snapshot_table",
     "create_summary_panel",
     "print_device_results",
     "print_error",
@@ -4,11 +4,22 @@ UI Panel components module.
 This module contains all Rich panel and table components.
 """
 
+import time
+
 from rich import box
 from rich.panel import Panel
 from rich.table import Table
 
-from ..models import CleanupResult, Device, StorageInfo, UninstallResult
+from ..models import (
+    CleanupResult,
+    Device,
+    ReclaimEstimate,
+    Snapshot,
+    StorageInfo,
+    StorageSnapshot,
+    UninstallResult,
+    format_size,
+)
 from .console import console
 
 
@@ -52,10 +63,10 @@ def create_storage_panel(storage_info: StorageInfo) -> Panel:
         Panel with storage information
     """
     content = (
-        f"[bold white]📊 Total:[/]  [yellow]{storage_info.total}[/]\n"
-        f"[bold white]📈 Used:[/]   [yellow]{storage_info.used}[/]\n"
-        f"[bold white]📉 Free:[/]   [yellow]{storage_info.available}[/]\n"
-        f"[bold white]📍 Usage:[/]  [yellow]{storage_info.use_percent}[/]\n"
+        f"[bold white]📊 Total:[/]  [yellow]{storage_info.total_text}[/]\n"
+        f"[bold white]📈 Used:[/]   [yellow]{storage_info.used_text}[/]\n"
+        f"[bold white]📉 Free:[/]   [yellow]{storage_info.available_text}[/]\n"
+        f"[bold white]📍 Usage:[/]  [yellow]{storage_info.use_percent_text}[/]\n"
         " \n"
         " "
     )
@@ -144,6 +155,7 @@ def create_results_table() -> Table:
     table.add_column("Status", justify="center", width=8)
     table.add_column("", width=4)
     table.add_column("Option", style="white", min_width=18)
+    table.add_column("Freed", justify="right", style="green", width=10)
     table.add_column("Details", style="dim", min_width=40)
     return table
 
@@ -160,15 +172,17 @@ def add_result_row(table: Table, result: CleanupResult) -> None:
 
     status = "[bold green]✓ OK[/bold green]" if result.success else "[bold red]✗ FAIL[/bold red]"
 
-    table.add_row(status, result.option.icon, result.option.name, output or "Completed")
+    freed = result.bytes_freed_text if result.bytes_freed else "-"
+
+    table.add_row(status, result.option.icon, result.option.name, freed, output or "Completed")
 
 
 def print_device_results(
     device: Device,
     cleanup_results: list[CleanupResult],
     uninstall_results: list[UninstallResult],
-    storage_before: StorageInfo,
-    storage_after: StorageInfo,
+    storage_before: StorageSnapshot,
+    storage_after: StorageSnapshot,
 ) -> tuple[int, int, int, int]:
     """
     Print results for a single device.
@@ -215,24 +229,56 @@ def print_device_results(
 
         console.print(table)
 
-    # Storage comparison
-    if storage_before and storage_after:
+        bytes_freed = sum(r.bytes_freed for r in cleanup_results)
+        if bytes_freed:
+            console.print(
+                f"  [bold white]Freed:[/bold white] [green]{format_size(bytes_freed)}[/green]"
+            )
+
+    # Storage comparison, one line per filesystem probed both times
+    compared = [
+        (path, before, storage_after.mounts[path])
+        for path, before in storage_before.filesystems().items()
+        if path in storage_after.mounts
+    ]
+    if compared:
         console.print()
-        storage_text = (
-            f"  [dim]Before:[/dim] {storage_before.available} free "
-            f"[dim]→[/dim] [green]After:[/green] {storage_after.available} free"
-        )
-        console.print(storage_text)
+        for path, before, after in compared:
+            console.print(format_storage_change(path, before, after))
 
     return success_count, len(cleanup_results), uninstall_success, uninstall_total
 
 
+def format_storage_change(path: str, before: StorageInfo, after: StorageInfo) -> str:
+    """
+    Format the free space of a mount before and after cleanup.
+
+    Args:
+        path: Probed path
+        before: Storage info before cleanup
+        after: Storage info after cleanup
+
+    Returns:
+        Markup line with the exact change in free space
+    """
+    text = (
+        f"  [dim]{path}[/dim]  [dim]Before:[/dim] {before.available_text} free "
+        f"[dim]→[/dim] [green]After:[/green] {after.available_text} free"
+    )
+    freed = after.freed_since(before)
+    if freed is None:
+        return text
+    sign = "+" if freed >= 0 else "-"
+    return f"{text} [dim]({sign}{format_size(abs(freed))}, {freed:+,} bytes)[/dim]"
+
+
 def create_summary_panel(
     device_count: int,
     cleanup_success: int,
     cleanup_total: int,
     uninstall_success: int,
     uninstall_total: int,
+    bytes_freed: int = 0,
 ) -> Panel:
     """
     Create a summary panel.
@@ -243,6 +289,7 @@ def create_summary_panel(
         cleanup_total: Total cleanup operations
         uninstall_success: Successful uninstalls
         uninstall_total: Total uninstalls
+        bytes_freed: Bytes freed by cleanup operations on all devices
 
     Returns:
         Summary panel
@@ -259,6 +306,11 @@ def create_summary_panel(
             f"[bold white]Cleanup Operations:[/bold white] {cleanup_success}/{cleanup_total} successful"
         )
 
+    if bytes_freed > 0:
+        summary_lines.append(
+            f"[bold white]Space Freed:[/bold white] [green]{format_size(bytes_freed)}[/green]"
+        )
+
     return Panel(
         "\n".join(summary_lines),
         title="[bold green]Summary[/bold green]",
@@ -323,3 +375,69 @@ def create_running_warning_panel(count: int) -> Panel:
         border_style="yellow",
         box=box.ROUNDED,
     )
+
+
+def create_snapshot_table(snapshots: list[Snapshot]) -> Table:
+    """
+    Create a table of an AVD's snapshots.
+
+    Args:
+        snapshots: Snapshots to list
+
+    Returns:
+        Snapshot table
+    """
+    table = Table(show_header=True, header_style="bold white", box=box.ROUNDED)
+    table.add_column("Snapshot", style="white", min_width=14)
+    table.add_column("Size", justify="right", style="cyan")
+    table.add_column("Last Used", style="dim")
+    table.add_column("Created", style="dim")
+    table.add_column("Description", style="dim")
+
+    for snapshot in snapshots:
+        name = snapshot.display_name
+        if snapshot.is_quick_boot:
+            name += " [green](Quick Boot)[/green]"
+        created = (
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(snapshot.creation_time))
+            if snapshot.creation_time
+            else "-"
+        )
+        table.add_row(
+            name,
+            snapshot.size_text,
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(snapshot.last_used)),
+            created,
+            snapshot.description or "-",
+        )
+    return table
+
+
+def create_estimate_table(estimates: list[ReclaimEstimate]) -> Table:
+    """
+    Create a table of the space each cleanup option would free per device.
+
+    Args:
+        estimates: Estimates of the devices, all for the same options
+
+    Returns:
+        Estimate table
+    """
+    options = estimates[0].options if estimates else []
+    table = Table(show_header=True, header_style="bold white", box=box.ROUNDED)
+    table.add_column("Device", style="white", min_width=14)
+    for option in options:
+        table.add_column(f"{option.icon} {option.name}", justify="right", style="cyan")
+    table.add_column("Total", justify="right", style="bold green")
+
+    for estimate in estimates:
+        cells = []
+        for size in estimate.sizes:
+            if size is None:
+                cells.append("[dim]?[/dim]")
+            elif size == 0:
+                cells.append("[dim]empty[/dim]")
+            else:
+                cells.append(format_size(size))
+        table.add_row(estimate.device.model, *cells, estimate.total_text)
+    return table
@@ -4,6 +4,7 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from android_emulator_cleaner.core.cleaner import APP_STORAGE_CACHE
 from android_emulator_cleaner.models import (
     AVD,
     CleanupCategory,
@@ -47,9 +48,9 @@ def mock_avd() -> AVD:
     return AVD(
         name="Pixel_6_API_34",
         path="/Users/test/.android/avd/Pixel_6_API_34.avd",
-        total_size="8.5GB",
-        snapshot_size="2.1GB",
-        cache_size="512MB",
+        total_size=9_126_805_504,
+        snapshot_size=2_254_857_830,
+        cache_size=536_870_912,
         is_running=False,
     )
 
@@ -60,9 +61,9 @@ def mock_running_avd() -> AVD:
     return AVD(
         name="Pixel_7_API_34",
         path="/Users/test/.android/avd/Pixel_7_API_34.avd",
-        total_size="10.2GB",
-        snapshot_size="3.5GB",
-        cache_size="768MB",
+        total_size=10_952_166_604,
+        snapshot_size=3_758_096_384,
+        cache_size=805_306_368,
         is_running=True,
     )
 
@@ -84,7 +85,9 @@ def mock_cleanup_option() -> CleanupOption:
 @pytest.fixture
 def mock_storage_info() -> StorageInfo:
     """Create mock storage info for testing."""
-    return StorageInfo(total="64G", used="32G", available="32G", use_percent="50%")
+    return StorageInfo(
+        total=64 * 1024**3, used=32 * 1024**3, available=32 * 1024**3, use_percent=50
+    )
 
 
 @pytest.fixture
@@ -107,8 +110,43 @@ def mock_subprocess_failure():
     return mock
 
 
+@pytest.fixture
+def fake_run_script():
+    """Create a fake ADBClient.run_script that reports every fused step as successful."""
+
+    def run_script(script, **_kwargs):
+        marker = script.split('"', 2)[1].rsplit(":BEGIN:", 1)[0]
+        count = script.count(f"{marker}:BEGIN:")
+        return True, "".join(
+            f"{marker}:BEGIN:{i}\nSuccess\n\n{marker}:END:{i}:0:1:2\n" for i in range(count)
+        )
+
+    return run_script
+
+
 @pytest.fixture(autouse=True)
 def mock_adb_path():
     """Mock ADB path for all tests so they work without ADB installed."""
     with patch("shutil.which", return_value="/usr/bin/adb"):
         yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path_factory, monkeypatch):
+    """Keep the AVD size index out of the real user cache directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path_factory.mktemp("cache")))
+
+
+@pytest.fixture(autouse=True)
+def clear_app_storage():
+    """Start every test without per-app storage cached from another test."""
+    APP_STORAGE_CACHE.clear()
+    yield
+    APP_STORAGE_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def mock_adb_server():
+    """Pretend no adb server is running so tests exercise the subprocess path."""
+    with patch("android_emulator_cleaner.core.protocol.ADBServer.is_available", return_value=False):
+        yield
@@ -1,9 +1,53 @@
 """Tests for ADB module."""
 
 import subprocess
+import sys
 from unittest.mock import MagicMock, patch
 
-from android_emulator_cleaner.core.adb import ADBClient, get_connected_devices
+import pytest
+
+from android_emulator_cleaner.core.adb import (
+    STORAGE_MOUNTS,
+    ADBClient,
+    build_du_script,
+    build_storage_script,
+    get_connected_devices,
+    parse_devices_output,
+    parse_diskstats_output,
+    parse_du_output,
+    parse_getprop_output,
+    parse_root_output,
+    parse_storage_output,
+)
+from android_emulator_cleaner.core.script import parse_script_output
+
+DF_HEADER = "Filesystem     1K-blocks    Used Available Use% Mounted on"
+DF_ROWS = {
+    "/data": "/dev/block/dm-5   6082144 2353284   3712476  39% /data",
+    "/sdcard": "/dev/fuse         6082144 2353284   3712476  39% /storage/emulated",
+    "/data/local/tmp": "/dev/block/dm-5   6082144 2353284   3712476  39% /data",
+}
+
+
+def _storage_output(script: str) -> str:
+    """Answer a storage script as a device without /cache would."""
+    marker = script.split('"', 2)[1].rsplit(":BEGIN:", 1)[0]
+    steps = []
+    for i, mount in enumerate(STORAGE_MOUNTS):
+        row = DF_ROWS.get(mount)
+        output, code = (f"{DF_HEADER}\n{row}", 0) if row else (f"df: {mount}: No such file", 1)
+        steps.append(f"{marker}:BEGIN:{i}\n{output}\n{marker}:END:{i}:{code}:1:2\n")
+    return "".join(steps)
+
+
+def _run_du(path: str) -> int | None:
+    """Size a path with the measuring script in a local shell."""
+    proc = subprocess.run(
+        ["sh", "-c", build_du_script([path], "M")], capture_output=True, text=True
+    )
+    step = parse_script_output(proc.stdout + proc.stderr, 1, "M")[0]
+    assert step is not None
+    return parse_du_output(step.output, step.success)
 
 
 class TestADBClient:
@@ -136,6 +180,162 @@ class TestADBClient:
         assert packages == []
 
 
+class TestStorageSnapshot:
+    """Tests for the batched storage probe."""
+
+    def test_one_call_for_all_mounts(self):
+        """Test every mount is probed in a single script."""
+        client = ADBClient("emulator-5554")
+
+        with patch.object(
+            ADBClient, "run_script", side_effect=lambda script, **_: (True, _storage_output(script))
+        ) as run_script:
+            snapshot = client.get_storage_snapshot()
+
+        assert run_script.call_count == 1
+        assert list(snapshot.mounts) == ["/data", "/sdcard", "/data/local/tmp"]
+        assert snapshot.primary.available == 3712476 * 1024
+        assert snapshot.mounts["/sdcard"].mounted_on == "/storage/emulated"
+
+    def test_parse_missing_steps(self):
+        """Test steps that never reported are left out."""
+        script = build_storage_script(STORAGE_MOUNTS, "M")
+        assert "df -k /data/local/tmp" in script
+
+        snapshot = parse_storage_output(f"M:BEGIN:0\n{DF_HEADER}\n", STORAGE_MOUNTS, "M")
+        assert snapshot.mounts == {}
+        assert snapshot.primary.available is None
+
+
+class TestMeasurePaths:
+    """Tests for batched du sizing."""
+
+    def test_one_call_for_all_paths(self):
+        """Test every non-empty path is sized in a single script."""
+        client = ADBClient("emulator-5554")
+
+        def fake_script(script, **_kwargs):
+            marker = script.split('"', 2)[1].rsplit(":BEGIN:", 1)[0]
+            return True, (
+                f"{marker}:BEGIN:0\n8\t/data/local/tmp/a.apk\n4\t/data/local/tmp/b\n"
+                f"{marker}:END:0:0:1:2\n"
+                f"{marker}:BEGIN:1\ndu: /x: No such file or directory\n{marker}:END:1:1:1:2\n"
+                f"{marker}:BEGIN:2\ndu: /y/*: No such file or directory\n{marker}:END:2:1:1:2\n"
+            )
+
+        with patch.object(client, "run_script", side_effect=fake_script) as mock_script:
+            sizes = client.measure_paths(["/data/local/tmp/*", "", "/x", "/y/*"])
+
+        assert mock_script.call_count == 1
+        assert "for _aec_d in /data/local/tmp; do" in mock_script.call_args[0][0]
+        assert sizes == [12 * 1024, None, 0, 0]
+
+    def test_no_paths(self):
+        """Test nothing runs without paths to size."""
+        client = ADBClient("emulator-5554")
+        with patch.object(client, "run_script") as mock_script:
+            assert client.measure_paths(["", ""]) == [None, None]
+        mock_script.assert_not_called()
+
+    def test_parse_du_output(self):
+        """Test du sizes are summed and failures without sizes are unknown."""
+        assert parse_du_output("100\t/a\n28 /b\n") == 128 * 1024
+        assert parse_du_output("du: /a: Permission denied\n", success=False) is None
+        assert parse_du_output("du: /a/*/cache: No such file\n", success=False) == 0
+        assert parse_du_output("du: /a: No such file\n", success=False) == 0
+        assert parse_du_output("4\t/a\ndu: /b: Permission denied\n", success=False) == 4096
+        assert build_du_script(["/a/*"], "M").count("M:BEGIN:") == 1
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+    @pytest.mark.parametrize(
+        ("files", "expected"),
+        [
+            ({}, 0),
+            ({".nomedia": b""}, 0),
+            ({"a.apk": b"x" * 8192, "sub/b": b"y" * 4096}, 12 * 1024),
+        ],
+    )
+    def test_du_command_in_shell(self, tmp_path, files, expected):
+        """Test a real directory, emptied or not, is sized through its glob."""
+        root = tmp_path / "tmp"
+        root.mkdir()
+        for name, data in files.items():
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_bytes(data)
+
+        size = _run_du(f"{root}/*")
+
+        assert size is not None
+        assert (size == 0) == (expected == 0)
+        assert size >= expected
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+    def test_du_command_unmatched_globs(self, tmp_path):
+        """Test globs matching nothing are 0 only where the shell could look."""
+        (tmp_path / "data" / "app").mkdir(parents=True)
+
+        assert _run_du(f"{tmp_path}/data/*/cache/*") == 0
+        assert _run_du(f"{tmp_path}/missing/*") == 0
+        assert _run_du(f"{tmp_path}/missing/*/cache/*") == 0
+        (tmp_path / "data" / "app" / "cache").mkdir()
+        assert _run_du(f"{tmp_path}/data/*/cache/*") == 0
+
+
+class TestParsers:
+    """Tests for adb output parsers."""
+
+    def test_parse_root_output(self):
+        """Test adb root replies map to success, failure or unknown."""
+        assert parse_root_output("restarting adbd as root") is True
+        assert parse_root_output("adbd is already running as root") is True
+        assert parse_root_output("adbd cannot run as root in production builds") is False
+        assert parse_root_output("error: closed") is None
+
+    def test_parse_devices_output(self):
+        """Test parsing devices -l output into fields."""
+        output = """List of devices attached
+emulator-5554          device product:sdk_gphone64_arm64 model:Pixel_7 device:emu64a transport_id:3
+"""
+        entries = parse_devices_output(output)
+        assert entries == [
+            {
+                "serial": "emulator-5554",
+                "status": "device",
+                "product": "sdk_gphone64_arm64",
+                "model": "Pixel_7",
+                "device": "emu64a",
+                "transport_id": "3",
+            }
+        ]
+
+    def test_parse_diskstats_output(self):
+        """Test per-app arrays are zipped into AppStorage entries."""
+        output = """Latency: 2ms [512B Data Write]
+Data-Free: 1913248K / 6082144K total = 31% free
+App Size: 1048576
+Package Names: ["com.a","com.b"]
+App Sizes: [1000,2000]
+App Data Sizes: [10,20]
+Cache Sizes: [1,2]
+"""
+        storage = parse_diskstats_output(iter(output.split("\n")))
+        assert set(storage) == {"com.a", "com.b"}
+        assert storage["com.b"].app_size == 2000
+        assert storage["com.b"].total == 2022
+
+    def test_parse_diskstats_output_mismatch(self):
+        """Test arrays that don't line up are discarded."""
+        lines = ['Package Names: ["com.a","com.b"]', "App Sizes: [1000]"]
+        assert parse_diskstats_output(lines) == {}
+        assert parse_diskstats_output(["Data-Free: 1K / 2K total = 50% free"]) == {}
+
+    def test_parse_getprop_output(self):
+        """Test parsing a getprop dump."""
+        output = "[ro.build.version.sdk]: [34]\n[empty.prop]: []\ngarbage\n"
+        props = parse_getprop_output(output)
+        assert props == {"ro.build.version.sdk": "34", "empty.prop": ""}
+
+
 class TestGetConnectedDevices:
     """Tests for get_connected_devices function."""
 
@@ -144,23 +344,50 @@ class TestGetConnectedDevices:
         mock_devices_output = MagicMock()
         mock_devices_output.returncode = 0
         mock_devices_output.stdout = """List of devices attached
-emulator-5554          device product:sdk_gphone64_arm64 model:sdk_gphone64_arm64 device:emu64a transport_id:1
+emulator-5554          device product:sdk_gphone64_arm64 model:Pixel_7 device:emu64a transport_id:1
 """
         mock_devices_output.stderr = ""
 
         mock_prop_output = MagicMock()
         mock_prop_output.returncode = 0
-        mock_prop_output.stdout = "test_value"
+        mock_prop_output.stdout = (
+            "[ro.build.version.release]: [14]\n"
+            "[ro.build.version.sdk]: [34]\n"
+            "[ro.product.model]: [Pixel 7]\n"
+        )
         mock_prop_output.stderr = ""
 
         with patch(
-            "subprocess.run",
-            side_effect=[mock_devices_output, mock_prop_output, mock_prop_output, mock_prop_output],
-        ):
+            "subprocess.run", side_effect=[mock_devices_output, mock_prop_output]
+        ) as mock_run:
             devices = get_connected_devices()
 
         assert len(devices) == 1
         assert devices[0].device_id == "emulator-5554"
+        assert devices[0].model == "Pixel 7"
+        assert devices[0].android_version == "14"
+        assert devices[0].sdk_version == "34"
+        assert devices[0].product == "sdk_gphone64_arm64"
+        assert devices[0].device_name == "emu64a"
+        assert devices[0].transport_id == "1"
+        # One listing plus one getprop dump per device
+        assert mock_run.call_count == 2
+
+    def test_skips_offline_devices(self):
+        """Test offline and unauthorized devices are ignored."""
+        mock_result = MagicMock()
+        mock_result.returncode = 0
+        mock_result.stdout = """List of devices attached
+emulator-5554          offline transport_id:1
+ABCD1234               unauthorized usb:1-1 transport_id:2
+"""
+        mock_result.stderr = ""
+
+        with patch("subprocess.run", return_value=mock_result) as mock_run:
+            devices = get_connected_devices()
+
+        assert devices == []
+        assert mock_run.call_count == 1
 
     def test_no_devices(self):
         """Test with no connected devices."""
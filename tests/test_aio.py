@@ -0,0 +1,239 @@
+"""Tests for asyncio ADB module."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from android_emulator_cleaner.core.aio import (
+    AsyncADBClient,
+    AsyncDeviceCleaner,
+    ConcurrencyLimiter,
+)
+
+
+class FakeProcess:
+    """Stand-in for asyncio.subprocess.Process."""
+
+    def __init__(self, stdout: bytes = b"", stderr: bytes = b"", returncode: int = 0, delay=0.0):
+        self._stdout = stdout
+        self._stderr = stderr
+        self._delay = delay
+        self.returncode = returncode
+        self.killed = False
+
+    async def communicate(self):
+        await asyncio.sleep(self._delay)
+        return self._stdout, self._stderr
+
+    def kill(self):
+        self.killed = True
+
+    async def wait(self):
+        return self.returncode
+
+
+def _patch_exec(*processes):
+    """Patch create_subprocess_exec to hand out the given fake processes."""
+    calls = []
+    queue = list(processes)
+
+    async def fake_exec(*args, **_kwargs):
+        calls.append(args)
+        return queue.pop(0) if len(queue) > 1 else queue[0]
+
+    return patch("asyncio.create_subprocess_exec", side_effect=fake_exec), calls
+
+
+class TestAsyncADBClient:
+    """Tests for AsyncADBClient class."""
+
+    def test_run_command_success(self):
+        """Test successful command execution."""
+        patcher, calls = _patch_exec(FakeProcess(stdout=b"Success\n"))
+        with patcher:
+            result = asyncio.run(AsyncADBClient("emulator-5554").run_command("adb shell ls"))
+
+        assert result == (True, "Success")
+        assert calls[0][1:] == ("-s", "emulator-5554", "shell", "ls")
+
+    def test_run_command_failure(self):
+        """Test failed command execution uses stderr."""
+        patcher, _ = _patch_exec(FakeProcess(stderr=b"error: device not found", returncode=1))
+        with patcher:
+            success, output = asyncio.run(AsyncADBClient().run_command("adb devices"))
+
+        assert success is False
+        assert "device not found" in output
+
+    def test_run_command_timeout_kills_process(self):
+        """Test timeouts kill the adb process."""
+        process = FakeProcess(delay=5)
+        patcher, _ = _patch_exec(process)
+        with patcher:
+            success, output = asyncio.run(AsyncADBClient().run_command("adb shell sleep 9", 0.05))
+
+        assert success is False
+        assert "timed out" in output.lower()
+        assert process.killed is True
+
+    def test_cancellation_kills_process(self):
+        """Test cancelling the awaiting task kills the adb process."""
+        process = FakeProcess(delay=5)
+        patcher, _ = _patch_exec(process)
+
+        async def cancel_soon():
+            task = asyncio.create_task(AsyncADBClient().run_command("adb shell sleep 9"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        with patcher:
+            asyncio.run(cancel_soon())
+
+        assert process.killed is True
+
+    def test_list_packages(self):
+        """Test listing packages."""
+        patcher, _ = _patch_exec(FakeProcess(stdout=b"package:com.b\npackage:com.a\n"))
+        with patcher:
+            packages = asyncio.run(AsyncADBClient("emulator-5554").list_packages())
+
+        assert packages == ["com.a", "com.b"]
+
+    def test_get_storage_info(self):
+        """Test storage info parsing."""
+        df = b"Filesystem Size Used Avail Use% Mounted on\n/dev/block/dm-5 64G 32G 32G 50% /data\n"
+        patcher, _ = _patch_exec(FakeProcess(stdout=df))
+        with patcher:
+            info = asyncio.run(AsyncADBClient("emulator-5554").get_storage_info())
+
+        assert info.available == 32 * 1024**3
+
+    def test_get_storage_snapshot(self):
+        """Test all mounts are probed through one verbatim shell script."""
+        patcher, calls = _patch_exec(FakeProcess(stdout=b"no markers\n"))
+        with patcher:
+            snapshot = asyncio.run(AsyncADBClient("emulator-5554").get_storage_snapshot())
+
+        assert len(calls) == 1
+        assert calls[0][3] == "shell"
+        assert "df -k /sdcard" in calls[0][4]
+        assert snapshot.mounts == {}
+
+    def test_measure_paths(self):
+        """Test paths are sized through one du script."""
+        patcher, calls = _patch_exec(FakeProcess(stdout=b"no markers\n"))
+        with patcher:
+            sizes = asyncio.run(AsyncADBClient("emulator-5554").measure_paths(["/a/*", ""]))
+
+        assert len(calls) == 1
+        assert "for _aec_d in /a; do" in calls[0][4]
+        assert sizes == [None, None]
+
+    @pytest.mark.parametrize(
+        ("stdout", "returncode", "expected"),
+        [
+            (b"adbd cannot run as root in production builds\n", 1, False),
+            (b"adbd is already running as root\n", 0, True),
+            (b"restarting adbd as root\n", 0, True),
+        ],
+    )
+    def test_enable_root(self, stdout, returncode, expected):
+        """Test root replies are classified like the sync client does."""
+        patcher, _ = _patch_exec(FakeProcess(stdout=stdout, returncode=returncode))
+        with (
+            patcher,
+            patch(
+                "android_emulator_cleaner.core.aio.wait_for_root_restart", return_value=True
+            ) as mock_wait,
+        ):
+            result = asyncio.run(AsyncADBClient("emulator-5554").enable_root())
+
+        assert result is expected
+        assert mock_wait.called is stdout.startswith(b"restarting")
+
+    def test_enable_root_device_lost(self):
+        """Test root fails if the device doesn't come back after the restart."""
+        patcher, _ = _patch_exec(FakeProcess(stdout=b"restarting adbd as root\n"))
+        with (
+            patcher,
+            patch("android_emulator_cleaner.core.aio.wait_for_root_restart", return_value=False),
+        ):
+            assert asyncio.run(AsyncADBClient("emulator-5554").enable_root()) is False
+
+    def test_get_app_storage(self):
+        """Test per-app storage is parsed from dumpsys diskstats."""
+        output = b'Package Names: ["com.a"]\nApp Sizes: [4096]\n'
+        patcher, calls = _patch_exec(FakeProcess(stdout=output))
+        with patcher:
+            storage = asyncio.run(AsyncADBClient("emulator-5554").get_app_storage())
+
+        assert calls[0][3:] == ("shell", "dumpsys", "diskstats")
+        assert storage["com.a"].total == 4096
+
+
+class TestConcurrencyLimiter:
+    """Tests for ConcurrencyLimiter class."""
+
+    def test_per_device_and_total_limits(self):
+        """Test concurrent calls never exceed either limit."""
+        limiter = ConcurrencyLimiter(max_total=3, max_per_device=1)
+        active: dict[str, int] = {}
+        peaks = {"total": 0, "device": 0}
+
+        async def work(device_id):
+            async with limiter.slot(device_id):
+                active[device_id] = active.get(device_id, 0) + 1
+                peaks["total"] = max(peaks["total"], sum(active.values()))
+                peaks["device"] = max(peaks["device"], active[device_id])
+                await asyncio.sleep(0.01)
+                active[device_id] -= 1
+
+        async def main():
+            await asyncio.gather(*(work(f"emulator-{i % 5}") for i in range(20)))
+
+        asyncio.run(main())
+
+        assert peaks["total"] == 3
+        assert peaks["device"] == 1
+
+
+class TestAsyncDeviceCleaner:
+    """Tests for AsyncDeviceCleaner class."""
+
+    def test_run_all_cleanups(self, mock_device, mock_cleanup_option):
+        """Test running multiple cleanups."""
+        patcher, calls = _patch_exec(FakeProcess(stdout=b"Success"))
+        cleaner = AsyncDeviceCleaner(mock_device)
+        with patcher:
+            results = asyncio.run(cleaner.run_all_cleanups([mock_cleanup_option] * 2))
+
+        assert len(results) == 2
+        assert all(r.success for r in results)
+        # adb root followed by one call per option
+        assert len(calls) == 3
+
+    def test_enable_root_once(self, mock_device):
+        """Test adb root is only issued once per cleaner."""
+        patcher, calls = _patch_exec(FakeProcess(stdout=b"adbd is already running as root"))
+        cleaner = AsyncDeviceCleaner(mock_device)
+
+        async def twice():
+            return [await cleaner.enable_root(), await cleaner.enable_root()]
+
+        with patcher:
+            assert asyncio.run(twice()) == [True, True]
+
+        assert len(calls) == 1
+
+    def test_uninstall_apps(self, mock_device):
+        """Test uninstall results keep package order."""
+        patcher, _ = _patch_exec(FakeProcess(stdout=b"Success"))
+        cleaner = AsyncDeviceCleaner(mock_device)
+        with patcher:
+            results = asyncio.run(cleaner.uninstall_apps(["com.a", "com.b", "com.c"]))
+
+        assert [r.package for r in results] == ["com.a", "com.b", "com.c"]
+        assert all(r.success for r in results)
@@ -1,15 +1,33 @@
 """Tests for AVD module."""
 
+import os
+import subprocess
+import sys
 import tempfile
+from dataclasses import replace
 from pathlib import Path
+from unittest.mock import patch
 
+import pytest
+
+from android_emulator_cleaner.core import avd as avd_module
 from android_emulator_cleaner.core.avd import (
     clean_avd_cache,
     clean_avd_snapshots,
+    clean_avds,
+    detect_running_avds,
     format_size,
+    get_avd_list,
     get_dir_size,
+    get_total_avd_stats,
+    is_avd_locked,
+    parse_emulator_cmdline,
+    scan_avd_sizes,
+    scan_avd_sizes_parallel,
+    scan_emulator_processes,
 )
-from android_emulator_cleaner.models import AVD
+from android_emulator_cleaner.core.usage import allocated_size, disk_usage
+from android_emulator_cleaner.models import AVD, AVDSizes
 
 
 class TestFormatSize:
@@ -82,6 +100,83 @@ class TestGetDirSize:
         assert size == 0
 
 
+class TestScanAVDSizes:
+    """Tests for scan_avd_sizes function."""
+
+    def test_categories(self, tmp_path):
+        """Test every file lands in exactly one category."""
+        (tmp_path / "snapshots" / "default_boot").mkdir(parents=True)
+        (tmp_path / "snapshots" / "default_boot" / "ram.bin").write_bytes(b"s" * 100)
+        (tmp_path / "cache.img").write_bytes(b"c" * 10)
+        (tmp_path / "cache.img.qcow2").write_bytes(b"c" * 5)
+        (tmp_path / "userdata-qemu.img").write_bytes(b"u" * 40)
+        (tmp_path / "sdcard.img").write_bytes(b"d" * 30)
+        (tmp_path / "config.ini").write_bytes(b"o" * 7)
+        (tmp_path / "data").mkdir()
+        (tmp_path / "data" / "misc").write_bytes(b"o" * 3)
+
+        sizes, allocated = scan_avd_sizes(str(tmp_path))
+
+        assert sizes == AVDSizes(snapshots=100, cache=15, userdata=40, sdcard=30, other=10)
+        assert sizes.total == get_dir_size(str(tmp_path))
+        assert allocated.snapshots > 0
+
+    def test_nonexistent_directory(self):
+        """Test scanning a missing directory."""
+        assert scan_avd_sizes("/nonexistent/path") == (AVDSizes(), AVDSizes())
+
+    def test_total_stats_use_scanned_sizes(self, mock_avd):
+        """Test totals are aggregated from each AVD's allocated sizes."""
+        avds = [
+            replace(mock_avd, allocated=AVDSizes(snapshots=100, other=50)),
+            replace(mock_avd, allocated=AVDSizes(snapshots=20, cache=5)),
+        ]
+
+        assert get_total_avd_stats(avds) == (175, 120)
+
+
+def _make_avd_home(root: Path, count: int) -> Path:
+    """Create an AVD home with ``count`` AVDs of different shapes."""
+    for i in range(count):
+        (root / f"avd{i}.ini").write_text("path=x\n")
+        avd_dir = root / f"avd{i}.avd"
+        (avd_dir / "snapshots" / "default_boot").mkdir(parents=True)
+        (avd_dir / "snapshots" / "default_boot" / "ram.bin").write_bytes(b"s" * (100 * i + 1))
+        (avd_dir / "data" / "nested").mkdir(parents=True)
+        (avd_dir / "data" / "nested" / "blob").write_bytes(b"d" * (7 * i))
+        (avd_dir / "cache.img").write_bytes(b"c" * i)
+        (avd_dir / "userdata-qemu.img").write_bytes(b"u" * (3 * i))
+    return root
+
+
+class TestScanAVDSizesParallel:
+    """Tests for scan_avd_sizes_parallel function."""
+
+    def test_matches_serial_walk(self, tmp_path):
+        """Test parallel sizing matches the serial walk exactly, in order."""
+        home = _make_avd_home(tmp_path, 6)
+        paths = [str(home / f"avd{i}.avd") for i in range(6)] + [str(home / "missing")]
+
+        serial = [scan_avd_sizes(path) for path in paths]
+
+        assert scan_avd_sizes_parallel(paths, max_workers=4) == serial
+        assert scan_avd_sizes_parallel(paths, max_workers=1) == serial
+
+    def test_get_avd_list(self, tmp_path):
+        """Test AVD listing uses the parallel sizes."""
+        home = _make_avd_home(tmp_path, 3)
+
+        with patch("android_emulator_cleaner.core.avd.get_avd_home", return_value=home):
+            avds = get_avd_list(max_workers=3)
+
+        by_name = {avd.name: avd for avd in avds}
+        assert set(by_name) == {"avd0", "avd1", "avd2"}
+        sizes, allocated = scan_avd_sizes(str(home / "avd2.avd"))
+        assert by_name["avd2"].sizes == sizes
+        assert by_name["avd2"].allocated == allocated
+        assert not any(avd.is_running for avd in avds)
+
+
 class TestCleanAVDSnapshots:
     """Tests for clean_avd_snapshots function."""
 
@@ -98,9 +193,9 @@ class TestCleanAVDSnapshots:
             avd = AVD(
                 name="test",
                 path=tmpdir,
-                total_size="1GB",
-                snapshot_size="0B",
-                cache_size="0B",
+                total_size=1024**3,
+                snapshot_size=0,
+                cache_size=0,
                 is_running=False,
             )
 
@@ -123,15 +218,16 @@ class TestCleanAVDSnapshots:
             avd = AVD(
                 name="test",
                 path=tmpdir,
-                total_size="1GB",
-                snapshot_size="1000B",
-                cache_size="0B",
+                total_size=1024**3,
+                snapshot_size=1000,
+                cache_size=0,
                 is_running=False,
             )
 
+            expected = disk_usage(str(snapshot_dir)).allocated
             success, message, freed = clean_avd_snapshots(avd)
             assert success is True
-            assert freed == 1000
+            assert freed == expected
             assert not any(snapshot_dir.iterdir())  # Directory should be empty
 
 
@@ -151,9 +247,9 @@ class TestCleanAVDCache:
             avd = AVD(
                 name="test",
                 path=tmpdir,
-                total_size="1GB",
-                snapshot_size="0B",
-                cache_size="0B",
+                total_size=1024**3,
+                snapshot_size=0,
+                cache_size=0,
                 is_running=False,
             )
 
@@ -174,14 +270,168 @@ class TestCleanAVDCache:
             avd = AVD(
                 name="test",
                 path=tmpdir,
-                total_size="1GB",
-                snapshot_size="0B",
-                cache_size="800B",
+                total_size=1024**3,
+                snapshot_size=0,
+                cache_size=800,
                 is_running=False,
             )
 
+            expected = allocated_size(cache_file.stat()) + allocated_size(cache_file2.stat())
             success, message, freed = clean_avd_cache(avd)
             assert success is True
-            assert freed == 800
+            assert freed == expected
             assert not cache_file.exists()
             assert not cache_file2.exists()
+
+
+class TestCleanAVDs:
+    """Tests for clean_avds function."""
+
+    def test_cleans_all_avds_in_one_pass(self, tmp_path):
+        """Test snapshots and cache of several AVDs are removed together."""
+        avds = []
+        for name in ("a", "b"):
+            avd_dir = tmp_path / f"{name}.avd"
+            (avd_dir / "snapshots" / "default_boot").mkdir(parents=True)
+            (avd_dir / "snapshots" / "default_boot" / "ram.bin").write_bytes(b"x" * 5000)
+            (avd_dir / "cache.img").write_bytes(b"y" * 3000)
+            avds.append(
+                AVD(
+                    name=name,
+                    path=str(avd_dir),
+                    total_size=0,
+                    snapshot_size=0,
+                    cache_size=0,
+                    is_running=False,
+                )
+            )
+        avds[1].is_running = True
+        expected = disk_usage(str(tmp_path / "a.avd")).allocated
+
+        seen = []
+        result = clean_avds(avds, on_progress=lambda path, _: seen.append(path))
+
+        assert result.success is True
+        assert result.bytes_freed == expected
+        assert result.files_removed == 2
+        assert seen
+        assert not any((tmp_path / "a.avd" / "snapshots").iterdir())
+        assert not (tmp_path / "a.avd" / "cache.img").exists()
+        assert (tmp_path / "b.avd" / "cache.img").exists()
+
+    def test_cache_only(self, tmp_path):
+        """Test snapshots are kept when only cache is selected."""
+        (tmp_path / "snapshots").mkdir()
+        (tmp_path / "snapshots" / "snap.pb").write_bytes(b"x")
+        (tmp_path / "cache.img").write_bytes(b"y")
+        avd = AVD(
+            name="t",
+            path=str(tmp_path),
+            total_size=0,
+            snapshot_size=0,
+            cache_size=0,
+            is_running=False,
+        )
+
+        result = clean_avds([avd], snapshots=False)
+
+        assert result.files_removed == 1
+        assert (tmp_path / "snapshots" / "snap.pb").exists()
+
+
+def _dead_pid() -> int:
+    """Get the PID of a process that has already exited."""
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX lock semantics")
+class TestIsAVDLocked:
+    """Tests for is_avd_locked function."""
+
+    def test_no_locks(self, tmp_path):
+        """Test an AVD without lock files is not running."""
+        assert is_avd_locked(tmp_path) is False
+
+    def test_lock_directory_with_live_pid(self, tmp_path):
+        """Test a lock directory owned by a live process."""
+        lock_dir = tmp_path / "hardware-qemu.ini.lock"
+        lock_dir.mkdir()
+        (lock_dir / "pid").write_text(str(os.getpid()))
+
+        assert is_avd_locked(tmp_path) is True
+
+    def test_stale_lock_ignored(self, tmp_path):
+        """Test locks left by a dead emulator are ignored."""
+        lock_dir = tmp_path / "hardware-qemu.ini.lock"
+        lock_dir.mkdir()
+        (lock_dir / "pid").write_text(str(_dead_pid()))
+        (tmp_path / "multiinstance.lock").write_text("")
+
+        assert is_avd_locked(tmp_path) is False
+
+    def test_lock_symlink_to_pid(self, tmp_path):
+        """Test a lock symlink pointing at the owner's PID."""
+        os.symlink(str(tmp_path / str(os.getpid())), tmp_path / "hardware-qemu.ini.lock")
+
+        assert is_avd_locked(tmp_path) is True
+
+    def test_flocked_multiinstance_lock(self, tmp_path):
+        """Test an exclusively locked multiinstance.lock."""
+        import fcntl
+
+        lock_file = tmp_path / "multiinstance.lock"
+        lock_file.write_text("")
+        with open(lock_file) as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            assert is_avd_locked(tmp_path) is True
+        assert is_avd_locked(tmp_path) is False
+
+
+class TestEmulatorProcesses:
+    """Tests for emulator process detection."""
+
+    def test_parse_avd_argument(self):
+        """Test reading the AVD name from emulator command lines."""
+        assert parse_emulator_cmdline(["/sdk/emulator/emulator", "-avd", "Pixel_7"]) == "Pixel_7"
+        assert parse_emulator_cmdline(["qemu-system-x86_64", "-netdelay", "none", "@Tab"]) == "Tab"
+        assert parse_emulator_cmdline(["qemu-system-aarch64", "-avd=Pixel"]) == "Pixel"
+
+    def test_parse_other_processes(self):
+        """Test non-emulator processes are ignored."""
+        assert parse_emulator_cmdline(["/usr/bin/python", "-avd", "Pixel_7"]) is None
+        assert parse_emulator_cmdline([]) is None
+
+    def test_scan_proc(self, tmp_path):
+        """Test scanning a procfs tree."""
+        for pid, argv in {
+            "100": [b"qemu-system-x86_64", b"-avd", b"Pixel_7"],
+            "200": [b"bash"],
+            "self": [b"emulator", b"-avd", b"Ignored"],
+        }.items():
+            (tmp_path / pid).mkdir()
+            (tmp_path / pid / "cmdline").write_bytes(b"\0".join(argv) + b"\0")
+        (tmp_path / "300").mkdir()
+
+        assert scan_emulator_processes(tmp_path) == {"Pixel_7"}
+
+    def test_scan_without_procfs(self, tmp_path):
+        """Test a missing procfs is reported as unavailable."""
+        assert scan_emulator_processes(tmp_path / "missing") is None
+
+    def test_detect_falls_back_to_adb_without_procfs(self, tmp_path, monkeypatch):
+        """Test ADB is asked whenever /proc can't be scanned."""
+        monkeypatch.setattr(avd_module, "scan_emulator_processes", lambda: None)
+        monkeypatch.setattr(avd_module, "get_running_emulator_names", lambda: ["b", "other"])
+
+        assert detect_running_avds(tmp_path, ["a", "b"]) == {"b", "other"}
+
+    def test_detect_skips_adb_with_procfs(self, tmp_path, monkeypatch):
+        """Test ADB isn't queried when /proc answers."""
+        monkeypatch.setattr(avd_module, "scan_emulator_processes", lambda: {"a"})
+        monkeypatch.setattr(
+            avd_module, "get_running_emulator_names", lambda: pytest.fail("queried ADB")
+        )
+
+        assert detect_running_avds(tmp_path, ["a", "b"]) == {"a"}
@@ -1,13 +1,28 @@
 """Tests for cleaner module."""
 
+import os
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import replace
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from android_emulator_cleaner.core.cleaner import (
     CLEANUP_OPTIONS,
     DeviceCleaner,
+    build_delete_command,
+    cleanup_command,
     get_cleanup_options,
 )
-from android_emulator_cleaner.models import CleanupCategory, RiskLevel
+from android_emulator_cleaner.models import (
+    CleanupCategory,
+    CleanupFilter,
+    CleanupResult,
+    RiskLevel,
+)
 
 
 class TestCleanupOptions:
@@ -44,6 +59,68 @@ class TestCleanupOptions:
         assert len(low_risk) >= 1
 
 
+class TestDeleteCommand:
+    """Tests for streaming find deletions."""
+
+    def test_contents_of_globbed_directories(self):
+        """Test a trailing /* deletes directory contents through find."""
+        command = build_delete_command("/sdcard/Android/data/*/cache/*")
+        assert "for _aec_d in /sdcard/Android/data/*/cache;" in command
+        assert 'find "$_aec_d" -mindepth 1 ! -path "$_aec_d/.*" -delete' in command
+        assert "rm " not in command
+
+    def test_filters(self):
+        """Test age and size limits only select files."""
+        command = build_delete_command(
+            "/sdcard/Download/*", CleanupFilter(older_than_days=7, larger_than=10 * 1024**2)
+        )
+        assert (
+            '-mindepth 1 ! -path "$_aec_d/.*" -type f -mmin +10080 -size +10485760c -delete'
+            in command
+        )
+        assert "-type f" not in build_delete_command("/x/*", CleanupFilter())
+
+    def test_cleanup_command(self):
+        """Test only rm -rf options are rewritten."""
+        by_name = {option.name: option for option in CLEANUP_OPTIONS}
+        assert cleanup_command(by_name["All App Caches"]) == by_name["All App Caches"].command
+        assert cleanup_command(by_name["Temp Files"]).startswith("adb shell _aec_f=0; ")
+
+    @pytest.mark.skipif(
+        sys.platform == "win32" or not shutil.which("find"), reason="needs a POSIX shell and find"
+    )
+    def test_runs_in_shell(self, tmp_path):
+        """Test the command deletes what it should in a real shell."""
+        for app in ("a", "b"):
+            (tmp_path / app / "cache" / "sub").mkdir(parents=True)
+            (tmp_path / app / "cache" / "sub" / "new").write_bytes(b"x" * 100)
+            (tmp_path / app / "cache" / "old").write_bytes(b"x" * 100)
+            (tmp_path / app / "cache" / ".nomedia").write_bytes(b"")
+        (tmp_path / "a" / "cache" / ".thumbs").mkdir()
+        (tmp_path / "a" / "cache" / ".thumbs" / "t").write_bytes(b"x")
+        (tmp_path / "a" / "cache" / "sub" / ".hidden").write_bytes(b"x")
+        (tmp_path / "a" / "keep").write_bytes(b"x")
+        old = time.time() - 10 * 86400
+        os.utime(tmp_path / "a" / "cache" / "old", (old, old))
+        os.utime(tmp_path / "a" / "cache" / ".nomedia", (old, old))
+
+        path = f"{tmp_path}/*/cache/*"
+        filtered = build_delete_command(path, CleanupFilter(older_than_days=7))
+        assert subprocess.run(["sh", "-c", filtered]).returncode == 0
+        assert not (tmp_path / "a" / "cache" / "old").exists()
+        assert (tmp_path / "a" / "cache" / ".nomedia").exists()
+        assert (tmp_path / "a" / "cache" / "sub" / "new").exists()
+
+        assert subprocess.run(["sh", "-c", build_delete_command(path)]).returncode == 0
+        assert sorted(os.listdir(tmp_path / "a" / "cache")) == [".nomedia", ".thumbs"]
+        assert os.listdir(tmp_path / "a" / "cache" / ".thumbs") == ["t"]
+        assert os.listdir(tmp_path / "b" / "cache") == [".nomedia"]
+        assert (tmp_path / "a" / "keep").exists()
+
+        missing = build_delete_command(f"{tmp_path}/missing/*")
+        assert subprocess.run(["sh", "-c", missing]).returncode == 0
+
+
 class TestDeviceCleaner:
     """Tests for DeviceCleaner class."""
 
@@ -116,6 +193,135 @@ class TestDeviceCleaner:
         assert len(results) == 2
         assert all(r.success for r in results)
 
+    def test_run_all_cleanups_measured(self, mock_device, mock_cleanup_option):
+        """Test measured cleanups record the bytes each option freed."""
+        cleaner = DeviceCleaner(mock_device)
+        cleaner._root_enabled = True
+        other = replace(mock_cleanup_option, name="Temp", path="/data/local/tmp/*")
+
+        with (
+            patch.object(
+                cleaner.client, "measure_paths", side_effect=[[8192, None], [1024, 0]]
+            ) as mock_measure,
+            patch.object(
+                cleaner,
+                "run_cleanup",
+                side_effect=lambda option, _cb: CleanupResult(
+                    option=option, success=True, output=""
+                ),
+            ),
+        ):
+            results = cleaner.run_all_cleanups([mock_cleanup_option, other], measure=True)
+
+        assert mock_measure.call_count == 2
+        assert mock_measure.call_args[0][0] == ["/data/data/*/cache", "/data/local/tmp/*"]
+        assert [r.bytes_freed for r in results] == [7168, 0]
+
+    def test_run_all_cleanups_skips_empty(self, mock_device, mock_cleanup_option):
+        """Test options known to be empty are skipped and known sizes are reused."""
+        cleaner = DeviceCleaner(mock_device)
+        cleaner._root_enabled = True
+        mock_cleanup_option = replace(
+            mock_cleanup_option, command="adb shell rm -rf /data/x/*", path="/data/x/*"
+        )
+        other = replace(
+            mock_cleanup_option,
+            name="Temp",
+            command="adb shell rm -rf /data/local/tmp/*",
+            path="/data/local/tmp/*",
+        )
+
+        with (
+            patch.object(cleaner.client, "measure_paths", return_value=[0, 1024]) as mock_measure,
+            patch.object(
+                cleaner,
+                "run_cleanup",
+                side_effect=lambda option, _cb: CleanupResult(
+                    option=option, success=True, output=""
+                ),
+            ) as mock_run,
+        ):
+            results = cleaner.run_all_cleanups(
+                [mock_cleanup_option, other], measure=True, sizes=[0, 4096]
+            )
+
+        assert [call.args[0].name for call in mock_run.call_args_list] == ["Temp"]
+        assert mock_measure.call_count == 1  # only the "after" measurement
+        assert [r.option.name for r in results] == ["Test Cache", "Temp"]
+        assert results[0].success is True
+        assert "skipped" in results[0].output
+        assert [r.bytes_freed for r in results] == [0, 3072]
+
+    def test_app_caches_never_skipped(self, mock_device):
+        """Test pm trim-caches runs even when its path measures as empty."""
+        cleaner = DeviceCleaner(mock_device)
+        cleaner._root_enabled = True
+        option = CLEANUP_OPTIONS[0]
+        assert option.command.startswith("adb shell pm trim-caches")
+
+        with (
+            patch.object(cleaner.client, "measure_paths", return_value=[0]),
+            patch.object(cleaner.client, "run_command", return_value=(True, "")) as mock_run,
+        ):
+            results = cleaner.run_all_cleanups([option], measure=True)
+            cleaner.run_all_cleanups([option], measure=True, sizes=[0])
+
+        assert mock_run.call_count == 2
+        assert mock_run.call_args[0][0] == option.command
+        assert "skipped" not in results[0].output
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+    def test_skips_real_empty_directory(self, mock_device, tmp_path):
+        """Test an emptied directory measures 0 through its glob and is skipped."""
+        cleaner = DeviceCleaner(mock_device)
+        cleaner._root_enabled = True
+        target = tmp_path / "Download"
+        target.mkdir()
+        (target / ".nomedia").write_bytes(b"")
+        option = replace(
+            next(o for o in CLEANUP_OPTIONS if o.name == "Downloads"),
+            path=f"{target}/*",
+            command=f"adb shell rm -rf {target}/*",
+        )
+
+        def run_script(script, **_kwargs):
+            proc = subprocess.run(["sh", "-c", script], capture_output=True, text=True)
+            return proc.returncode == 0, proc.stdout
+
+        with (
+            patch.object(cleaner.client, "run_script", side_effect=run_script),
+            patch.object(cleaner.client, "run_command") as mock_run,
+        ):
+            assert cleaner.measure_options([option]) == [0]
+            results = cleaner.run_all_cleanups([option], measure=True)
+
+        mock_run.assert_not_called()
+        assert "skipped" in results[0].output
+
+    def test_measure_options_keeps_adbd(self, mock_device):
+        """Test measuring never switches adbd to root."""
+        cleaner = DeviceCleaner(mock_device)
+
+        with (
+            patch.object(cleaner.client, "enable_root") as mock_root,
+            patch.object(cleaner.client, "measure_paths", return_value=[None]),
+        ):
+            assert cleaner.measure_options([CLEANUP_OPTIONS[0]]) == [None]
+
+        mock_root.assert_not_called()
+
+    def test_run_cleanup_uses_find(self, mock_device, mock_subprocess_success):
+        """Test path deletions reach adb as find commands with the cleaner's filters."""
+        cleaner = DeviceCleaner(mock_device, CleanupFilter(larger_than=1024))
+        option = next(o for o in CLEANUP_OPTIONS if o.name == "Downloads")
+
+        with patch("subprocess.run", return_value=mock_subprocess_success) as mock_run:
+            cleaner.run_cleanup(option)
+
+        args = mock_run.call_args[0][0]
+        assert args[3] == "shell"
+        assert "find" in args and "+1024c" in args
+
     def test_get_installed_apps(self, mock_device):
         """Test getting installed apps."""
         cleaner = DeviceCleaner(mock_device)
@@ -132,6 +338,30 @@ class TestDeviceCleaner:
         assert apps[0]["package"] == "com.example.app1"
         assert apps[0]["name"] == "app1"
 
+    def test_get_installed_apps_by_size(self, mock_device):
+        """Test apps are sorted by diskstats size and diskstats is read once per device."""
+        diskstats = (
+            'Package Names: ["com.small","com.big","com.other"]\n'
+            "App Sizes: [10,5000,1]\nApp Data Sizes: [0,0,0]\nCache Sizes: [0,0,0]\n"
+        )
+
+        def fake_shell(command, **_kwargs):
+            if command.startswith("dumpsys diskstats"):
+                return True, diskstats
+            return True, "package:com.big\npackage:com.small\npackage:com.unknown\n"
+
+        with patch(
+            "android_emulator_cleaner.core.adb.ADBClient.shell", side_effect=fake_shell
+        ) as mock_shell:
+            apps = DeviceCleaner(mock_device).get_installed_apps()
+            DeviceCleaner(mock_device).get_installed_apps()
+
+        assert [app["package"] for app in apps] == ["com.big", "com.small", "com.unknown"]
+        assert apps[0]["storage"].total == 5000
+        assert apps[2]["storage"] is None
+        diskstats_calls = [c for c in mock_shell.call_args_list if "diskstats" in c.args[0]]
+        assert len(diskstats_calls) == 1
+
     def test_uninstall_app_success(self, mock_device, mock_subprocess_success):
         """Test successful app uninstallation."""
         cleaner = DeviceCleaner(mock_device)
@@ -142,13 +372,100 @@ class TestDeviceCleaner:
         assert result.success is True
         assert result.package == "com.example.app"
 
-    def test_uninstall_apps_multiple(self, mock_device, mock_subprocess_success):
-        """Test uninstalling multiple apps."""
+    def test_uninstall_apps_multiple(self, mock_device, fake_run_script):
+        """Test uninstalling multiple apps in one shell invocation."""
         cleaner = DeviceCleaner(mock_device)
         packages = ["com.example.app1", "com.example.app2"]
 
-        with patch("subprocess.run", return_value=mock_subprocess_success):
+        with patch.object(cleaner.client, "run_script", side_effect=fake_run_script) as mock_script:
             results = cleaner.uninstall_apps(packages)
 
         assert len(results) == 2
         assert all(r.success for r in results)
+        assert mock_script.call_count == 1
+
+    def test_uninstall_apps_keep_data_and_failures(self, mock_device):
+        """Test -k is passed and pm failures are reported per package."""
+        cleaner = DeviceCleaner(mock_device)
+
+        def fake_script(script, **_kwargs):
+            marker = script.split('"', 2)[1].rsplit(":BEGIN:", 1)[0]
+            return True, (
+                f"{marker}:BEGIN:0\nSuccess\n\n{marker}:END:0:0:1:2\n"
+                f"{marker}:BEGIN:1\nFailure [DELETE_FAILED_INTERNAL_ERROR]\n\n"
+                f"{marker}:END:1:0:1:2\n"
+            )
+
+        with patch.object(cleaner.client, "run_script", side_effect=fake_script) as mock_script:
+            results = cleaner.uninstall_apps(["com.a", "com.b"], keep_data=True)
+
+        assert "pm uninstall -k com.a" in mock_script.call_args[0][0]
+        assert [r.success for r in results] == [True, False]
+        assert "DELETE_FAILED" in results[1].output
+
+    def test_enable_root_once(self, mock_device, mock_subprocess_success):
+        """Test adb root is only issued once per cleaner."""
+        cleaner = DeviceCleaner(mock_device)
+
+        with patch("subprocess.run", return_value=mock_subprocess_success) as mock_run:
+            cleaner.enable_root()
+            cleaner.enable_root()
+
+        assert mock_run.call_count == 1
+
+    def test_context_enables_root_before_session(self, mock_device):
+        """Test the session is opened after adbd restarts as root."""
+        cleaner = DeviceCleaner(mock_device)
+        calls = MagicMock()
+        calls.enable_root.return_value = True
+
+        with (
+            patch.object(cleaner.client, "enable_root", calls.enable_root),
+            patch.object(cleaner.client, "open_session", calls.open_session),
+            patch.object(cleaner.client, "close_session", calls.close_session),
+            cleaner,
+        ):
+            pass
+
+        assert [call[0] for call in calls.mock_calls] == [
+            "enable_root",
+            "open_session",
+            "close_session",
+        ]
+
+    def test_enable_root_reopens_session(self, mock_device):
+        """Test enabling root after the session is open starts a new session."""
+        cleaner = DeviceCleaner(mock_device)
+        cleaner.client.session = MagicMock()
+
+        with (
+            patch.object(cleaner.client, "enable_root", return_value=True),
+            patch.object(cleaner.client, "open_session") as mock_open,
+            patch.object(cleaner.client, "close_session") as mock_close,
+        ):
+            assert cleaner.enable_root() is True
+
+        mock_close.assert_called_once()
+        mock_open.assert_called_once()
+
+    def test_run_fused_cleanups(self, mock_device, mock_cleanup_option):
+        """Test fused cleanups run one script and fill every result."""
+        cleaner = DeviceCleaner(mock_device)
+        cleaner._root_enabled = True
+        failing = replace(mock_cleanup_option, name="Temp", command="adb shell rm -rf /x/*")
+
+        def fake_script(script, **_kwargs):
+            marker = script.split(":BEGIN:")[0].split('"')[-1]
+            return True, (
+                f"{marker}:BEGIN:0\n\n{marker}:END:0:0:1:2\n"
+                f"{marker}:BEGIN:1\nrm: denied\n\n{marker}:END:1:1:1:2\n"
+            )
+
+        with patch.object(cleaner.client, "run_script", side_effect=fake_script) as mock_script:
+            results = cleaner.run_all_cleanups([mock_cleanup_option, failing], fused=True)
+
+        assert mock_script.call_count == 1
+        assert [r.option.name for r in results] == ["Test Cache", "Temp"]
+        assert results[0].success is True
+        assert results[1].success is False
+        assert results[1].output == "rm: denied"
@@ -0,0 +1,249 @@
+"""Tests for content deduplication module."""
+
+import errno
+import os
+import shutil
+import sys
+
+import pytest
+
+from android_emulator_cleaner.core import avd as avd_module
+from android_emulator_cleaner.core import dedupe as dedupe_module
+from android_emulator_cleaner.core.dedupe import (
+    FICLONE,
+    HASH_CHUNK,
+    dedupe_files,
+    find_duplicates,
+    hash_file,
+    reflink_file,
+    same_content,
+    shares_extents,
+)
+
+SIZE = HASH_CHUNK + 4096
+
+
+def _fake_clone(fd: int, request: int, src_fd: int) -> int:
+    """Stand-in for the FICLONE ioctl that copies the data."""
+    if request != FICLONE:
+        raise OSError(errno.ENOTTY, "Inappropriate ioctl for device")
+    with os.fdopen(os.dup(src_fd), "rb") as src, os.fdopen(os.dup(fd), "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return 0
+
+
+@pytest.fixture
+def avd_tree(tmp_path):
+    """Two AVDs sharing an identical image, plus near-duplicates."""
+    payload = os.urandom(SIZE)
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.avd").mkdir()
+        (tmp_path / f"{name}.avd" / "sdcard.img").write_bytes(payload)
+    # Same size and first chunk, different tail
+    (tmp_path / "a.avd" / "tail.img").write_bytes(payload[:-1] + bytes([payload[-1] ^ 1]))
+    # Same size, different first chunk
+    (tmp_path / "b.avd" / "head.img").write_bytes(bytes([payload[0] ^ 1]) + payload[1:])
+    # Hardlink of an existing copy
+    os.link(tmp_path / "a.avd" / "sdcard.img", tmp_path / "a.avd" / "link.img")
+    return tmp_path
+
+
+class TestHashFile:
+    """Tests for hash_file function."""
+
+    def test_limit(self, tmp_path):
+        """Test a limited hash only covers the leading bytes."""
+        (tmp_path / "x").write_bytes(b"a" * 10 + b"b")
+        (tmp_path / "y").write_bytes(b"a" * 10 + b"c")
+
+        assert hash_file(str(tmp_path / "x"), 10) == hash_file(str(tmp_path / "y"), 10)
+        assert hash_file(str(tmp_path / "x")) != hash_file(str(tmp_path / "y"))
+        assert hash_file(str(tmp_path / "missing")) is None
+
+
+class TestFindDuplicates:
+    """Tests for find_duplicates function."""
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX hardlinks")
+    def test_groups_identical_files(self, avd_tree):
+        """Test only byte-identical files are grouped, hardlinks counted once."""
+        groups = find_duplicates([str(avd_tree / "a.avd"), str(avd_tree / "b.avd")], max_workers=1)
+
+        assert len(groups) == 1
+        assert [os.path.basename(os.path.dirname(p)) for p in groups[0]] == ["a.avd", "b.avd"]
+        assert all(p.endswith(".img") and "tail" not in p and "head" not in p for p in groups[0])
+
+    def test_process_pool(self, avd_tree):
+        """Test hashing in a process pool finds the same groups."""
+        roots = [str(avd_tree / "a.avd"), str(avd_tree / "b.avd")]
+        assert find_duplicates(roots, max_workers=2) == find_duplicates(roots, max_workers=1)
+
+    def test_min_size(self, avd_tree):
+        """Test files below the minimum size are ignored."""
+        roots = [str(avd_tree / "a.avd"), str(avd_tree / "b.avd")]
+        assert find_duplicates(roots, min_size=SIZE + 1, max_workers=1) == []
+
+
+class TestDedupeFiles:
+    """Tests for dedupe_files function."""
+
+    def test_dry_run(self, avd_tree):
+        """Test a dry run reports shareable bytes without touching files."""
+        target = avd_tree / "b.avd" / "sdcard.img"
+        inode = target.stat().st_ino
+
+        result = dedupe_files([str(avd_tree)], dry_run=True, max_workers=1)
+
+        assert result.dry_run is True
+        assert (result.groups, result.files, result.shared_bytes) == (1, 1, SIZE)
+        assert target.stat().st_ino == inode
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="FICLONE is Linux only")
+    def test_replaces_duplicates(self, avd_tree, monkeypatch):
+        """Test duplicates are replaced with clones that keep mode and mtime."""
+        import fcntl
+
+        monkeypatch.setattr(fcntl, "ioctl", _fake_clone)
+        target = avd_tree / "b.avd" / "sdcard.img"
+        os.chmod(target, 0o640)
+        os.utime(target, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+        data = target.read_bytes()
+        inode = target.stat().st_ino
+
+        result = dedupe_files([str(avd_tree)], max_workers=1)
+
+        assert result.success is True
+        assert result.shared_bytes == SIZE
+        st = target.stat()
+        assert st.st_ino != inode
+        assert st.st_mode & 0o777 == 0o640
+        assert st.st_mtime_ns == 1_600_000_000_000_000_000
+        assert target.read_bytes() == data
+        assert not [p for p in os.listdir(target.parent) if p.endswith(".tmp")]
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="FICLONE is Linux only")
+    def test_unsupported_filesystem(self, avd_tree, monkeypatch):
+        """Test the pass stops cleanly when the filesystem can't reflink."""
+        import fcntl
+
+        def refuse(*_):
+            raise OSError(95, "Operation not supported")
+
+        monkeypatch.setattr(fcntl, "ioctl", refuse)
+        target = avd_tree / "b.avd" / "sdcard.img"
+        data = target.read_bytes()
+
+        result = dedupe_files([str(avd_tree)], max_workers=1)
+
+        assert result.success is False
+        assert result.shared_bytes == 0
+        assert target.read_bytes() == data
+        assert not [p for p in os.listdir(target.parent) if p.endswith(".tmp")]
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="FICLONE is Linux only")
+    def test_changed_target_kept(self, tmp_path, monkeypatch):
+        """Test a target that no longer matches the source is left alone."""
+        import fcntl
+
+        monkeypatch.setattr(fcntl, "ioctl", _fake_clone)
+        (tmp_path / "src").write_bytes(b"a" * 100)
+        (tmp_path / "dst").write_bytes(b"b" * 100)
+
+        with pytest.raises(OSError, match="changed"):
+            reflink_file(str(tmp_path / "src"), str(tmp_path / "dst"))
+        assert (tmp_path / "dst").read_bytes() == b"b" * 100
+        assert sorted(os.listdir(tmp_path)) == ["dst", "src"]
+
+    def test_skips_already_shared(self, avd_tree, monkeypatch):
+        """Test files that already share their extents are not cloned again."""
+        monkeypatch.setattr(dedupe_module, "shares_extents", lambda *_: True)
+
+        result = dedupe_files([str(avd_tree)], dry_run=True, max_workers=1)
+
+        assert (result.groups, result.files, result.shared_bytes) == (0, 0, 0)
+
+    @pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="needs root to chown")
+    def test_keeps_owner_and_xattrs(self, tmp_path, monkeypatch):
+        """Test the clone gets the target's owner and extended attributes."""
+        import fcntl
+
+        monkeypatch.setattr(fcntl, "ioctl", _fake_clone)
+        (tmp_path / "src").write_bytes(b"a" * 100)
+        target = tmp_path / "dst"
+        target.write_bytes(b"a" * 100)
+        os.chown(target, 1234, 1234)
+        try:
+            os.setxattr(target, "user.origin", b"pixel")
+        except OSError:
+            pytest.skip("filesystem without user xattrs")
+
+        reflink_file(str(tmp_path / "src"), str(target))
+
+        st = target.stat()
+        assert (st.st_uid, st.st_gid) == (1234, 1234)
+        assert os.getxattr(target, "user.origin") == b"pixel"
+
+    @pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="needs root to chown")
+    def test_skips_when_owner_cant_be_kept(self, avd_tree, monkeypatch):
+        """Test a file is skipped if the clone can't take its owner."""
+        import fcntl
+
+        monkeypatch.setattr(fcntl, "ioctl", _fake_clone)
+        target = avd_tree / "b.avd" / "sdcard.img"
+        os.chown(target, 1234, 1234)
+        inode = target.stat().st_ino
+
+        def refuse(*_):
+            raise PermissionError(errno.EPERM, "Operation not permitted")
+
+        monkeypatch.setattr(os, "chown", refuse)
+
+        result = dedupe_files([str(avd_tree)], max_workers=1)
+
+        assert result.files == 0
+        assert "owner" in result.errors[0]
+        assert target.stat().st_ino == inode
+        assert not [p for p in os.listdir(target.parent) if p.endswith(".tmp")]
+
+
+class TestSharesExtents:
+    """Tests for shares_extents function."""
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="FIEMAP is Linux only")
+    def test_copies_do_not_share(self, tmp_path):
+        """Test a file shares its own extents but not a copy's."""
+        data = os.urandom(64 * 1024)
+        (tmp_path / "a").write_bytes(data)
+        (tmp_path / "b").write_bytes(data)
+        if not shares_extents(str(tmp_path / "a"), str(tmp_path / "a")):
+            pytest.skip("filesystem without FIEMAP")
+
+        assert shares_extents(str(tmp_path / "a"), str(tmp_path / "b")) is False
+
+
+class TestSameContent:
+    """Tests for same_content function."""
+
+    def test_compares_bytes(self, tmp_path):
+        """Test files are equal only with identical bytes and length."""
+        (tmp_path / "a").write_bytes(b"xyz")
+        (tmp_path / "b").write_bytes(b"xyz")
+        (tmp_path / "c").write_bytes(b"xyz!")
+
+        assert same_content(str(tmp_path / "a"), str(tmp_path / "b")) is True
+        assert same_content(str(tmp_path / "a"), str(tmp_path / "c")) is False
+
+
+class TestDedupeAVDHome:
+    """Tests for dedupe_avd_home function."""
+
+    def test_skips_running_avds(self, avd_tree, monkeypatch):
+        """Test files of running AVDs are not considered."""
+        for name in ("a", "b"):
+            (avd_tree / f"{name}.ini").write_text("")
+        monkeypatch.setattr(avd_module, "get_avd_home", lambda: avd_tree)
+        monkeypatch.setattr(avd_module, "detect_running_avds", lambda *_: {"b"})
+
+        result = avd_module.dedupe_avd_home(dry_run=True, max_workers=1)
+
+        assert result.files == 0
@@ -0,0 +1,165 @@
+"""Tests for deletion engine module."""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from android_emulator_cleaner.core import delete
+from android_emulator_cleaner.core.delete import DeletionEngine, FilesystemLimiter, remove_path
+from android_emulator_cleaner.core.usage import disk_usage
+
+
+def _make_tree(root, files: int = 3, size: int = 4096) -> None:
+    (root / "a" / "b").mkdir(parents=True)
+    for i in range(files):
+        (root / f"top{i}.bin").write_bytes(b"x" * size)
+        (root / "a" / f"mid{i}.bin").write_bytes(b"y" * size)
+        (root / "a" / "b" / f"deep{i}.bin").write_bytes(b"z" * size)
+
+
+class TestRemovePath:
+    """Tests for remove_path function."""
+
+    def test_removes_tree(self, tmp_path):
+        """Test a nested tree is removed and its allocated bytes reported."""
+        tree = tmp_path / "tree"
+        _make_tree(tree)
+        expected = disk_usage(str(tree)).allocated
+
+        result = remove_path(str(tree))
+
+        assert result.success is True
+        assert result.files_removed == 9
+        assert result.bytes_freed == expected
+        assert not tree.exists()
+
+    def test_removes_file(self, tmp_path):
+        """Test a single file is removed."""
+        target = tmp_path / "cache.img"
+        target.write_bytes(b"x" * 100)
+
+        result = remove_path(str(target))
+
+        assert result.files_removed == 1
+        assert not target.exists()
+
+    def test_missing_path(self, tmp_path):
+        """Test a missing path is an empty, successful result."""
+        result = remove_path(str(tmp_path / "missing"))
+        assert result.success is True
+        assert result.files_removed == 0
+        assert result.bytes_freed == 0
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="Symlinks need privileges on Windows")
+    def test_symlinks_not_followed(self, tmp_path):
+        """Test symlinked directories are unlinked, not emptied."""
+        outside = tmp_path / "outside"
+        outside.mkdir()
+        (outside / "keep.bin").write_bytes(b"x" * 100)
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        (tree / "link").symlink_to(outside, target_is_directory=True)
+
+        result = remove_path(str(tree))
+
+        assert result.success is True
+        assert not tree.exists()
+        assert (outside / "keep.bin").exists()
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX hardlink counts")
+    def test_hardlinks_free_nothing(self, tmp_path):
+        """Test files with other links don't count as freed."""
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        (tree / "data.bin").write_bytes(b"x" * 8192)
+        os.link(tree / "data.bin", tmp_path / "other.bin")
+
+        result = remove_path(str(tree))
+
+        assert result.files_removed == 1
+        assert result.bytes_freed == 0
+        assert (tmp_path / "other.bin").exists()
+
+    def test_errors_are_collected(self, tmp_path, monkeypatch):
+        """Test failed unlinks are reported and the rest still removed."""
+        tree = tmp_path / "tree"
+        _make_tree(tree, files=1)
+        real_unlink = delete._unlink
+
+        def failing_unlink(parent, name):
+            if name == "mid0.bin":
+                raise OSError("busy")
+            real_unlink(parent, name)
+
+        monkeypatch.setattr(delete, "_unlink", failing_unlink)
+        result = remove_path(str(tree))
+
+        assert result.success is False
+        assert any("mid0.bin" in error for error in result.errors)
+        assert result.files_removed == 2
+        assert (tree / "a" / "mid0.bin").exists()
+
+
+class TestDeletionEngine:
+    """Tests for DeletionEngine class."""
+
+    def test_deletes_paths_in_parallel(self, tmp_path):
+        """Test several trees are removed with progress on the caller thread."""
+        paths = []
+        for i in range(4):
+            tree = tmp_path / f"tree{i}"
+            _make_tree(tree, files=2)
+            paths.append(str(tree))
+        expected = sum(disk_usage(path).allocated for path in paths)
+
+        threads = set()
+        freed = []
+
+        def on_progress(_path, result):
+            threads.add(threading.get_ident())
+            freed.append(result.bytes_freed)
+
+        result = DeletionEngine(max_workers=4).delete(paths, on_progress)
+
+        assert result.success is True
+        assert result.files_removed == 24
+        assert result.bytes_freed == expected == sum(freed)
+        assert threads == {threading.get_ident()}
+        assert not any(os.path.exists(path) for path in paths)
+
+    def test_empty(self):
+        """Test deleting nothing is a no-op."""
+        result = DeletionEngine().delete([])
+        assert result.success is True
+        assert result.files_removed == 0
+
+
+class TestFilesystemLimiter:
+    """Tests for FilesystemLimiter class."""
+
+    def test_limits_per_device(self):
+        """Test at most the configured number of slots run per filesystem."""
+        limiter = FilesystemLimiter(per_filesystem=2)
+        active = {1: 0, 2: 0}
+        peak = {1: 0, 2: 0}
+        lock = threading.Lock()
+
+        def work(device):
+            with limiter.slot(device):
+                with lock:
+                    active[device] += 1
+                    peak[device] = max(peak[device], active[device])
+                time.sleep(0.02)
+                with lock:
+                    active[device] -= 1
+
+        threads = [threading.Thread(target=work, args=(i % 2 + 1,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert peak == {1: 2, 2: 2}
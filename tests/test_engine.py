@@ -0,0 +1,155 @@
+"""Tests for concurrent cleanup engine."""
+
+import threading
+from dataclasses import replace
+from unittest.mock import patch
+
+from android_emulator_cleaner.core.adb import ADBClient
+from android_emulator_cleaner.core.cleaner import DeviceCleaner
+from android_emulator_cleaner.core.engine import CleanupEngine
+from android_emulator_cleaner.core.session import DeviceSession
+from android_emulator_cleaner.models import ReclaimEstimate, StorageInfo, StorageSnapshot
+
+
+class TestCleanupEngine:
+    """Tests for CleanupEngine class."""
+
+    def test_empty_device_list(self):
+        """Test running with no devices."""
+        assert CleanupEngine().run([], []) == []
+
+    def test_run_multiple_devices(
+        self, mock_device, mock_cleanup_option, mock_subprocess_success, fake_run_script
+    ):
+        """Test every device gets a summary, in input order."""
+        devices = [replace(mock_device, device_id=f"emulator-{5554 + i * 2}") for i in range(4)]
+
+        with (
+            patch.object(DeviceSession, "open", return_value=False),
+            patch("subprocess.run", return_value=mock_subprocess_success),
+            patch.object(ADBClient, "run_script", side_effect=fake_run_script),
+        ):
+            summaries = CleanupEngine(max_workers=2).run(
+                devices,
+                [mock_cleanup_option],
+                {"emulator-5556": ["com.example.app"]},
+            )
+
+        assert [s.device.device_id for s in summaries] == [d.device_id for d in devices]
+        assert all(s.successful_cleanups == 1 for s in summaries)
+        assert summaries[1].successful_uninstalls == 1
+        assert summaries[0].uninstall_results == []
+        assert all(s.storage_before is not None for s in summaries)
+
+    def test_progress_consumed_on_calling_thread(
+        self, mock_device, mock_cleanup_option, mock_subprocess_success
+    ):
+        """Test progress callbacks run on the caller's thread and add up."""
+        devices = [replace(mock_device, device_id=f"emulator-{5554 + i * 2}") for i in range(3)]
+        caller = threading.current_thread()
+        threads = set()
+        advanced = []
+
+        def on_progress(event):
+            threads.add(threading.current_thread())
+            advanced.append(event.advance)
+
+        with (
+            patch.object(DeviceSession, "open", return_value=False),
+            patch("subprocess.run", return_value=mock_subprocess_success),
+        ):
+            CleanupEngine(max_workers=3).run(
+                devices, [mock_cleanup_option, mock_cleanup_option], on_progress=on_progress
+            )
+
+        assert threads == {caller}
+        assert sum(advanced) == 6
+
+    def test_reuses_probed_storage(self, mock_device, mock_cleanup_option, fake_run_script):
+        """Test a device probed up front isn't probed again before cleaning."""
+        devices = [replace(mock_device, device_id=f"emulator-{5554 + i * 2}") for i in range(2)]
+        probed = StorageSnapshot({"/data": StorageInfo(available=42)})
+
+        with (
+            patch.object(DeviceSession, "open", return_value=False),
+            patch.object(ADBClient, "run_script", side_effect=fake_run_script),
+            patch.object(
+                ADBClient, "get_storage_snapshot", return_value=StorageSnapshot()
+            ) as get_storage,
+        ):
+            summaries = CleanupEngine(max_workers=2, fused=True).run(
+                devices, [mock_cleanup_option], storage_before={"emulator-5554": probed}
+            )
+
+        assert summaries[0].storage_before is probed
+        assert summaries[1].storage_before == StorageSnapshot()
+        # One "before" probe for the second device, one "after" probe each
+        assert get_storage.call_count == 3
+
+    def test_estimate(self, mock_device, mock_cleanup_option):
+        """Test every device is sized once, results in input order."""
+        devices = [replace(mock_device, device_id=f"emulator-{5554 + i * 2}") for i in range(3)]
+        finished = []
+
+        def measure_options(self, options):
+            return [int(self.device.device_id[-4:])] * len(options)
+
+        with patch.object(DeviceCleaner, "measure_options", measure_options):
+            estimates = CleanupEngine(max_workers=3).estimate(
+                devices, [mock_cleanup_option], on_progress=lambda e: finished.append(e.device_id)
+            )
+
+        assert [e.sizes for e in estimates] == [[5554], [5556], [5558]]
+        assert [e.device.device_id for e in estimates] == [d.device_id for d in devices]
+        assert sorted(finished) == [d.device_id for d in devices]
+
+    def test_run_skips_estimated_empty(self, mock_device, mock_cleanup_option):
+        """Test estimated sizes reach the device's cleanup run."""
+        other = replace(mock_cleanup_option, name="Temp")
+        estimate = ReclaimEstimate(mock_device, [mock_cleanup_option, other], [0, 2048])
+
+        with (
+            patch.object(DeviceSession, "open", return_value=False),
+            patch.object(ADBClient, "get_storage_snapshot", return_value=StorageSnapshot()),
+            patch.object(DeviceCleaner, "run_all_cleanups", return_value=[]) as run_all,
+        ):
+            CleanupEngine().run(
+                [mock_device],
+                [mock_cleanup_option, other],
+                estimates={mock_device.device_id: estimate},
+            )
+
+        assert run_all.call_args.kwargs["sizes"] == [0, 2048]
+
+    def test_device_failure_is_recorded(self, mock_device, mock_cleanup_option):
+        """Test one device raising doesn't discard the other devices' summaries."""
+        devices = [replace(mock_device, device_id=f"emulator-{5554 + i * 2}") for i in range(2)]
+        finished = []
+
+        def snapshot(self):
+            if self.device_id == "emulator-5554":
+                raise ConnectionResetError("device went away")
+            return StorageSnapshot()
+
+        with (
+            patch.object(DeviceSession, "open", return_value=False),
+            patch.object(ADBClient, "get_storage_snapshot", snapshot),
+            patch.object(DeviceCleaner, "run_all_cleanups", return_value=[]),
+        ):
+            summaries = CleanupEngine(max_workers=2).run(
+                devices,
+                [mock_cleanup_option],
+                on_progress=lambda e: e.finished and finished.append(e.device_id),
+            )
+
+        assert [s.error for s in summaries] == ["device went away", ""]
+        assert summaries[0].storage_before is None
+        assert summaries[1].storage_after == StorageSnapshot()
+        assert sorted(finished) == [d.device_id for d in devices]
+
+    def test_estimate_failure_is_unknown(self, mock_device, mock_cleanup_option):
+        """Test a device that can't be measured gets unknown sizes."""
+        with patch.object(DeviceCleaner, "measure_options", side_effect=OSError("boom")):
+            estimates = CleanupEngine().estimate([mock_device], [mock_cleanup_option])
+
+        assert estimates[0].sizes == [None]
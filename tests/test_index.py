@@ -0,0 +1,110 @@
+"""Tests for AVD size index module."""
+
+import os
+
+from android_emulator_cleaner.core.avd import get_dir_size
+from android_emulator_cleaner.core.index import SizeIndex, default_index_path
+
+
+def _make_tree(root):
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "top.bin").write_bytes(b"x" * 10)
+    (root / "a" / "mid.bin").write_bytes(b"y" * 20)
+    (root / "a" / "b" / "leaf.bin").write_bytes(b"z" * 30)
+    return root
+
+
+class TestSizeIndex:
+    """Tests for SizeIndex class."""
+
+    def test_default_path_uses_cache_home(self, tmp_path, monkeypatch):
+        """Test the index lives under $XDG_CACHE_HOME."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        assert default_index_path() == tmp_path / "android-emulator-cleaner" / "avd-sizes.json"
+
+    def test_matches_dir_size(self, tmp_path):
+        """Test indexed sizes match the plain walk."""
+        tree = _make_tree(tmp_path / "tree")
+        index = SizeIndex(tmp_path / "index.json")
+
+        assert index.dir_size(str(tree)) == get_dir_size(str(tree)) == 60
+
+    def test_reuses_unchanged_directories(self, tmp_path, monkeypatch):
+        """Test a saved index answers without listing unchanged directories."""
+        tree = _make_tree(tmp_path / "tree")
+        index_path = tmp_path / "index.json"
+        first = SizeIndex(index_path)
+        first.dir_size(str(tree))
+        assert first.save() is True
+
+        second = SizeIndex.load(index_path)
+        calls = []
+        real_scandir = os.scandir
+
+        def counting_scandir(path):
+            calls.append(path)
+            return real_scandir(path)
+
+        monkeypatch.setattr(os, "scandir", counting_scandir)
+        assert second.dir_size(str(tree)) == 60
+        assert calls == []
+
+    def test_rescans_changed_directories(self, tmp_path):
+        """Test adding a file invalidates only its directory."""
+        tree = _make_tree(tmp_path / "tree")
+        index_path = tmp_path / "index.json"
+        first = SizeIndex(index_path)
+        first.dir_size(str(tree))
+        first.save()
+
+        (tree / "a" / "b" / "new.bin").write_bytes(b"n" * 5)
+        stat = os.stat(tree / "a" / "b")
+        os.utime(tree / "a" / "b", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert SizeIndex.load(index_path).dir_size(str(tree)) == 65
+
+    def test_invalidate_if_modified(self, tmp_path):
+        """Test roots modified after their scan are dropped."""
+        tree = _make_tree(tmp_path / "tree")
+        index = SizeIndex(tmp_path / "index.json")
+        index.dir_size(str(tree))
+        index.mark_scanned(str(tree), 1000)
+
+        assert index.invalidate_if_modified(str(tree), 999) is False
+        assert index.invalidate_if_modified(str(tree), 1000) is True
+        assert index.invalidate_if_modified(str(tmp_path / "unknown"), 0) is True
+
+    def test_keeps_hardlinks_deduplicated(self, tmp_path):
+        """Test cached directories still count hardlinked files once."""
+        tree = _make_tree(tmp_path / "tree")
+        os.link(tree / "a" / "mid.bin", tree / "a" / "b" / "mid-link.bin")
+        index_path = tmp_path / "index.json"
+        first = SizeIndex(index_path)
+        first.dir_size(str(tree))
+        first.save()
+
+        assert SizeIndex.load(index_path).dir_size(str(tree)) == 60
+
+    def test_corrupt_index_is_rebuilt(self, tmp_path):
+        """Test a corrupt index loads empty and is replaced on save."""
+        tree = _make_tree(tmp_path / "tree")
+        index_path = tmp_path / "index.json"
+
+        for payload in ("{not json", '{"version": 2, "entries": []}', '{"version": 1}', "[]"):
+            index_path.write_text(payload)
+            index = SizeIndex.load(index_path)
+            assert index.dir_size(str(tree)) == 60
+            assert index.save() is True
+
+        reloaded = SizeIndex.load(index_path)
+        assert reloaded._entries
+
+    def test_bad_entries_dropped(self, tmp_path):
+        """Test malformed entries are ignored individually."""
+        index_path = tmp_path / "index.json"
+        index_path.write_text(
+            '{"version": 2, "entries": {"/x": {"ino": "1"}, '
+            '"/y": {"ino": 1, "mtime": 2, "files": 3, "blocks": 8, "links": [], "dirs": []}}}'
+        )
+
+        assert list(SizeIndex.load(index_path)._entries) == ["/y"]
@@ -5,9 +5,12 @@ from android_emulator_cleaner.models import (
     CleanupOption,
     CleanupResult,
     DeviceCleanupSummary,
+    ReclaimEstimate,
     RiskLevel,
     StorageInfo,
+    StorageSnapshot,
     UninstallResult,
+    parse_size,
 )
 
 
@@ -54,7 +57,17 @@ class TestAVD:
         display = mock_avd.display_name
         assert "💾" in display
         assert mock_avd.name in display
-        assert mock_avd.total_size in display
+        assert mock_avd.total_size_text in display
+
+    def test_size_text(self, mock_avd):
+        """Test sizes are stored as bytes and formatted on demand."""
+        assert mock_avd.cache_size == 512 * 1024 * 1024
+        assert mock_avd.cache_size_text == "512.0MB"
+        assert mock_avd.total_size_text == "8.5GB"
+
+    def test_slots(self, mock_avd):
+        """Test models don't carry a per-instance __dict__."""
+        assert not hasattr(mock_avd, "__dict__")
 
 
 class TestCleanupOption:
@@ -114,25 +127,123 @@ class TestStorageInfo:
     def test_default_values(self):
         """Test default values."""
         info = StorageInfo()
-        assert info.total == "N/A"
-        assert info.used == "N/A"
-        assert info.available == "N/A"
-        assert info.use_percent == "N/A"
+        assert info.total is None
+        assert info.available is None
+        assert info.total_text == "N/A"
+        assert info.used_text == "N/A"
+        assert info.available_text == "N/A"
+        assert info.use_percent_text == "N/A"
 
     def test_from_df_output_valid(self):
         """Test parsing valid df output."""
         output = """Filesystem      Size  Used Avail Use% Mounted on
 /dev/block/dm-5  64G   32G   32G  50% /data"""
         info = StorageInfo.from_df_output(output)
-        assert info.total == "64G"
-        assert info.used == "32G"
-        assert info.available == "32G"
-        assert info.use_percent == "50%"
+        assert info.total == 64 * 1024**3
+        assert info.used == 32 * 1024**3
+        assert info.available == 32 * 1024**3
+        assert info.use_percent == 50
+        assert info.available_text == "32.0GB"
+        assert info.use_percent_text == "50%"
+
+    def test_from_df_k_output(self):
+        """Test parsing df -k output."""
+        output = """Filesystem     1K-blocks    Used Available Use% Mounted on
+/dev/block/dm-5   6082144 2353284   3712476  39% /data"""
+        info = StorageInfo.from_df_output(output)
+        assert info.total == 6082144 * 1024
+        assert info.available == 3712476 * 1024
+        assert info.use_percent == 39
+        assert info.mounted_on == "/data"
 
     def test_from_df_output_invalid(self):
         """Test parsing invalid df output."""
         info = StorageInfo.from_df_output("invalid output")
-        assert info.total == "N/A"
+        assert info.total is None
+        assert info.total_text == "N/A"
+
+    def test_freed_since(self):
+        """Test the exact change in free space between two probes."""
+        before = StorageInfo(available=1000)
+        assert StorageInfo(available=5096).freed_since(before) == 4096
+        assert StorageInfo(available=10).freed_since(before) == -990
+        assert StorageInfo().freed_since(before) is None
+
+    def test_sortable_by_free_space(self):
+        """Test numeric fields can be compared and summed."""
+        infos = [StorageInfo(available=3), StorageInfo(available=10), StorageInfo(available=1)]
+        ranked = sorted(infos, key=lambda info: info.available or 0, reverse=True)
+        assert [info.available for info in ranked] == [10, 3, 1]
+        assert sum(info.available or 0 for info in infos) == 14
+
+
+class TestStorageSnapshot:
+    """Tests for StorageSnapshot model."""
+
+    def test_primary(self):
+        """Test /data is the headline mount, whatever the probe order."""
+        snapshot = StorageSnapshot(
+            {"/sdcard": StorageInfo(available=1), "/data": StorageInfo(available=2)}
+        )
+        assert snapshot.primary.available == 2
+        assert StorageSnapshot({"/cache": StorageInfo(available=3)}).primary.available == 3
+        assert StorageSnapshot().primary.total is None
+
+    def test_filesystems(self):
+        """Test paths on the same mount are listed once."""
+        snapshot = StorageSnapshot(
+            {
+                "/data": StorageInfo(total=10, mounted_on="/data"),
+                "/sdcard": StorageInfo(total=10, mounted_on="/storage/emulated"),
+                "/data/local/tmp": StorageInfo(total=10, mounted_on="/data"),
+            }
+        )
+        assert list(snapshot.filesystems()) == ["/data", "/sdcard"]
+
+
+class TestReclaimEstimate:
+    """Tests for ReclaimEstimate model."""
+
+    def test_totals_and_empty_options(self, mock_device, mock_cleanup_option):
+        """Test unknown sizes count as 0 and empty targets are flagged."""
+        temp = CleanupOption(
+            category=CleanupCategory.TEMP_FILES,
+            name="Temp",
+            description="",
+            command="adb shell rm -rf /data/local/tmp/*",
+            path="/data/local/tmp/*",
+            icon="📁",
+            risk_level=RiskLevel.LOW,
+        )
+        estimate = ReclaimEstimate(mock_device, [mock_cleanup_option, temp], [None, 0])
+
+        assert estimate.total == 0
+        assert estimate.empty_options == [temp]
+        assert estimate.size_of(temp) == 0
+        assert estimate.size_of(mock_cleanup_option) is None
+
+        estimate.sizes = [2048, 1024]
+        assert estimate.total_text == "3.0KB"
+        assert estimate.empty_options == []
+
+
+class TestParseSize:
+    """Tests for parse_size function."""
+
+    def test_suffixes(self):
+        """Test human-readable sizes."""
+        assert parse_size("512K") == 512 * 1024
+        assert parse_size("2.5M") == int(2.5 * 1024**2)
+        assert parse_size("64G") == 64 * 1024**3
+        assert parse_size("1.0T") == 1024**4
+        assert parse_size("0") == 0
+        assert parse_size("100B") == 100
+
+    def test_invalid(self):
+        """Test non-sizes."""
+        assert parse_size("N/A") is None
+        assert parse_size("") is None
+        assert parse_size("12X") is None
 
 
 class TestDeviceCleanupSummary:
@@ -160,3 +271,17 @@ class TestDeviceCleanupSummary:
             ],
         )
         assert summary.successful_uninstalls == 1
+
+    def test_bytes_freed(self, mock_device, mock_cleanup_option):
+        """Test bytes freed add up across cleanup results."""
+        summary = DeviceCleanupSummary(
+            device=mock_device,
+            cleanup_results=[
+                CleanupResult(
+                    option=mock_cleanup_option, success=True, output="", bytes_freed=1024
+                ),
+                CleanupResult(option=mock_cleanup_option, success=True, output="", bytes_freed=512),
+            ],
+        )
+        assert summary.bytes_freed == 1536
+        assert summary.cleanup_results[0].bytes_freed_text == "1.0KB"
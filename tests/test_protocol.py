@@ -0,0 +1,238 @@
+"""Tests for ADB server protocol module."""
+
+import socket
+import struct
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from android_emulator_cleaner.core.adb import ADBClient
+from android_emulator_cleaner.core.protocol import ADBServer, ADBServerError
+
+# Captured before the autouse fixture in conftest replaces it
+_real_is_available = ADBServer.is_available
+
+
+def _prefixed(text: str) -> bytes:
+    data = text.encode()
+    return f"{len(data):04x}".encode() + data
+
+
+def _shell_packet(packet_id: int, data: bytes) -> bytes:
+    return struct.pack("<BI", packet_id, len(data)) + data
+
+
+class FakeADBServer:
+    """Minimal in-process adb server answering scripted requests."""
+
+    def __init__(self, responses: dict[str, bytes]):
+        self.responses = responses
+        self.requests: list[str] = []
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                while True:
+                    header = conn.recv(4)
+                    if not header:
+                        break
+                    request = conn.recv(int(header, 16)).decode()
+                    self.requests.append(request)
+                    if request.startswith("host:transport"):
+                        conn.sendall(b"OKAY")
+                        continue
+                    conn.sendall(self.responses.get(request, b"FAIL" + _prefixed("unknown")))
+                    break
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+@pytest.fixture
+def fake_server():
+    servers: list[FakeADBServer] = []
+
+    def start(responses: dict[str, bytes]) -> FakeADBServer:
+        server = FakeADBServer(responses)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+class TestADBServer:
+    """Tests for ADBServer class."""
+
+    def test_devices(self, fake_server):
+        """Test listing devices."""
+        listing = "emulator-5554 device product:sdk model:Pixel device:emu64a transport_id:1\n"
+        server = fake_server({"host:devices-l": b"OKAY" + _prefixed(listing)})
+
+        assert ADBServer(port=server.port).devices() == listing
+
+    def test_fail_raises(self, fake_server):
+        """Test FAIL responses raise ADBServerError."""
+        server = fake_server({"host:devices-l": b"FAIL" + _prefixed("broken")})
+
+        with pytest.raises(ADBServerError, match="broken"):
+            ADBServer(port=server.port).devices()
+
+    def test_is_available_without_server(self):
+        """Test availability check when nothing listens."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        with patch.object(ADBServer, "is_available", _real_is_available):
+            assert ADBServer(port=port).is_available() is False
+
+    def test_shell_v2(self, fake_server):
+        """Test shell v2 splits stdout, stderr and exit code."""
+        server = fake_server(
+            {
+                "host-serial:emulator-5554:features": b"OKAY" + _prefixed("shell_v2,cmd"),
+                "shell,v2,raw:ls /missing": b"OKAY"
+                + _shell_packet(1, b"out\n")
+                + _shell_packet(2, b"err\n")
+                + _shell_packet(3, b"\x01"),
+            }
+        )
+
+        result = ADBServer(port=server.port).shell("emulator-5554", "ls /missing")
+
+        assert result == (1, "out\n", "err\n")
+        assert "host:transport:emulator-5554" in server.requests
+
+    def test_shell_legacy(self, fake_server):
+        """Test legacy shell recovers the exit code from the marker."""
+        server = fake_server(
+            {
+                "host-serial:emulator-5554:features": b"OKAY" + _prefixed(""),
+                "shell:ls ; echo :AEC_EXIT:$?": b"OKAY" + b"a\nb\n:AEC_EXIT:0\n",
+            }
+        )
+
+        result = ADBServer(port=server.port).shell("emulator-5554", "ls")
+
+        assert result == (0, "a\nb\n", "")
+
+    def test_wait_for_restart(self):
+        """Test waiting for the transport to drop and come back."""
+        server = ADBServer(port=1)
+        states = ["device", ADBServerError("device 'emulator-5554' not found"), "device"]
+
+        with (
+            patch.object(server, "get_state", side_effect=states) as mock_state,
+            patch("time.sleep"),
+        ):
+            assert server.wait_for_restart("emulator-5554") is True
+
+        assert mock_state.call_count == 3
+
+    def test_wait_for_restart_timeout(self):
+        """Test giving up when the device never comes back."""
+        server = ADBServer(port=1)
+
+        with (
+            patch.object(server, "get_state", side_effect=ADBServerError("not found")),
+            patch("time.sleep"),
+        ):
+            assert server.wait_for_restart("emulator-5554", timeout=0) is False
+
+
+class TestADBClientNative:
+    """Tests for ADBClient running over the server socket."""
+
+    def test_shell_uses_server(self, fake_server):
+        """Test shell commands go through the server instead of subprocess."""
+        server = fake_server(
+            {
+                "host-serial:emulator-5554:features": b"OKAY" + _prefixed("shell_v2"),
+                "shell,v2,raw:getprop ro.build.version.sdk": b"OKAY"
+                + _shell_packet(1, b"34\n")
+                + _shell_packet(3, b"\x00"),
+            }
+        )
+        adb_server = ADBServer(port=server.port)
+        client = ADBClient("emulator-5554", server=adb_server)
+
+        with (
+            patch.object(adb_server, "is_available", return_value=True),
+            patch("subprocess.run") as mock_run,
+        ):
+            value = client.get_property("ro.build.version.sdk")
+
+        assert value == "34"
+        mock_run.assert_not_called()
+
+    def test_unmapped_command_falls_back(self, mock_subprocess_success):
+        """Test commands without a native equivalent use subprocess."""
+        adb_server = ADBServer(port=1)
+        client = ADBClient("emulator-5554", server=adb_server)
+
+        with (
+            patch.object(adb_server, "is_available", return_value=True),
+            patch("subprocess.run", return_value=mock_subprocess_success) as mock_run,
+        ):
+            success, _ = client.run_command("adb emu avd name")
+
+        assert success is True
+        mock_run.assert_called_once()
+
+    def test_server_gone_falls_back(self, mock_subprocess_success):
+        """Test connection errors fall back to subprocess."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        adb_server = ADBServer(port=port)
+        client = ADBClient("emulator-5554", server=adb_server)
+
+        with (
+            patch.object(adb_server, "is_available", return_value=True),
+            patch("subprocess.run", return_value=mock_subprocess_success) as mock_run,
+        ):
+            success, output = client.shell("ls")
+
+        assert success is True
+        assert output == "Success"
+        mock_run.assert_called_once()
+
+    def test_root_restart_waits(self, fake_server):
+        """Test a native root restart waits for the device to reconnect."""
+        server = fake_server({"root:": b"OKAY" + b"restarting adbd as root\n"})
+        adb_server = ADBServer(port=server.port)
+        client = ADBClient("emulator-5554", server=adb_server)
+
+        with (
+            patch.object(adb_server, "is_available", return_value=True),
+            patch.object(adb_server, "wait_for_restart", return_value=True) as mock_wait,
+        ):
+            assert client.enable_root() is True
+
+        mock_wait.assert_called_once_with("emulator-5554", client.DEFAULT_TIMEOUT)
+
+    def test_root_production_build_fails(self, fake_server):
+        """Test production builds report root as unavailable."""
+        reply = b"adbd cannot run as root in production builds\n"
+        server = fake_server({"root:": b"OKAY" + reply})
+        adb_server = ADBServer(port=server.port)
+        client = ADBClient("emulator-5554", server=adb_server)
+
+        with patch.object(adb_server, "is_available", return_value=True):
+            success, output = client.run_command("adb root")
+
+        assert success is False
+        assert "production builds" in output
+        assert client.enable_root() is False
@@ -0,0 +1,242 @@
+"""Tests for qcow2 overlay compaction module."""
+
+import os
+import struct
+
+import pytest
+
+from android_emulator_cleaner.core import qcow2
+from android_emulator_cleaner.core.avd import compact_avd_overlays
+from android_emulator_cleaner.core.qcow2 import (
+    COMPRESSED_FLAG,
+    COPIED_FLAG,
+    OFFSET_MASK,
+    ZERO_FLAG,
+    Qcow2Image,
+    compact_qcow2,
+    qcow2_overlays,
+    read_header,
+)
+from android_emulator_cleaner.models import AVD
+
+CLUSTER_BITS = 12
+CLUSTER = 1 << CLUSTER_BITS
+GUEST_CLUSTERS = 8
+
+
+def build_image(
+    path,
+    clusters: dict[int, bytes | int],
+    version: int = 3,
+    backing: str = "",
+    junk_clusters: int = 4,
+    nb_snapshots: int = 0,
+) -> None:
+    """
+    Write a small qcow2 image.
+
+    ``clusters`` maps guest cluster indexes to data, or to a raw L2 entry
+    flag (ZERO_FLAG or COMPRESSED_FLAG). Junk clusters model space the guest
+    has freed but the overlay still holds.
+    """
+    header = struct.pack(
+        ">4sIQIIQIIQQIIQ",
+        b"QFI\xfb",
+        version,
+        112 if backing else 0,
+        len(backing),
+        CLUSTER_BITS,
+        GUEST_CLUSTERS * CLUSTER,
+        0,
+        1,
+        CLUSTER,
+        2 * CLUSTER,
+        1,
+        nb_snapshots,
+        0,
+    )
+    if version >= 3:
+        header += struct.pack(">QQQII", 0, 0, 0, 4, 104) + bytes(8)
+    first = bytearray(CLUSTER)
+    first[: len(header)] = header
+    first[112 : 112 + len(backing)] = backing.encode()
+
+    l2 = [0] * (CLUSTER // 8)
+    data = []
+    next_cluster = 5 + junk_clusters
+    for index, value in sorted(clusters.items()):
+        if isinstance(value, int):
+            l2[index] = value | ((next_cluster * CLUSTER) if value == COMPRESSED_FLAG else 0)
+            continue
+        l2[index] = (next_cluster * CLUSTER) | COPIED_FLAG
+        data.append(value.ljust(CLUSTER, b"\0"))
+        next_cluster += 1
+
+    with open(path, "wb") as f:
+        f.write(first)
+        f.write(struct.pack(">Q", (4 * CLUSTER) | COPIED_FLAG).ljust(CLUSTER, b"\0"))
+        f.write(struct.pack(">Q", 3 * CLUSTER).ljust(CLUSTER, b"\0"))
+        f.write((b"\0\x01" * next_cluster).ljust(CLUSTER, b"\0"))
+        f.write(struct.pack(f">{len(l2)}Q", *l2))
+        f.write(b"\xaa" * CLUSTER * junk_clusters)
+        for cluster in data:
+            f.write(cluster)
+
+
+def guest_view(path) -> list[bytes | None]:
+    """Read the guest-visible content of every cluster."""
+    with open(path, "rb") as f:
+        image = Qcow2Image(f)
+        entries = next(image.mapping())[:GUEST_CLUSTERS]
+        return [image.cluster_content(entry) for entry in entries]
+
+
+def refcounts(path) -> list[int]:
+    """Read the refcount of every cluster in the file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    table_offset = struct.unpack_from(">Q", data, 48)[0]
+    block = struct.unpack_from(">Q", data, table_offset)[0]
+    count = len(data) // CLUSTER
+    return list(struct.unpack_from(f">{count}H", data, block))
+
+
+class TestCompactQcow2:
+    """Tests for compact_qcow2 function."""
+
+    def test_drops_unused_clusters(self, tmp_path):
+        """Test junk and zero clusters are dropped without a backing file."""
+        image = tmp_path / "userdata-qemu.img.qcow2"
+        build_image(image, {0: b"a" * CLUSTER, 1: bytes(CLUSTER), 3: b"c" * 100})
+        before = guest_view(image)
+        size_before = image.stat().st_size
+
+        result = compact_qcow2(str(image))
+
+        assert result.success is True, result.error
+        assert image.stat().st_size < size_before
+        after = guest_view(image)
+        assert after[0] == before[0]
+        assert after[1] is None
+        assert after[3] == before[3]
+        assert set(refcounts(image)) == {1}
+        assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+    def test_zero_clusters_flagged_with_backing(self, tmp_path):
+        """Test zero clusters become zero-flagged when they shadow a backing file."""
+        image = tmp_path / "userdata-qemu.img.qcow2"
+        build_image(image, {0: bytes(CLUSTER), 2: b"b" * CLUSTER}, backing="system.img")
+
+        result = compact_qcow2(str(image))
+
+        assert result.success is True, result.error
+        with open(image, "rb") as f:
+            src = Qcow2Image(f)
+            entries = next(src.mapping())
+            assert entries[0] == ZERO_FLAG
+            assert entries[1] == 0
+            assert entries[2] & OFFSET_MASK
+            f.seek(112)
+            assert f.read(10) == b"system.img"
+            assert read_header(f).backing_file_size == 10
+
+    def test_v2_keeps_zero_clusters_with_backing(self, tmp_path):
+        """Test v2 images keep zero clusters that shadow a backing file."""
+        image = tmp_path / "cache.img.qcow2"
+        build_image(image, {0: bytes(CLUSTER)}, version=2, backing="cache.img")
+
+        result = compact_qcow2(str(image))
+
+        assert result.success is True, result.error
+        assert guest_view(image)[0] == bytes(CLUSTER)
+
+    def test_keeps_zero_flag(self, tmp_path):
+        """Test clusters already flagged as zero stay zero-flagged."""
+        image = tmp_path / "userdata-qemu.img.qcow2"
+        build_image(image, {0: ZERO_FLAG, 1: b"x" * CLUSTER}, backing="system.img")
+
+        result = compact_qcow2(str(image))
+
+        assert result.success is True, result.error
+        assert guest_view(image)[:2] == [bytes(CLUSTER), b"x" * CLUSTER]
+
+    @pytest.mark.parametrize(
+        ("kwargs", "reason"),
+        [
+            ({"clusters": {0: COMPRESSED_FLAG}}, "compressed"),
+            ({"clusters": {0: b"a"}, "nb_snapshots": 1}, "snapshots"),
+        ],
+    )
+    def test_unsupported_left_untouched(self, tmp_path, kwargs, reason):
+        """Test images that can't be rewritten safely are left as they are."""
+        image = tmp_path / "userdata-qemu.img.qcow2"
+        build_image(image, **kwargs)
+        original = image.read_bytes()
+
+        result = compact_qcow2(str(image))
+
+        assert result.success is False
+        assert reason in result.error
+        assert result.bytes_freed == 0
+        assert image.read_bytes() == original
+        assert os.listdir(tmp_path) == [image.name]
+
+    def test_failed_verification_keeps_original(self, tmp_path, monkeypatch):
+        """Test the original stays in place if the copy doesn't verify."""
+        image = tmp_path / "userdata-qemu.img.qcow2"
+        build_image(image, {0: b"a" * CLUSTER})
+        original = image.read_bytes()
+        monkeypatch.setattr(qcow2, "verify_same_content", lambda *_: False)
+
+        result = compact_qcow2(str(image))
+
+        assert result.success is False
+        assert image.read_bytes() == original
+        assert os.listdir(tmp_path) == [image.name]
+
+    def test_not_qcow2(self, tmp_path):
+        """Test a raw file is reported as not a qcow2 image."""
+        image = tmp_path / "cache.img.qcow2"
+        image.write_bytes(b"\0" * CLUSTER)
+
+        result = compact_qcow2(str(image))
+
+        assert result.success is False
+        assert "qcow2" in result.error
+
+
+class TestCompactAVDOverlays:
+    """Tests for compact_avd_overlays function."""
+
+    def test_reports_per_avd(self, tmp_path):
+        """Test overlays of stopped AVDs are compacted and grouped by AVD."""
+        avds = []
+        for name, running in (("a", False), ("b", True)):
+            avd_dir = tmp_path / f"{name}.avd"
+            avd_dir.mkdir()
+            build_image(avd_dir / "userdata-qemu.img.qcow2", {0: b"a" * CLUSTER})
+            (avd_dir / "notes.qcow2").write_bytes(b"not an image")
+            avds.append(
+                AVD(
+                    name=name,
+                    path=str(avd_dir),
+                    total_size=0,
+                    snapshot_size=0,
+                    cache_size=0,
+                    is_running=running,
+                )
+            )
+
+        results = compact_avd_overlays(avds)
+
+        assert list(results) == ["a"]
+        assert [os.path.basename(r.path) for r in results["a"]] == ["userdata-qemu.img.qcow2"]
+        assert results["a"][0].success is True
+
+    def test_lists_only_qcow2_images(self, tmp_path):
+        """Test only files with the qcow2 magic are treated as overlays."""
+        build_image(tmp_path / "sdcard.img.qcow2", {})
+        (tmp_path / "other.qcow2").write_bytes(b"raw")
+        (tmp_path / "cache.img").write_bytes(b"QFI\xfb")
+
+        assert qcow2_overlays(str(tmp_path)) == [str(tmp_path / "sdcard.img.qcow2")]
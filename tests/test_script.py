@@ -0,0 +1,56 @@
+"""Tests for fused script module."""
+
+import subprocess
+import sys
+
+import pytest
+
+from android_emulator_cleaner.core.script import build_script, new_marker, parse_script_output
+
+
+class TestParseScriptOutput:
+    """Tests for parse_script_output function."""
+
+    def test_parse_steps(self):
+        """Test splitting output into steps."""
+        marker = "M"
+        output = (
+            "M:BEGIN:0\nhello\n\nM:END:0:0:1000000000:1500000000\n"
+            "M:BEGIN:1\nrm: denied\n\nM:END:1:1:%N:%N\n"
+        )
+        results = parse_script_output(output, 2, marker)
+
+        assert results[0].exit_code == 0
+        assert results[0].output == "hello"
+        assert results[0].duration == pytest.approx(0.5)
+        assert results[1].success is False
+        assert results[1].output == "rm: denied"
+        assert results[1].duration == 0.0
+
+    def test_missing_step(self):
+        """Test steps that never reported are None."""
+        results = parse_script_output("M:BEGIN:0\npartial output", 2, "M")
+        assert results == [None, None]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX sh")
+class TestBuildScript:
+    """Tests for build_script function run through a local shell."""
+
+    def test_round_trip(self):
+        """Test a built script reports every step's status and output."""
+        marker = new_marker()
+        commands = ["echo one", "echo err >&2; exit 2", "printf 'no newline'", "cat"]
+        script = build_script(commands, marker)
+
+        output = subprocess.run(
+            ["sh", "-c", script], capture_output=True, text=True, timeout=10
+        ).stdout
+        results = parse_script_output(output, len(commands), marker)
+
+        assert [(r.exit_code, r.output) for r in results] == [
+            (0, "one"),
+            (2, "err"),
+            (0, "no newline"),
+            (0, ""),
+        ]
@@ -0,0 +1,173 @@
+"""Tests for device session module."""
+
+import socket
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from android_emulator_cleaner.core.adb import ADBClient
+from android_emulator_cleaner.core.protocol import ADBServerConnection
+from android_emulator_cleaner.core.session import (
+    NOT_SENT,
+    DeviceSession,
+    _ProcessStream,
+    _SocketStream,
+)
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX sh")
+
+
+def _local_shell() -> _ProcessStream:
+    """Stand-in for a device shell: a local sh reading commands from stdin."""
+    return _ProcessStream(
+        subprocess.Popen(
+            ["sh"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+    )
+
+
+@pytest.fixture
+def session():
+    """Create an open session backed by a local shell."""
+    with patch.object(DeviceSession, "_connect", side_effect=_local_shell):
+        session = DeviceSession(ADBClient("emulator-5554"))
+        assert session.open() is True
+        yield session
+        session.close()
+
+
+class TestDeviceSession:
+    """Tests for DeviceSession class."""
+
+    def test_run(self, session):
+        """Test running a single command."""
+        assert session.run("echo hello") == (0, "hello")
+
+    def test_exit_code(self, session):
+        """Test exit codes are reported per command."""
+        assert session.run("false")[0] == 1
+        assert session.run("exit 3")[0] == 3
+        assert session.is_open
+
+    def test_stderr_merged(self, session):
+        """Test stderr is part of the command output."""
+        exit_code, output = session.run("echo oops >&2")
+        assert exit_code == 0
+        assert output == "oops"
+
+    def test_output_without_newline(self, session):
+        """Test output lacking a trailing newline is split correctly."""
+        assert session.run("printf abc") == (0, "abc")
+
+    def test_run_many_pipelined(self, session):
+        """Test several commands are split back into separate results."""
+        results = session.run_many(["echo one", "printf 'a\\nb\\n'", "false", "echo two"])
+        assert results == [(0, "one"), (0, "a\nb"), (1, ""), (0, "two")]
+
+    def test_command_cannot_read_session_input(self, session):
+        """Test commands reading stdin don't swallow the next command."""
+        results = session.run_many(["cat", "echo after"])
+        assert results == [(0, ""), (0, "after")]
+
+    def test_timeout_closes_session(self, session):
+        """Test timeouts report failure and drop the session."""
+        exit_code, output = session.run("sleep 5", timeout=1)
+        assert exit_code == -1
+        assert "timed out" in output.lower()
+        assert not session.is_open
+
+    def test_open_failure(self):
+        """Test open reports failure when no shell can be started."""
+        with patch.object(DeviceSession, "_connect", return_value=None):
+            session = DeviceSession(ADBClient("emulator-5554"))
+            assert session.open() is False
+            assert session.run("echo hi")[0] == NOT_SENT
+
+
+class TestADBClientSession:
+    """Tests for ADBClient routing through an attached session."""
+
+    def test_shell_uses_session(self):
+        """Test shell commands go through the open session."""
+        client = ADBClient("emulator-5554")
+        with patch.object(DeviceSession, "_connect", side_effect=_local_shell):
+            assert client.open_session() is True
+
+        try:
+            with patch("subprocess.run") as mock_run:
+                success, output = client.shell("echo package:com.example.app")
+            assert success is True
+            assert output == "package:com.example.app"
+            mock_run.assert_not_called()
+        finally:
+            client.close_session()
+
+        assert client.session is None
+
+    def test_dead_session_not_retried(self):
+        """Test a command the session may have run isn't sent again one-shot."""
+        client = ADBClient("emulator-5554")
+        with patch.object(DeviceSession, "_connect", side_effect=_local_shell):
+            assert client.open_session() is True
+
+        try:
+            with (
+                patch.object(client.session, "run", return_value=(-1, "Session closed")),
+                patch.object(client.server, "is_available", return_value=True),
+                patch.object(client.server, "shell") as mock_shell,
+                patch("subprocess.run") as mock_run,
+            ):
+                success, output = client.shell("pm uninstall com.example.app")
+        finally:
+            client.close_session()
+
+        assert (success, output) == (False, "Session closed")
+        mock_shell.assert_not_called()
+        mock_run.assert_not_called()
+
+    def test_unsent_command_falls_back(self, mock_subprocess_success):
+        """Test a command that never reached the session runs one-shot."""
+        client = ADBClient("emulator-5554")
+        with patch.object(DeviceSession, "_connect", side_effect=_local_shell):
+            assert client.open_session() is True
+
+        try:
+            with (
+                patch.object(client.session, "run", return_value=(NOT_SENT, "Session is not open")),
+                patch("subprocess.run", return_value=mock_subprocess_success) as mock_run,
+            ):
+                success, _ = client.shell("echo hi")
+        finally:
+            client.close_session()
+
+        assert success is True
+        mock_run.assert_called_once()
+
+
+class TestSocketStream:
+    """Tests for the adb server shell stream."""
+
+    def test_close_wakes_reader(self):
+        """Test closing the stream unblocks a thread waiting in recv()."""
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        conn = ADBServerConnection("127.0.0.1", server.getsockname()[1], None)
+        peer, _ = server.accept()
+        stream = _SocketStream(conn)
+        received = []
+        reader = threading.Thread(target=lambda: received.append(stream.read()))
+        reader.start()
+        try:
+            time.sleep(0.05)
+            stream.close()
+            reader.join(timeout=1)
+            assert not reader.is_alive()
+            assert received == [b""]
+        finally:
+            peer.close()
+            server.close()
@@ -0,0 +1,182 @@
+"""Tests for AVD snapshot module."""
+
+import os
+
+from android_emulator_cleaner.core.avd import clean_avd_snapshots, clean_avds
+from android_emulator_cleaner.core.snapshots import (
+    list_snapshots,
+    parse_snapshot_pb,
+    plan_evictions,
+    select_evictions,
+)
+from android_emulator_cleaner.models import AVD, Snapshot, SnapshotKeep, SnapshotPolicy
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number: int, value: int | str) -> bytes:
+    if isinstance(value, int):
+        return _varint(number << 3) + _varint(value)
+    data = value.encode()
+    return _varint(number << 3 | 2) + _varint(len(data)) + data
+
+
+def _snapshot(name: str, size: int, last_used: float, avd: str = "/avd/a.avd") -> Snapshot:
+    return Snapshot(name=name, path=f"{avd}/snapshots/{name}", size=size, last_used=last_used)
+
+
+def _make_snapshot(avd_dir, name: str, size: int, used: int) -> None:
+    path = avd_dir / "snapshots" / name
+    path.mkdir(parents=True)
+    (path / "ram.bin").write_bytes(b"x" * size)
+    (path / "snapshot.pb").write_bytes(_field(2, used) + _field(12, f"{name} label"))
+    for item in path.iterdir():
+        os.utime(item, (used, used))
+
+
+def _avd(path) -> AVD:
+    return AVD(
+        name=path.stem,
+        path=str(path),
+        total_size=0,
+        snapshot_size=0,
+        cache_size=0,
+        is_running=False,
+    )
+
+
+class TestParseSnapshotPb:
+    """Tests for parse_snapshot_pb function."""
+
+    def test_parses_metadata(self):
+        """Test metadata fields are decoded and unknown fields skipped."""
+        data = (
+            _field(1, 5)
+            + _field(2, 1_700_000_000)
+            + _varint(3 << 3 | 2)
+            + _varint(3)
+            + b"\x0a\x01x"
+            + _varint(6 << 3 | 5)
+            + b"\x00\x00\x00\x00"
+            + _field(12, "before_login")
+            + _field(14, "Logged out state")
+        )
+
+        assert parse_snapshot_pb(data) == {
+            "creation_time": 1_700_000_000,
+            "logical_name": "before_login",
+            "description": "Logged out state",
+        }
+
+    def test_truncated(self):
+        """Test a truncated file yields no metadata."""
+        data = _field(12, "before_login")
+        assert parse_snapshot_pb(data[:-3]) == {}
+        assert parse_snapshot_pb(b"\xff") == {}
+
+
+class TestListSnapshots:
+    """Tests for list_snapshots function."""
+
+    def test_lists_least_recently_used_first(self, tmp_path):
+        """Test snapshots are listed with size, last use and metadata."""
+        avd_dir = tmp_path / "a.avd"
+        _make_snapshot(avd_dir, "default_boot", 4096, 1_700_000_300)
+        _make_snapshot(avd_dir, "old", 4096, 1_700_000_100)
+
+        snapshots = list_snapshots(str(avd_dir))
+
+        assert [s.name for s in snapshots] == ["old", "default_boot"]
+        assert snapshots[0].last_used >= 1_700_000_100
+        assert snapshots[0].creation_time == 1_700_000_100
+        assert snapshots[0].display_name == "old label"
+        assert snapshots[0].size > 0
+        assert snapshots[1].is_quick_boot is True
+
+    def test_no_snapshots(self, tmp_path):
+        """Test an AVD without a snapshots directory has no snapshots."""
+        assert list_snapshots(str(tmp_path)) == []
+
+
+class TestSelectEvictions:
+    """Tests for select_evictions and plan_evictions functions."""
+
+    def test_evicts_lru_until_budget(self):
+        """Test least recently used snapshots go first until the budget is met."""
+        snapshots = [_snapshot("c", 100, 3), _snapshot("a", 100, 1), _snapshot("b", 100, 2)]
+        evicted = select_evictions(snapshots, budget=150)
+        assert [s.name for s in evicted] == ["a", "b"]
+
+    def test_keeps_quick_boot(self):
+        """Test the Quick Boot snapshot is never evicted."""
+        snapshots = [_snapshot("default_boot", 100, 1), _snapshot("x", 100, 2)]
+        evicted = select_evictions(snapshots, keep=SnapshotKeep.DEFAULT_BOOT)
+        assert [s.name for s in evicted] == ["x"]
+
+    def test_keeps_newest_per_avd(self):
+        """Test each AVD keeps its most recently used snapshot."""
+        snapshots = [
+            _snapshot("a1", 100, 1, "/avd/a.avd"),
+            _snapshot("a2", 100, 5, "/avd/a.avd"),
+            _snapshot("b1", 100, 2, "/avd/b.avd"),
+        ]
+        evicted = select_evictions(snapshots, keep=SnapshotKeep.NEWEST)
+        assert [s.name for s in evicted] == ["a1"]
+
+    def test_per_avd_then_global_budget(self):
+        """Test per-AVD budgets apply before the global budget."""
+        a = [_snapshot("a1", 100, 1, "/avd/a.avd"), _snapshot("a2", 100, 4, "/avd/a.avd")]
+        b = [_snapshot("b1", 100, 2, "/avd/b.avd"), _snapshot("b2", 100, 3, "/avd/b.avd")]
+
+        evicted = plan_evictions([a, b], budget=200, per_avd_budget=150)
+        assert [s.name for s in evicted] == ["a1", "b1"]
+
+        evicted = plan_evictions([a, b], budget=100, per_avd_budget=150)
+        assert [s.name for s in evicted] == ["a1", "b1", "b2"]
+
+    def test_no_budget_evicts_unprotected(self):
+        """Test a policy without budgets evicts everything it may."""
+        snapshots = [_snapshot("default_boot", 100, 1), _snapshot("x", 100, 2)]
+        evicted = plan_evictions([snapshots], keep=SnapshotKeep.DEFAULT_BOOT)
+        assert [s.name for s in evicted] == ["x"]
+
+
+class TestCleanWithPolicy:
+    """Tests for snapshot cleanup with an eviction policy."""
+
+    def test_keeps_quick_boot(self, tmp_path):
+        """Test cleanup under a keep policy leaves the Quick Boot snapshot."""
+        avd_dir = tmp_path / "a.avd"
+        _make_snapshot(avd_dir, "default_boot", 4096, 1_700_000_300)
+        _make_snapshot(avd_dir, "old", 4096, 1_700_000_100)
+
+        policy = SnapshotPolicy(keep=SnapshotKeep.DEFAULT_BOOT)
+        success, _, freed = clean_avd_snapshots(_avd(avd_dir), policy=policy)
+
+        assert success is True
+        assert freed > 0
+        assert sorted(os.listdir(avd_dir / "snapshots")) == ["default_boot"]
+
+    def test_global_budget_across_avds(self, tmp_path):
+        """Test a global budget evicts the oldest snapshots of any AVD."""
+        _make_snapshot(tmp_path / "a.avd", "s1", 8192, 1_700_000_100)
+        _make_snapshot(tmp_path / "b.avd", "s2", 8192, 1_700_000_200)
+        _make_snapshot(tmp_path / "b.avd", "s3", 8192, 1_700_000_300)
+        avds = [_avd(tmp_path / "a.avd"), _avd(tmp_path / "b.avd")]
+        budget = list_snapshots(str(tmp_path / "b.avd"))[0].size
+
+        result = clean_avds(avds, cache=False, policy=SnapshotPolicy(budget=budget))
+
+        assert result.success is True
+        assert os.listdir(tmp_path / "a.avd" / "snapshots") == []
+        assert os.listdir(tmp_path / "b.avd" / "snapshots") == ["s3"]
@@ -0,0 +1,153 @@
+"""Tests for disk image sparsification module."""
+
+import errno
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from android_emulator_cleaner.core.avd import sparsify_avd_images
+from android_emulator_cleaner.core.sparsify import (
+    QCOW2_MAGIC,
+    find_zero_runs,
+    raw_images,
+    sparsify_image,
+)
+from android_emulator_cleaner.models import AVD
+
+MIB = 1024 * 1024
+
+
+def _write_image(path, layout: list[tuple[bytes, int]]) -> bytes:
+    """Write an image from (fill byte, length) pairs, allocating every block."""
+    data = b"".join(fill * length for fill, length in layout)
+    path.write_bytes(data)
+    return data
+
+
+def _avd(path, is_running: bool = False) -> AVD:
+    return AVD(
+        name=path.stem,
+        path=str(path),
+        total_size=0,
+        snapshot_size=0,
+        cache_size=0,
+        is_running=is_running,
+    )
+
+
+class TestFindZeroRuns:
+    """Tests for find_zero_runs function."""
+
+    def test_finds_runs(self, tmp_path):
+        """Test zero runs are found between data blocks."""
+        image = tmp_path / "cache.img"
+        _write_image(image, [(b"a", 4096), (b"\0", 3 * 4096), (b"b", 4096), (b"\0", 4096)])
+
+        with open(image, "rb") as f:
+            runs = list(find_zero_runs(f.fileno(), image.stat().st_size, 4096))
+
+        assert runs == [(4096, 3 * 4096), (5 * 4096, 4096)]
+
+    def test_merges_across_windows(self, tmp_path):
+        """Test a run spanning several mapped windows is reported once."""
+        image = tmp_path / "cache.img"
+        _write_image(image, [(b"a", MIB), (b"\0", 3 * MIB), (b"b", MIB)])
+
+        with open(image, "rb") as f:
+            runs = list(find_zero_runs(f.fileno(), image.stat().st_size, 4096, stride=MIB))
+
+        assert runs == [(MIB, 3 * MIB)]
+
+    def test_partial_block_not_punched(self, tmp_path):
+        """Test a zero tail shorter than a block is left alone."""
+        image = tmp_path / "cache.img"
+        _write_image(image, [(b"a", 4096), (b"\0", 100)])
+
+        with open(image, "rb") as f:
+            assert list(find_zero_runs(f.fileno(), image.stat().st_size, 4096)) == []
+
+    @pytest.mark.skipif(not hasattr(os, "SEEK_DATA"), reason="needs SEEK_DATA")
+    def test_hole_lookup_unsupported(self, tmp_path):
+        """Test the whole file is scanned if the filesystem can't report holes."""
+        image = tmp_path / "cache.img"
+        _write_image(image, [(b"a", 4096), (b"\0", 2 * 4096), (b"b", 4096)])
+
+        with (
+            open(image, "rb") as f,
+            patch("os.lseek", side_effect=OSError(errno.EINVAL, "Invalid argument")),
+        ):
+            runs = list(find_zero_runs(f.fileno(), image.stat().st_size, 4096))
+
+        assert runs == [(4096, 2 * 4096)]
+
+    @pytest.mark.skipif(not hasattr(os, "SEEK_DATA"), reason="needs SEEK_DATA")
+    def test_no_data_left(self, tmp_path):
+        """Test nothing is scanned past the last data range."""
+        image = tmp_path / "cache.img"
+        _write_image(image, [(b"\0", 2 * 4096)])
+
+        with (
+            open(image, "rb") as f,
+            patch("os.lseek", side_effect=OSError(errno.ENXIO, "No such device or address")),
+        ):
+            assert list(find_zero_runs(f.fileno(), image.stat().st_size, 4096)) == []
+
+
+class TestSparsifyImage:
+    """Tests for sparsify_image function."""
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="fallocate is Linux only")
+    def test_releases_zero_blocks(self, tmp_path):
+        """Test zero blocks are released without changing the contents."""
+        image = tmp_path / "userdata-qemu.img"
+        data = _write_image(image, [(b"a", MIB), (b"\0", 4 * MIB), (b"b", MIB)])
+
+        result = sparsify_image(str(image))
+        if not result.success:
+            pytest.skip(f"Filesystem can't punch holes: {result.error}")
+
+        assert image.read_bytes() == data
+        assert image.stat().st_size == len(data)
+        assert result.allocated_after < result.allocated_before
+        assert result.bytes_freed >= 4 * MIB - 64 * 1024
+
+    def test_missing_image(self, tmp_path):
+        """Test a missing image reports an error."""
+        result = sparsify_image(str(tmp_path / "missing.img"))
+        assert result.success is False
+        assert result.bytes_freed == 0
+
+
+class TestRawImages:
+    """Tests for raw image discovery."""
+
+    def test_skips_qcow2(self, tmp_path):
+        """Test qcow2 images and other files are not treated as raw images."""
+        (tmp_path / "cache.img").write_bytes(b"\0" * 10)
+        (tmp_path / "sdcard.img").write_bytes(QCOW2_MAGIC + b"\0" * 10)
+        (tmp_path / "config.ini").write_text("x")
+
+        assert raw_images(str(tmp_path)) == [str(tmp_path / "cache.img")]
+
+    def test_skips_running_avds(self, tmp_path):
+        """Test images of running AVDs are never touched."""
+        running = tmp_path / "a.avd"
+        running.mkdir()
+        (running / "cache.img").write_bytes(b"\0" * 8192)
+
+        assert sparsify_avd_images([_avd(running, is_running=True)]) == []
+
+    def test_reports_each_image(self, tmp_path):
+        """Test every raw image of a stopped AVD is reported."""
+        avd_dir = tmp_path / "a.avd"
+        avd_dir.mkdir()
+        (avd_dir / "cache.img").write_bytes(b"a" * 8192)
+        (avd_dir / "sdcard.img").write_bytes(b"b" * 8192)
+
+        seen = []
+        results = sparsify_avd_images([_avd(avd_dir)], on_progress=seen.append)
+
+        assert sorted(os.path.basename(r.path) for r in results) == ["cache.img", "sdcard.img"]
+        assert seen == results
@@ -0,0 +1,172 @@
+"""Tests for device tracker module."""
+
+import socket
+import threading
+import time
+from unittest.mock import patch
+
+from android_emulator_cleaner.core.adb import get_connected_devices
+from android_emulator_cleaner.core.protocol import ADBServer
+from android_emulator_cleaner.core.tracker import DeviceTracker
+from android_emulator_cleaner.models import DeviceEventType
+
+
+def _prefixed(text: str) -> bytes:
+    data = text.encode()
+    return f"{len(data):04x}".encode() + data
+
+
+class FakeTrackServer:
+    """In-process adb server that streams scripted device lists."""
+
+    def __init__(self, listings: list[str]):
+        self.listings = listings
+        self.requests: list[str] = []
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        self.release = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self) -> None:
+        try:
+            conn, _ = self.sock.accept()
+        except OSError:
+            return
+        with conn:
+            header = conn.recv(4)
+            self.requests.append(conn.recv(int(header, 16)).decode())
+            conn.sendall(b"OKAY")
+            for listing in self.listings:
+                conn.sendall(_prefixed(listing))
+                time.sleep(0.02)
+            self.release.wait(5)
+
+    def close(self) -> None:
+        self.release.set()
+        self.sock.close()
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestDeviceTracker:
+    """Tests for DeviceTracker class."""
+
+    def test_update_reports_changes(self):
+        """Test updates produce add, change and remove events."""
+        tracker = DeviceTracker(ADBServer())
+
+        added = tracker.update("emulator-5554\tdevice\nR58M\tunauthorized\n")
+        assert {(e.event_type, e.serial) for e in added} == {
+            (DeviceEventType.ADDED, "emulator-5554"),
+            (DeviceEventType.ADDED, "R58M"),
+        }
+
+        changed = tracker.update("emulator-5554\toffline\nR58M\tunauthorized\n")
+        assert len(changed) == 1
+        assert changed[0].event_type == DeviceEventType.CHANGED
+        assert changed[0].previous_status == "device"
+        assert changed[0].status == "offline"
+
+        removed = tracker.update("R58M\tunauthorized\n")
+        assert [(e.event_type, e.serial) for e in removed] == [
+            (DeviceEventType.REMOVED, "emulator-5554")
+        ]
+
+    def test_lookups(self):
+        """Test registry lookups and status filters."""
+        tracker = DeviceTracker(ADBServer())
+        tracker.update(
+            "emulator-5554 device product:sdk model:Pixel_7 transport_id:1\n"
+            "emulator-5556\toffline\n"
+            "R58M\tunauthorized\n"
+        )
+
+        assert tracker.status("emulator-5554") == "device"
+        assert tracker.status("missing") is None
+        assert tracker.get("emulator-5554")["model"] == "Pixel_7"
+        assert [e["serial"] for e in tracker.online()] == ["emulator-5554"]
+        assert [e["serial"] for e in tracker.offline()] == ["emulator-5556"]
+        assert [e["serial"] for e in tracker.unauthorized()] == ["R58M"]
+
+    def test_subscribe_and_unsubscribe(self):
+        """Test listeners receive events until they unsubscribe."""
+        tracker = DeviceTracker(ADBServer())
+        seen = []
+        unsubscribe = tracker.subscribe(seen.append)
+
+        tracker.update("emulator-5554\tdevice\n")
+        unsubscribe()
+        tracker.update("")
+
+        assert [e.event_type for e in seen] == [DeviceEventType.ADDED]
+
+    def test_follows_server_stream(self):
+        """Test the tracker applies every list the server streams."""
+        server = FakeTrackServer(["emulator-5554\tdevice\n", "emulator-5554\toffline\n"])
+        tracker = DeviceTracker(ADBServer(port=server.port))
+        try:
+            assert tracker.start(timeout=2) is True
+            assert _wait_for(lambda: tracker.status("emulator-5554") == "offline")
+            assert server.requests == ["host:track-devices-l"]
+        finally:
+            tracker.stop()
+            server.close()
+
+        assert tracker.is_running is False
+
+    def test_stop_keeps_registry(self):
+        """Test stopping wakes the tracker without reporting devices as removed."""
+        server = FakeTrackServer(["emulator-5554\tdevice\n"])
+        tracker = DeviceTracker(ADBServer(port=server.port))
+        seen = []
+        try:
+            assert tracker.start(timeout=2) is True
+            tracker.subscribe(seen.append)
+            started = time.monotonic()
+            tracker.stop()
+            elapsed = time.monotonic() - started
+        finally:
+            server.close()
+
+        assert elapsed < 1
+        assert tracker.is_running is False
+        assert tracker.status("emulator-5554") == "device"
+        assert seen == []
+
+    def test_start_without_server(self):
+        """Test start reports failure when the server can't be reached."""
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        tracker = DeviceTracker(ADBServer(port=port))
+        try:
+            assert tracker.start(timeout=0.2) is False
+            assert tracker.snapshot() == []
+        finally:
+            tracker.stop()
+
+    def test_get_connected_devices_uses_registry(self, mock_subprocess_success):
+        """Test device discovery reads the tracker instead of running adb devices."""
+        tracker = DeviceTracker(ADBServer())
+        tracker.update("emulator-5554 device model:Pixel_7 transport_id:3\n")
+        tracker._ready.set()
+
+        with patch("subprocess.run", return_value=mock_subprocess_success) as mock_run:
+            devices = get_connected_devices(tracker=tracker)
+
+        assert [d.device_id for d in devices] == ["emulator-5554"]
+        assert devices[0].transport_id == "3"
+        # Without a getprop model, the devices -l field is used
+        assert devices[0].model == "Pixel_7"
+        assert all("devices" not in call.args[0] for call in mock_run.call_args_list)
@@ -0,0 +1,222 @@
+"""Tests for deferred deletion module."""
+
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+
+from android_emulator_cleaner.core import avd as avd_module
+from android_emulator_cleaner.core.avd import clean_avd_snapshots, clean_avds, scan_avd_sizes
+from android_emulator_cleaner.core.trash import (
+    LOCK_FILENAME,
+    TRASH_DIRNAME,
+    empty_trash,
+    has_pending_trash,
+    move_to_trash,
+    resume_trash,
+    start_trash_worker,
+    trash_dir_for,
+)
+from android_emulator_cleaner.core.usage import allocated_size
+from android_emulator_cleaner.models import AVD
+
+
+def _make_avd(root, name: str = "Pixel") -> AVD:
+    avd_dir = root / f"{name}.avd"
+    (avd_dir / "snapshots" / "default_boot").mkdir(parents=True)
+    (avd_dir / "snapshots" / "default_boot" / "ram.bin").write_bytes(b"x" * 10000)
+    (avd_dir / "cache.img").write_bytes(b"y" * 3000)
+    sizes, allocated = scan_avd_sizes(str(avd_dir))
+    return AVD(
+        name=name,
+        path=str(avd_dir),
+        total_size=allocated.total,
+        snapshot_size=allocated.snapshots,
+        cache_size=allocated.cache,
+        is_running=False,
+        sizes=sizes,
+        allocated=allocated,
+    )
+
+
+class TestMoveToTrash:
+    """Tests for move_to_trash function."""
+
+    def test_moves_entries(self, tmp_path):
+        """Test entries are renamed into one batch without being walked."""
+        avd = _make_avd(tmp_path)
+        snapshot = os.path.join(avd.path, "snapshots", "default_boot")
+        trash_dir = trash_dir_for(avd.path)
+
+        with patch("android_emulator_cleaner.core.trash.disk_usage") as mock_usage:
+            moved, failed = move_to_trash([snapshot], trash_dir, 12345)
+
+        mock_usage.assert_not_called()
+        assert moved == 12345
+        assert failed == []
+        assert not os.path.exists(snapshot)
+        assert trash_dir == str(tmp_path / TRASH_DIRNAME)
+        batches = os.listdir(trash_dir)
+        assert len(batches) == 1
+        assert os.listdir(os.path.join(trash_dir, batches[0])) == ["0-default_boot"]
+
+    def test_unknown_size_counts_files(self, tmp_path):
+        """Test only regular files are counted when no size is given."""
+        avd = _make_avd(tmp_path)
+        cache = os.path.join(avd.path, "cache.img")
+        expected = allocated_size(os.lstat(cache))
+        snapshot = os.path.join(avd.path, "snapshots", "default_boot")
+
+        with patch("android_emulator_cleaner.core.trash.disk_usage") as mock_usage:
+            moved, _ = move_to_trash([cache, snapshot], trash_dir_for(avd.path))
+
+        mock_usage.assert_not_called()
+        assert moved == expected
+
+    def test_missing_paths(self, tmp_path):
+        """Test missing paths are skipped and leave no empty batch."""
+        trash_dir = str(tmp_path / TRASH_DIRNAME)
+
+        moved, failed = move_to_trash([str(tmp_path / "missing")], trash_dir)
+
+        assert (moved, failed) == (0, [])
+        assert has_pending_trash(trash_dir) is False
+
+    def test_rename_failure(self, tmp_path):
+        """Test paths that can't be renamed are returned for direct deletion."""
+        target = tmp_path / "cache.img"
+        target.write_bytes(b"x")
+
+        with patch("os.rename", side_effect=OSError(18, "Invalid cross-device link")):
+            moved, failed = move_to_trash([str(target)], str(tmp_path / TRASH_DIRNAME))
+
+        assert moved == 0
+        assert failed == [str(target)]
+        assert target.exists()
+
+    def test_partial_failure_subtracts(self, tmp_path):
+        """Test paths left behind are taken out of the known size."""
+        moved_file = tmp_path / "cache.img"
+        moved_file.write_bytes(b"x" * 100)
+        stuck = tmp_path / "cache.img.qcow2"
+        stuck.write_bytes(b"y" * 5000)
+        stuck_size = allocated_size(os.lstat(stuck))
+        real_rename = os.rename
+
+        def rename(src, dst):
+            if src == str(stuck):
+                raise OSError(18, "Invalid cross-device link")
+            real_rename(src, dst)
+
+        with patch("os.rename", side_effect=rename):
+            moved, failed = move_to_trash(
+                [str(moved_file), str(stuck)], str(tmp_path / TRASH_DIRNAME), 100000
+            )
+
+        assert failed == [str(stuck)]
+        assert moved == 100000 - stuck_size
+
+
+class TestEmptyTrash:
+    """Tests for empty_trash function."""
+
+    def test_empties_and_removes_directory(self, tmp_path):
+        """Test every batch is deleted along with the trash directory."""
+        avd = _make_avd(tmp_path)
+        trash_dir = trash_dir_for(avd.path)
+        move_to_trash([os.path.join(avd.path, "cache.img")], trash_dir)
+        move_to_trash([os.path.join(avd.path, "snapshots", "default_boot")], trash_dir)
+
+        result = empty_trash(trash_dir)
+
+        assert result.success is True
+        assert result.files_removed == 2
+        assert not os.path.exists(trash_dir)
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="flock is POSIX only")
+    def test_skips_when_locked(self, tmp_path):
+        """Test a second worker leaves the trash to the one holding the lock."""
+        import fcntl
+
+        trash_dir = tmp_path / TRASH_DIRNAME
+        (trash_dir / "batch-1").mkdir(parents=True)
+        fd = os.open(trash_dir / LOCK_FILENAME, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            result = empty_trash(str(trash_dir))
+        finally:
+            os.close(fd)
+
+        assert result.files_removed == 0
+        assert (trash_dir / "batch-1").exists()
+
+
+class TestTrashWorker:
+    """Tests for the background trash worker."""
+
+    def test_worker_empties_trash(self, tmp_path):
+        """Test the detached worker deletes the trash after the caller returns."""
+        avd = _make_avd(tmp_path)
+        trash_dir = trash_dir_for(avd.path)
+        move_to_trash([os.path.join(avd.path, "snapshots", "default_boot")], trash_dir)
+
+        assert start_trash_worker([trash_dir]) is True
+
+        deadline = time.monotonic() + 10
+        while os.path.exists(trash_dir) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not os.path.exists(trash_dir)
+
+    def test_resume_only_pending(self, tmp_path):
+        """Test resume starts a worker only for trash that has entries."""
+        pending = tmp_path / "a" / TRASH_DIRNAME
+        (pending / "batch-1").mkdir(parents=True)
+        empty = tmp_path / "b" / TRASH_DIRNAME
+        empty.mkdir(parents=True)
+
+        with patch("subprocess.Popen") as mock_popen:
+            assert resume_trash([str(pending), str(empty), str(tmp_path / "none")]) is True
+
+        args = mock_popen.call_args.args[0]
+        assert args[-1] == str(pending)
+        assert str(empty) not in args
+
+    def test_resume_nothing_pending(self, tmp_path):
+        """Test resume does nothing without leftover trash."""
+        with patch("subprocess.Popen") as mock_popen:
+            assert resume_trash([str(tmp_path / TRASH_DIRNAME)]) is False
+        mock_popen.assert_not_called()
+
+
+class TestDeferredClean:
+    """Tests for deferred AVD cleanup."""
+
+    def test_snapshots_moved_to_trash(self, tmp_path, monkeypatch):
+        """Test deferred cleanup returns right away and hands off to a worker."""
+        avd = _make_avd(tmp_path)
+        started = []
+        monkeypatch.setattr(
+            avd_module, "start_trash_worker", lambda dirs: started.extend(dirs) or True
+        )
+
+        success, _, freed = clean_avd_snapshots(avd, defer=True)
+
+        assert success is True
+        assert freed == avd.allocated.snapshots > 0
+        assert os.listdir(os.path.join(avd.path, "snapshots")) == []
+        assert started == [trash_dir_for(avd.path)]
+        assert has_pending_trash(started[0])
+
+    def test_empties_inline_without_worker(self, tmp_path, monkeypatch):
+        """Test the trash is emptied in-process if no worker can be started."""
+        avds = [_make_avd(tmp_path, "a"), _make_avd(tmp_path, "b")]
+        monkeypatch.setattr(avd_module, "start_trash_worker", lambda _: False)
+
+        result = clean_avds(avds, defer=True)
+
+        assert result.success is True
+        assert result.bytes_freed > 0
+        assert not os.path.exists(tmp_path / TRASH_DIRNAME)
+        assert not os.path.exists(tmp_path / "a.avd" / "cache.img")
@@ -0,0 +1,80 @@
+"""Tests for disk usage module."""
+
+import os
+import sys
+
+import pytest
+
+from android_emulator_cleaner.core.usage import disk_usage
+from android_emulator_cleaner.models import DiskUsage
+
+
+class TestDiskUsage:
+    """Tests for disk_usage function."""
+
+    def test_nonexistent_directory(self):
+        """Test usage of a missing directory."""
+        assert disk_usage("/nonexistent/path") == DiskUsage()
+
+    def test_apparent_size(self, tmp_path):
+        """Test apparent size sums file lengths."""
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "a.bin").write_bytes(b"a" * 13)
+        (tmp_path / "sub" / "b.bin").write_bytes(b"b" * 4)
+
+        usage = disk_usage(str(tmp_path))
+
+        assert usage.apparent == 17
+        assert usage.allocated >= 0
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="st_blocks is POSIX only")
+    def test_sparse_file(self, tmp_path):
+        """Test sparse files report less allocated than apparent space."""
+        with open(tmp_path / "userdata-qemu.img", "wb") as f:
+            f.truncate(64 * 1024 * 1024)
+
+        usage = disk_usage(str(tmp_path))
+
+        assert usage.apparent == 64 * 1024 * 1024
+        assert usage.allocated < usage.apparent
+
+    def test_hardlinks_counted_once(self, tmp_path):
+        """Test a file linked twice is counted once."""
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "data.bin").write_bytes(b"d" * 100)
+        os.link(tmp_path / "data.bin", tmp_path / "sub" / "link.bin")
+
+        assert disk_usage(str(tmp_path)).apparent == 100
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="symlinks need privileges on Windows")
+    def test_symlinks_not_followed(self, tmp_path):
+        """Test symlinks (including loops) are skipped."""
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "data.bin").write_bytes(b"d" * 10)
+        os.symlink(tmp_path, tmp_path / "sub" / "loop")
+        os.symlink(tmp_path / "sub" / "data.bin", tmp_path / "alias.bin")
+
+        assert disk_usage(str(tmp_path)).apparent == 10
+
+    def test_deep_tree(self, tmp_path):
+        """Test trees deeper than the remaining recursion budget."""
+        current = tmp_path
+        for _ in range(100):
+            current = current / "d"
+            current.mkdir()
+        (current / "leaf.bin").write_bytes(b"x" * 5)
+
+        depth = 0
+        frame = sys._getframe()
+        while frame is not None:
+            depth += 1
+            frame = frame.f_back
+
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(depth + 40)
+        try:
+            usage = disk_usage(str(tmp_path))
+        finally:
+            sys.setrecursionlimit(limit)
+
+        assert usage.apparent == 5